@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: Optional[float] = 3600,
+        max_entries: int = 512,
+    ):
+        """
+        Semantic cache of generated answers:
+        - An answer is reused only for the same index version and the same
+          retrieved chunk ids, so it is always grounded in identical passages.
+        - Within that bucket, the question embedding must have cosine
+          similarity >= `similarity_threshold` with the cached question, which
+          lets paraphrases hit while unrelated questions miss.
+        - Entries expire after `ttl_seconds` (None = never); beyond
+          `max_entries` the least recently used entries are evicted.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # (index_version, chunk_ids, entry_no) -> (unit query embedding, answer, created_at)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._counter = 0
+
+    def lookup(
+        self, index_version: int, chunk_ids: Sequence[int], query_emb: np.ndarray
+    ) -> Optional[str]:
+        bucket = (index_version, tuple(chunk_ids))
+        q = _unit(query_emb)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_sim = None, self.similarity_threshold
+            for key, (emb, _, created) in list(self._entries.items()):
+                if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                if key[:2] != bucket:
+                    continue
+                sim = float(np.dot(emb, q))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def store(
+        self,
+        index_version: int,
+        chunk_ids: Sequence[int],
+        query_emb: np.ndarray,
+        answer: str,
+    ) -> None:
+        with self._lock:
+            self._counter += 1
+            key = (index_version, tuple(chunk_ids), self._counter)
+            self._entries[key] = (_unit(query_emb), answer, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32).ravel()
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
@@ -0,0 +1,398 @@
+"""
+Offline benchmark for the RAG hot path: extraction, chunking, embedding,
+index add, search and answer.
+
+Uses a synthetic CV corpus, a deterministic hash encoder (encoders.HashEncoder)
+instead of SentenceTransformer and a stub LLM instead of Gemini, so it runs without
+model downloads, network access or a GEMINI_API_KEY. `--encoder torch|onnx`
+measures a real embedding backend instead.
+
+    python benchmark.py --sizes 10,1000,10000
+    python benchmark.py --sizes 1000,10000 --save-baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000,10000 --baseline benchmark_baseline.json
+    python benchmark.py --startup
+
+--startup measures cold start instead: importing the engine and constructing
+it with the real (lazily loaded) encoder, each run in a fresh interpreter.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from chunker import CHUNK_STRATEGIES, Chunker
+from encoders import EMBEDDING_BACKENDS, make_encoder
+from ingest import iter_extracted
+from rag_engine import RAGEngine
+import vector_index
+from vector_index import train_and_add
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ---------- Stubs ---------- #
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    """
+    Gemini-shaped generator that answers instantly (or after `delay` seconds
+    per streamed piece), so generation cost does not hide retrieval cost.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        words = f"Stub answer for a {len(prompt)}-character prompt.".split()
+        if not stream:
+            time.sleep(self.delay)
+            return _StubResponse(" ".join(words))
+        return self._stream(words)
+
+    def _stream(self, words):
+        for w in words:
+            time.sleep(self.delay)
+            yield _StubResponse(w + " ")
+
+
+# ---------- Synthetic corpus ---------- #
+
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Lina", "Youssef", "Mona", "Karim", "Nour", "Hassan", "Laila"]
+LAST_NAMES = ["Hassan", "Ali", "Mahmoud", "Ibrahim", "Saleh", "Farouk", "Nasser", "Khalil"]
+TITLES = ["Data Engineer", "ML Engineer", "Backend Developer", "DevOps Engineer",
+          "Data Scientist", "Cloud Architect", "Frontend Developer", "QA Engineer"]
+COMPANIES = ["Vodafone", "Valeo", "Orange Labs", "Fawry", "Swvl", "Instabug", "IBM", "Siemens"]
+SKILLS = ["Python", "SQL", "Docker", "Kubernetes", "Terraform", "PyTorch", "TensorFlow",
+          "Spark", "Airflow", "React", "Go", "Java", "FastAPI", "PostgreSQL", "Kafka", "AWS"]
+CERTS = ["AWS SAA-C03", "CKA", "PMP", "Azure AZ-900", "GCP ACE", "TensorFlow Developer"]
+
+
+def _cv_sentence(rng: random.Random) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        return (f"Worked as {rng.choice(TITLES)} at {rng.choice(COMPANIES)} "
+                f"from {rng.randint(2010, 2020)} to {rng.randint(2021, 2025)}.")
+    if kind == 1:
+        return "Skills: " + ", ".join(rng.sample(SKILLS, 4)) + "."
+    if kind == 2:
+        return f"Certified: {rng.choice(CERTS)}."
+    return (f"Built {rng.choice(['pipelines', 'APIs', 'dashboards', 'models'])} "
+            f"with {rng.choice(SKILLS)} and {rng.choice(SKILLS)} serving "
+            f"{rng.randint(1, 900)}k users.")
+
+
+def generate_corpus(directory: str, num_chunks: int, seed: int = 0) -> List[str]:
+    """
+    Write synthetic CV .txt files into `directory` totalling about
+    `num_chunks` chunks at the engine's 500/100 character chunking.
+    At most ~1000 files are written; bigger corpora get longer files.
+    Returns the file paths.
+    """
+    rng = random.Random(seed)
+    chunks_per_file = max(4, num_chunks // 1000)
+    num_files = max(1, round(num_chunks / chunks_per_file))
+    target_chars = chunks_per_file * 400 + 100
+
+    paths = []
+    for i in range(num_files):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        lines = [f"Curriculum Vitae - {name}", f"{rng.choice(TITLES)}"]
+        size = sum(len(line) + 1 for line in lines)
+        while size < target_chars:
+            line = _cv_sentence(rng)
+            lines.append(line)
+            size += len(line) + 1
+        path = os.path.join(directory, f"cv_{i:06d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def generate_queries(num_queries: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"Which candidates know {rng.choice(SKILLS)}?",
+        lambda: f"Who worked at {rng.choice(COMPANIES)} as {rng.choice(TITLES)}?",
+        lambda: f"{rng.choice(CERTS)}",
+        lambda: f"Summarize experience with {rng.choice(SKILLS)} and {rng.choice(SKILLS)}.",
+    ]
+    return [rng.choice(templates)() for _ in range(num_queries)]
+
+
+# ---------- Measurements ---------- #
+
+def _peak_rss_mb() -> Optional[float]:
+    # Peak of the whole process so far, hence one process per size (see
+    # run_size_isolated).
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(samples_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def run_size(num_chunks: int, args) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    queries = generate_queries(args.queries)
+
+    # One encoder for both engines, loaded before timing starts, like FAISS
+    # (imported lazily on the first index otherwise, inside index_add_s).
+    encoder = make_encoder(args.encoder, batch_size=args.embed_batch, threads=args.embed_threads)
+    encoder.encode(["warm up"])
+    vector_index.faiss.load()
+
+    def engine() -> RAGEngine:
+        return RAGEngine(
+            embed_model=encoder,
+            llm=StubLLM(),
+            ingest_workers=args.workers,
+            index_type=args.index_type,
+            num_shards=args.shards,
+            retrieval_mode=args.retrieval_mode,
+            chunker=Chunker(args.chunking),
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_corpus(tmp, num_chunks)
+        rag = engine()
+
+        # Phase by phase, outside the engine, for a cost breakdown.
+        t0 = time.perf_counter()
+        texts = [text for _, text in iter_extracted(paths, args.workers)]
+        results["extract_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        chunks = [c for text in texts for c in rag.chunker.iter_chunks(text)]
+        results["chunk_s"] = time.perf_counter() - t0
+        results["chunks"] = len(chunks)
+        del texts
+
+        t0 = time.perf_counter()
+        vectors = np.vstack([
+            rag._embed_text(chunks[i:i + rag.embed_batch_size])
+            for i in range(0, len(chunks), rag.embed_batch_size)
+        ])
+        results["embed_s"] = time.perf_counter() - t0
+        results["embed_chunks_per_s"] = len(chunks) / max(results["embed_s"], 1e-9)
+
+        t0 = time.perf_counter()
+        train_and_add(
+            rag._new_index(len(chunks)), vectors, np.arange(len(chunks), dtype=np.int64)
+        )
+        results["index_add_s"] = time.perf_counter() - t0
+        del vectors, chunks
+        results["phases_peak_rss_mb"] = _peak_rss_mb()
+
+        # End to end through the public API.
+        rag = engine()
+        t0 = time.perf_counter()
+        rag.build_index(paths)
+        results["build_index_s"] = time.perf_counter() - t0
+        results["build_peak_rss_mb"] = _peak_rss_mb()
+
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            rag._retrieve(q, args.top_k)
+            latencies.append(time.perf_counter() - t0)
+        results.update({f"search_{k}": v for k, v in _percentiles(latencies).items()})
+        results["search_qps"] = len(queries) / sum(latencies)
+
+        t0 = time.perf_counter()
+        rag.retrieve_many(queries, args.top_k)
+        results["batch_search_qps"] = len(queries) / (time.perf_counter() - t0)
+
+        latencies = []
+        for q in queries[: min(len(queries), 50)]:
+            t0 = time.perf_counter()
+            rag.answer(q)
+            latencies.append(time.perf_counter() - t0)
+        results.update({f"answer_{k}": v for k, v in _percentiles(latencies).items()})
+
+    return results
+
+
+def run_size_isolated(num_chunks: int, args) -> Dict[str, float]:
+    """
+    `run_size` in a fresh interpreter, so peak memory covers this size
+    only, whichever sizes ran before it.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_size, num_chunks, args).result()
+
+
+# ---------- Startup ---------- #
+
+HEAVY_MODULES = (
+    "faiss", "pypdf", "pymupdf", "fitz", "torch", "sentence_transformers", "google.generativeai",
+)
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import rag_engine
+imported = time.perf_counter()
+engine = rag_engine.RAGEngine()
+ready = time.perf_counter()
+result = {"import_s": imported - start, "init_s": ready - imported}
+if %(embed)r:
+    engine._embed_text(["warm up"])
+    result["first_embed_s"] = time.perf_counter() - ready
+result["heavy_modules"] = [m for m in %(heavy)r if m in sys.modules]
+print(json.dumps(result))
+"""
+
+
+def measure_startup(runs: int = 5, embed: bool = False) -> Dict[str, float]:
+    """
+    Cold-start cost, medians over `runs` fresh interpreters:
+    - process_s: wall time of the whole process, interpreter included.
+    - import_s / init_s: `import rag_engine` and `RAGEngine()` with the
+      default encoder and Gemini client.
+    - first_embed_s (with `embed`): the first embedding, i.e. the model load.
+    - heavy_modules_loaded: how many of HEAVY_MODULES were imported by then.
+    """
+    script = STARTUP_SCRIPT % {"embed": embed, "heavy": HEAVY_MODULES}
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples: Dict[str, List[float]] = {}
+    heavy: set = set()
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", script], cwd=here, check=True, capture_output=True, text=True
+        ).stdout
+        process_s = time.perf_counter() - t0
+        run = json.loads(out.strip().splitlines()[-1])
+        heavy.update(run.pop("heavy_modules"))
+        run["process_s"] = process_s
+        for key, value in run.items():
+            samples.setdefault(key, []).append(value)
+
+    results = {key: float(np.median(values)) for key, values in samples.items()}
+    results["heavy_modules_loaded"] = len(heavy)
+    if heavy:
+        print("  heavy modules imported: " + ", ".join(sorted(heavy)))
+    return results
+
+
+# ---------- Baseline comparison ---------- #
+
+def compare(
+    current: dict, baseline: dict, tolerance: float, min_delta_ms: float = 5.0
+) -> List[str]:
+    """
+    Returns a message per metric that got worse than baseline by more than
+    `tolerance` (timings and memory higher, throughputs lower). Timing changes
+    smaller than `min_delta_ms` are treated as noise. Sizes or metrics missing
+    from either side are skipped.
+    """
+    regressions = []
+    for size, metrics in current.items():
+        base = baseline.get(size, {})
+        for key, value in metrics.items():
+            old = base.get(key)
+            if old is None or value is None or not old:
+                continue
+            if key.endswith(("_per_s", "_qps")):
+                worse = value < old / (1 + tolerance)
+            elif key.endswith(("_s", "_ms")):
+                delta_ms = (value - old) * (1000 if key.endswith("_s") else 1)
+                worse = value > old * (1 + tolerance) and delta_ms >= min_delta_ms
+            elif key.endswith("_mb"):
+                worse = value > old * (1 + tolerance)
+            else:
+                continue
+            if worse:
+                label = f"{size} chunks" if size.isdigit() else size
+                regressions.append(f"{label} · {key}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline RAG benchmark.")
+    parser.add_argument("--sizes", default="10,1000,10000",
+                        help="comma-separated corpus sizes in chunks (up to 1000000)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="extraction processes (default: one per core)")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--shards", type=int, default=1, help="index shards searched in parallel")
+    parser.add_argument("--retrieval-mode", default="dense")
+    parser.add_argument("--chunking", default="chars", choices=CHUNK_STRATEGIES)
+    parser.add_argument("--encoder", default="hash", choices=EMBEDDING_BACKENDS,
+                        help="embedding backend; torch / onnx load the real model")
+    parser.add_argument("--embed-batch", type=int, default=None, help="encoder forward-pass batch")
+    parser.add_argument("--embed-threads", type=int, default=None, help="encoder inference threads")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown vs baseline before failing (0.5 = 50%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="ignore timing regressions smaller than this")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure cold start instead of the corpus sizes")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--startup-embed", action="store_true",
+                        help="also time the first embedding (loads the real encoder)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if args.startup:
+        print("== startup ==")
+        results["startup"] = startup = measure_startup(args.startup_runs, args.startup_embed)
+        for key, value in startup.items():
+            print(f"  {key:24s} {value:.4g}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip() and not args.startup]:
+        print(f"== {size} chunks ==")
+        results[str(size)] = metrics = run_size_isolated(size, args)
+        for key, value in metrics.items():
+            print(f"  {key:24s} {value:.4g}" if value is not None else f"  {key:24s} n/a")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions vs baseline:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo regressions vs baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Keeps codes such as "SAA-C03", "node.js" or "c++" as single tokens.
+TOKEN_RE = re.compile(r"\w+(?:[-.+#]\w*)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Sparse inverted index with Okapi BM25 scoring, keyed by chunk id:
+        - Postings per term are two compact arrays (int64 chunk ids, int32 term counts).
+        - Document lengths are one int32 array indexed by chunk id.
+        - Removal zeroes the length; dead postings are skipped at query time
+          and dropped by `compact`, which runs when a quarter of them are dead.
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_len = array("i")
+        self._num_docs = 0
+        self._total_len = 0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    def nbytes(self) -> int:
+        """
+        Approximate resident size of the postings and length arrays.
+        """
+        postings = sum(
+            ids.itemsize * len(ids) + tfs.itemsize * len(tfs)
+            for ids, tfs in self._postings.values()
+        )
+        return postings + self._doc_len.itemsize * len(self._doc_len)
+
+    def add_many(self, ids: Sequence[int], texts: Iterable[str]) -> None:
+        for chunk_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            if chunk_id >= len(self._doc_len):
+                self._doc_len.extend([0] * (chunk_id + 1 - len(self._doc_len)))
+            if not tokens:
+                continue
+            self._doc_len[chunk_id] = len(tokens)
+            self._num_docs += 1
+            self._total_len += len(tokens)
+
+            counts: Dict[str, int] = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, tf in counts.items():
+                postings = self._postings.get(tok)
+                if postings is None:
+                    postings = self._postings[tok] = (array("q"), array("i"))
+                postings[0].append(chunk_id)
+                postings[1].append(tf)
+
+    def remove_many(self, ids: Iterable[int]) -> None:
+        for chunk_id in ids:
+            if chunk_id < len(self._doc_len) and self._doc_len[chunk_id] > 0:
+                self._total_len -= self._doc_len[chunk_id]
+                self._doc_len[chunk_id] = 0
+                self._num_docs -= 1
+                self._dead += 1
+        if self._dead > max(self._num_docs, 1) // 4:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Drop postings of removed chunks.
+        """
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+        for tok in list(self._postings):
+            ids, tfs = self._postings[tok]
+            id_arr = np.frombuffer(ids, dtype=np.int64)
+            alive = doc_len[id_arr] > 0
+            if alive.all():
+                continue
+            if not alive.any():
+                del self._postings[tok]
+                continue
+            self._postings[tok] = (
+                array("q", id_arr[alive].tobytes()),
+                array("i", np.frombuffer(tfs, dtype=np.int32)[alive].tobytes()),
+            )
+        self._dead = 0
+
+    def search(
+        self, query: str, top_k: int = 5, ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to top_k (chunk_id, score) pairs, best first. With `ids`,
+        only those chunks are ranked.
+        """
+        if self._num_docs == 0:
+            return []
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+        avgdl = self._total_len / self._num_docs
+        scores = np.zeros(len(doc_len), dtype=np.float32)
+
+        for tok in set(tokenize(query)):
+            postings = self._postings.get(tok)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int64)
+            tfs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+            lens = doc_len[docs]
+            alive = lens > 0
+            docs, tfs, lens = docs[alive], tfs[alive], lens[alive]
+            if len(docs) == 0:
+                continue
+            idf = math.log(1 + (self._num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            denom = tfs + self.k1 * (1 - self.b + self.b * lens / avgdl)
+            scores[docs] += idf * tfs * (self.k1 + 1) / denom
+
+        if ids is None:
+            hits = np.flatnonzero(scores)
+        else:
+            ids = np.asarray(ids, dtype=np.int64)
+            ids = ids[ids < len(scores)]
+            hits = ids[scores[ids] != 0]
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    # ---------- Persistence ---------- #
+
+    def save(self, path: str) -> None:
+        """
+        Write the index as one .npz of flat arrays: sorted terms, per-term
+        posting offsets, concatenated chunk ids / term counts, doc lengths.
+        """
+        self.compact()
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, tok in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self._postings[tok][0])
+        ids = np.concatenate(
+            [np.frombuffer(self._postings[t][0], dtype=np.int64) for t in terms]
+        ) if terms else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate(
+            [np.frombuffer(self._postings[t][1], dtype=np.int32) for t in terms]
+        ) if terms else np.zeros(0, dtype=np.int32)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(terms, dtype=str),
+                offsets=offsets,
+                ids=ids,
+                tfs=tfs,
+                doc_len=np.frombuffer(self._doc_len, dtype=np.int32),
+                params=np.array([self.k1, self.b]),
+            )
+
+    @classmethod
+    def open(cls, path: str) -> "BM25Index":
+        data = np.load(path)
+        k1, b = data["params"].tolist()
+        index = cls(k1=k1, b=b)
+        offsets, ids, tfs = data["offsets"], data["ids"], data["tfs"]
+        for i, tok in enumerate(data["terms"].tolist()):
+            start, end = offsets[i], offsets[i + 1]
+            index._postings[tok] = (
+                array("q", ids[start:end].tobytes()),
+                array("i", tfs[start:end].tobytes()),
+            )
+        index._doc_len = array("i", data["doc_len"].tobytes())
+        doc_len = data["doc_len"]
+        index._num_docs = int((doc_len > 0).sum())
+        index._total_len = int(doc_len.sum())
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[int]:
+    """
+    Merge ranked id lists: each id scores sum(1 / (k + rank)) over the lists
+    it appears in. Returns ids best first.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda i: -scores[i])
@@ -0,0 +1,247 @@
+"""
+Bulk offline indexer.
+
+Walks a directory tree of PDF and TXT files and indexes them into a
+workspace that the Streamlit app and service.py open, without going through
+the upload widget.
+- Files are indexed in batches of --batch-files. After a batch the index is
+  saved (a checkpoint) once --checkpoint-every seconds have passed, and
+  always at the end.
+- An interrupted run (Ctrl+C, crash, reboot) resumes from the last
+  checkpoint: files already in the index are skipped, and the unfinished
+  batch is dropped on Ctrl+C so no file is left half indexed.
+- Text extraction runs in one process per core (--workers); embedding uses
+  the encoder's own threads (--embed-threads).
+- Progress lines and a final report give files/s, chunks/s, MB/s and the time
+  spent in each stage.
+
+    python bulk_index.py archive/cvs --workspace hr
+    python bulk_index.py archive/cvs --workspace hr --embedding-backend onnx --index-type sq8
+    python bulk_index.py archive/cvs --workspace hr --update    # also re-index changed files
+
+Sources are named by their path relative to the directory, so equally named
+files in different folders stay distinct. Do not index into a workspace the
+app is writing to at the same time; the app reads the new index the next
+time it opens the workspace (e.g. after a restart).
+
+The Streamlit app and service.py only add to a workspace (and remove what
+is asked for), so uploads land next to the archive. Calling
+RAGEngine.build_index / refresh on it instead replaces the whole index with
+the given files, dropping the bulk-indexed sources.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from chunker import CHUNK_STRATEGIES, Chunker
+from embedding_cache import EmbeddingCache
+from encoders import EMBEDDING_BACKENDS, make_encoder
+from metrics import Metrics
+from pdf_text import PDF_BACKENDS, PdfPageCache
+from rag_engine import RAGEngine, source_name
+from sharded_index import SHARD_ROUTES
+from tenants import DEFAULT_COLLECTION, EnginePool
+from vector_index import INDEX_TYPES
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+
+def find_files(root: str) -> List[str]:
+    """
+    PDF and TXT files under `root`, in a stable (sorted) order so a resumed
+    run walks them the same way.
+    """
+    found = []
+    for directory, subdirs, names in os.walk(root):
+        subdirs.sort()
+        for name in sorted(names):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                found.append(os.path.join(directory, name))
+    return found
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _drop_unfinished(engine: RAGEngine, before: Dict[str, str]) -> None:
+    # Files added (or re-indexed) by an interrupted batch may be half indexed:
+    # forget them, so the checkpoint holds only complete files.
+    for name, entry in list(engine.sources.items()):
+        if before.get(name) != entry["hash"]:
+            engine.remove_source(name)
+
+
+def bulk_index(
+    engine: RAGEngine,
+    root: str,
+    out: str,
+    batch_files: int = 256,
+    checkpoint_every: float = 300.0,
+    update: bool = False,
+) -> dict:
+    """
+    Index every supported file under `root` into `engine`, checkpointing to
+    `out`, and return the throughput report. Resumes from `out` if it holds
+    a saved index. Raises KeyboardInterrupt after checkpointing the
+    completed batches.
+    Only adds (or with `update` re-indexes) files; sources already in the
+    index that are not under `root` are kept.
+    """
+    resumed = 0
+    if os.path.exists(os.path.join(out, "CURRENT")):
+        resumed = engine.load(out)
+        print(f"Resuming: {len(engine.sources)} files ({resumed} chunks) already in {out}.")
+
+    files = find_files(root)
+    todo = [p for p in files if update or source_name(p, root) not in engine.sources]
+    total_bytes = sum(os.path.getsize(p) for p in todo)
+    print(f"{len(files)} files under {root}; {len(todo)} to index ({total_bytes / 1e6:.1f} MB).")
+
+    start = last_checkpoint = time.perf_counter()
+    files_done = chunks_added = bytes_done = checkpoints = 0
+    checkpoint_s = 0.0
+    dirty = False
+
+    def checkpoint() -> None:
+        nonlocal checkpoints, checkpoint_s, last_checkpoint, dirty
+        t0 = time.perf_counter()
+        engine.save(out)
+        checkpoint_s += time.perf_counter() - t0
+        checkpoints += 1
+        last_checkpoint = time.perf_counter()
+        dirty = False
+
+    for offset in range(0, len(todo), batch_files):
+        batch = todo[offset:offset + batch_files]
+        before = {name: entry["hash"] for name, entry in engine.sources.items()}
+        try:
+            chunks_added += engine.add_files(batch, root=root)
+        except KeyboardInterrupt:
+            _drop_unfinished(engine, before)
+            if dirty:
+                checkpoint()
+            print(f"\nInterrupted after {files_done} files; progress is saved in {out}. "
+                  "Run the same command again to resume.")
+            raise
+        dirty = True
+        files_done += len(batch)
+        bytes_done += sum(os.path.getsize(p) for p in batch if os.path.exists(p))
+
+        elapsed = time.perf_counter() - start
+        rate = files_done / elapsed
+        eta = (len(todo) - files_done) / rate if rate else 0.0
+        print(
+            f"[{files_done:>{len(str(len(todo)))}}/{len(todo)}] "
+            f"{rate:.1f} files/s · {chunks_added / elapsed:.0f} chunks/s · "
+            f"{bytes_done / 1e6 / elapsed:.2f} MB/s · ETA {format_duration(eta)}",
+            flush=True,
+        )
+        if time.perf_counter() - last_checkpoint >= checkpoint_every:
+            checkpoint()
+
+    if dirty:
+        checkpoint()
+
+    elapsed = time.perf_counter() - start
+    stages = engine.metrics.snapshot()["stages"]
+    return {
+        "files_found": len(files),
+        "files_skipped": len(files) - len(todo),
+        "files_indexed": files_done,
+        "duplicates": sum(1 for e in engine.sources.values() if e.get("duplicate_of")),
+        "chunks_added": chunks_added,
+        "chunks_total": engine.num_chunks(),
+        "elapsed_s": elapsed,
+        "files_per_s": files_done / elapsed if elapsed else 0.0,
+        "chunks_per_s": chunks_added / elapsed if elapsed else 0.0,
+        "mb_per_s": bytes_done / 1e6 / elapsed if elapsed else 0.0,
+        "checkpoints": checkpoints,
+        "checkpoint_s": checkpoint_s,
+        **{f"{stage}_s": s["total_s"] for stage, s in stages.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Directory to index (searched recursively).")
+    parser.add_argument("--index-dir", default=os.environ.get("RAG_INDEX_DIR", "vector_store"),
+                        help="The app's RAG_INDEX_DIR; workspaces live under <index-dir>/tenants.")
+    parser.add_argument("--workspace", default="default", help="Workspace name shown in the app.")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--out", help="Index directory (overrides --index-dir / --workspace).")
+    parser.add_argument("--batch-files", type=int, default=256, help="Files per add_files call.")
+    parser.add_argument("--checkpoint-every", type=float, default=300.0, help="Seconds between checkpoints.")
+    parser.add_argument("--update", action="store_true",
+                        help="Re-hash already indexed files and re-index the changed ones.")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: one per core).")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Split the index into this many shards, searched in parallel.")
+    parser.add_argument("--shard-by", default="hash", choices=SHARD_ROUTES,
+                        help="Spread chunks evenly (hash) or keep each file's chunks together (source).")
+    parser.add_argument("--chunking", default="sentences", choices=CHUNK_STRATEGIES)
+    parser.add_argument("--embedding-backend", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--embed-batch", type=int, default=None, help="Encoder forward-pass batch size.")
+    parser.add_argument("--embed-threads", type=int, default=None, help="Encoder inference threads.")
+    parser.add_argument("--embedding-cache", help="SQLite embedding cache path (e.g. the app's).")
+    parser.add_argument("--pdf-backend", default="auto", choices=PDF_BACKENDS)
+    parser.add_argument("--page-cache", help="SQLite PDF page cache path.")
+    parser.add_argument("--duplicate-threshold", type=float, default=0.9,
+                        help="Skip near-duplicate files at this MinHash similarity (0 = off).")
+    parser.add_argument("--output", help="Write the report as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"{args.root} is not a directory.", file=sys.stderr)
+        return 1
+    out = args.out or EnginePool(os.path.join(args.index_dir, "tenants")).collection_dir(
+        args.workspace, args.collection
+    )
+    os.makedirs(out, exist_ok=True)
+
+    engine = RAGEngine(
+        embed_model=make_encoder(
+            args.embedding_backend, batch_size=args.embed_batch, threads=args.embed_threads
+        ),
+        embedding_cache=EmbeddingCache(args.embedding_cache) if args.embedding_cache else None,
+        ingest_workers=args.workers,
+        index_type=args.index_type,
+        num_shards=args.shards,
+        shard_by=args.shard_by,
+        chunker=Chunker(args.chunking),
+        pdf_backend=args.pdf_backend,
+        page_cache=PdfPageCache(args.page_cache) if args.page_cache else None,
+        duplicate_threshold=args.duplicate_threshold or None,
+        metrics=Metrics(),
+    )
+
+    try:
+        report = bulk_index(
+            engine, args.root, out, args.batch_files, args.checkpoint_every, args.update
+        )
+    except KeyboardInterrupt:
+        return 130
+
+    print()
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f"{value:.4g}"
+        print(f"  {key:<18} {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
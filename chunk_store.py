@@ -0,0 +1,363 @@
+import json
+import math
+import os
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+class RetrievedChunk:
+    """
+    Lightweight view of one chunk. Created on demand from a ChunkStore for
+    the hits that retrieval returns; the store itself holds no chunk objects.
+    `page` (from 1), `section`, `uploaded_at` (Unix time) and `tenant` are
+    None when unknown.
+    """
+
+    __slots__ = ("content", "source", "chunk_id", "page", "section", "uploaded_at", "tenant")
+
+    def __init__(
+        self,
+        content: str,
+        source: str,
+        chunk_id: int = -1,
+        page: Optional[int] = None,
+        section: Optional[str] = None,
+        uploaded_at: Optional[float] = None,
+        tenant: Optional[str] = None,
+    ):
+        self.content = content
+        self.source = source
+        self.chunk_id = chunk_id
+        self.page = page
+        self.section = section
+        self.uploaded_at = uploaded_at
+        self.tenant = tenant
+
+
+class ChunkFilter:
+    __slots__ = ("sources", "pages", "sections", "uploaded_after", "uploaded_before")
+
+    def __init__(
+        self,
+        sources: Optional[Iterable[str]] = None,
+        pages: Optional[Iterable[int]] = None,
+        sections: Optional[Iterable[str]] = None,
+        uploaded_after: Optional[float] = None,
+        uploaded_before: Optional[float] = None,
+    ):
+        """
+        Which chunks a search may return; unset fields match everything:
+        - sources: source file names (e.g. one CV).
+        - pages: page numbers, from 1 (e.g. range(1, 3)).
+        - sections: heading titles, case-insensitive (e.g. "Experience").
+        - uploaded_after / uploaded_before: Unix times bounding when the
+          source was indexed.
+        Filters are hashable, so equal filters can share a batched search.
+        """
+        if isinstance(sources, str):
+            sources = [sources]
+        if isinstance(sections, str):
+            sections = [sections]
+        self.sources = frozenset(sources) if sources is not None else None
+        self.pages = frozenset(int(p) for p in pages) if pages is not None else None
+        self.sections = frozenset(s.lower() for s in sections) if sections is not None else None
+        self.uploaded_after = uploaded_after
+        self.uploaded_before = uploaded_before
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["ChunkFilter"]:
+        """
+        Filter from JSON-style fields (the constructor's), or None for an
+        empty or missing one.
+        """
+        if not data:
+            return None
+        unknown = set(data) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Unknown filter fields: {sorted(unknown)}.")
+        return cls(**data)
+
+    def _key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ChunkFilter) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in zip(self.__slots__, self._key()) if value is not None)
+        return f"ChunkFilter({fields})"
+
+
+class ChunkStore:
+    def __init__(self):
+        """
+        Columnar chunk store:
+        - One contiguous UTF-8 text buffer plus an int64 offsets column.
+        - An int32 source-id column; source names are interned once.
+        - Metadata columns: int32 page (0 = none) and int32 section id
+          (-1 = none, titles interned), plus an upload time per source.
+        - Chunk ids are positions. Deleted chunks keep their id with source id -1.
+        A store opened with `open(..., mmap=True)` reads the saved text and
+        columns straight from disk and copies only the columns on first write.
+        """
+        self._text_base = np.zeros(0, dtype=np.uint8)  # mapped text, read-only
+        self._text_tail = bytearray()  # text appended since open()
+        self._offsets = array("q", [0])
+        self._source_ids = array("i")
+        self._pages = array("i")
+        self._section_ids = array("i")
+        self._sources: List[str] = []
+        self._source_lookup: Dict[str, int] = {}
+        self._source_times = array("d")  # by source id, NaN = unknown
+        self._sections: List[str] = []
+        self._section_lookup: Dict[str, int] = {}
+
+    # ---------- Reading ---------- #
+
+    def __len__(self) -> int:
+        return len(self._source_ids)
+
+    def __getitem__(self, i: int) -> Optional[RetrievedChunk]:
+        """
+        View of chunk `i`, or None if it was deleted.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        source_id = int(self._source_ids[i])
+        if source_id < 0:
+            return None
+        page = int(self._pages[i])
+        section_id = int(self._section_ids[i])
+        uploaded_at = float(self._source_times[source_id])
+        return RetrievedChunk(
+            content=self.text(i),
+            source=self._sources[source_id],
+            chunk_id=i,
+            page=page or None,
+            section=self._sections[section_id] if section_id >= 0 else None,
+            uploaded_at=None if math.isnan(uploaded_at) else uploaded_at,
+        )
+
+    def __iter__(self) -> Iterator[Optional[RetrievedChunk]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        base_len = len(self._text_base)
+        if end <= base_len:
+            data = self._text_base[start:end].tobytes()
+        else:
+            data = bytes(self._text_tail[start - base_len:end - base_len])
+        return data.decode("utf-8")
+
+    def source(self, i: int) -> Optional[str]:
+        source_id = int(self._source_ids[i])
+        return None if source_id < 0 else self._sources[source_id]
+
+    @property
+    def sources(self) -> List[str]:
+        """
+        Interned source names; a chunk's source id indexes this list.
+        """
+        return self._sources
+
+    def live_ids(self, source: Optional[str] = None) -> np.ndarray:
+        """
+        Sorted ids of the live chunks, or of those from `source`. Read off
+        the source-id column, so the caller needs no per-source id lists.
+        """
+        source_ids = _column(self._source_ids, np.int32)
+        if source is None:
+            return np.flatnonzero(source_ids >= 0)
+        source_id = self._source_lookup.get(source)
+        if source_id is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(source_ids == source_id)
+
+    def uploaded_at(self, source: str) -> Optional[float]:
+        source_id = self._source_lookup.get(source)
+        if source_id is None or math.isnan(self._source_times[source_id]):
+            return None
+        return float(self._source_times[source_id])
+
+    def nbytes(self) -> int:
+        """
+        Approximate resident size of the store (mapped text not counted).
+        """
+        return len(self._text_tail) + sum(
+            column.itemsize * len(column)
+            for column in (self._offsets, self._source_ids, self._pages, self._section_ids)
+        )
+
+    # ---------- Filtering ---------- #
+
+    def select(self, where: ChunkFilter, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sorted ids of the live chunks matching `where`, out of `ids` (default:
+        all chunks). Evaluated on the columns, without reading any text.
+        """
+        source_ids = _column(self._source_ids, np.int32)
+        if ids is None:
+            ids = np.arange(len(source_ids), dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        chunk_sources = source_ids[ids]
+        keep = chunk_sources >= 0
+
+        if where.sources is not None:
+            wanted = [self._source_lookup[s] for s in where.sources if s in self._source_lookup]
+            keep &= np.isin(chunk_sources, wanted)
+        if where.pages is not None:
+            keep &= np.isin(_column(self._pages, np.int32)[ids], list(where.pages))
+        if where.sections is not None:
+            wanted = [i for i, title in enumerate(self._sections) if title.lower() in where.sections]
+            keep &= np.isin(_column(self._section_ids, np.int32)[ids], wanted)
+        if where.uploaded_after is not None or where.uploaded_before is not None:
+            # NaN (unknown) times fail both comparisons.
+            times = _column(self._source_times, np.float64)[np.maximum(chunk_sources, 0)]
+            if where.uploaded_after is not None:
+                keep &= times >= where.uploaded_after
+            if where.uploaded_before is not None:
+                keep &= times < where.uploaded_before
+        return np.sort(ids[keep])
+
+    # ---------- Writing ---------- #
+
+    def _intern(self, source: str) -> int:
+        source_id = self._source_lookup.get(source)
+        if source_id is None:
+            source_id = len(self._sources)
+            self._sources.append(source)
+            self._source_lookup[source] = source_id
+            self._source_times.append(math.nan)
+        return source_id
+
+    def _intern_section(self, title: Optional[str]) -> int:
+        if title is None:
+            return -1
+        section_id = self._section_lookup.get(title)
+        if section_id is None:
+            section_id = len(self._sections)
+            self._sections.append(title)
+            self._section_lookup[title] = section_id
+        return section_id
+
+    def _make_writable(self) -> None:
+        # Mapped columns are read-only numpy arrays; copy them once.
+        if not isinstance(self._offsets, array):
+            self._offsets = array("q", np.asarray(self._offsets, dtype=np.int64).tobytes())
+            self._source_ids = array("i", np.asarray(self._source_ids, dtype=np.int32).tobytes())
+            self._pages = array("i", np.asarray(self._pages, dtype=np.int32).tobytes())
+            self._section_ids = array("i", np.asarray(self._section_ids, dtype=np.int32).tobytes())
+
+    def extend(
+        self,
+        texts: Iterable[str],
+        sources: Iterable[str],
+        pages: Optional[Iterable[int]] = None,
+        sections: Optional[Iterable[Optional[str]]] = None,
+    ) -> List[int]:
+        """
+        Append chunks, with one source name per text and optionally one page
+        (0 = none) and section title (or None) per text. Returns their ids.
+        """
+        self._make_writable()
+        texts = list(texts)
+        pages = [0] * len(texts) if pages is None else pages
+        sections = [None] * len(texts) if sections is None else sections
+        ids = []
+        end = self._offsets[-1]
+        for text, source, page, section in zip(texts, sources, pages, sections):
+            data = text.encode("utf-8")
+            self._text_tail += data
+            end += len(data)
+            ids.append(len(self._source_ids))
+            self._offsets.append(end)
+            self._source_ids.append(self._intern(source))
+            self._pages.append(page)
+            self._section_ids.append(self._intern_section(section))
+        return ids
+
+    def set_uploaded_at(self, source: str, timestamp: float) -> None:
+        self._source_times[self._intern(source)] = timestamp
+
+    def delete(self, ids: Iterable[int]) -> None:
+        self._make_writable()
+        _column(self._source_ids, np.int32)[np.asarray(ids, dtype=np.int64)] = -1
+
+    # ---------- Persistence ---------- #
+
+    def save(self, directory: str) -> List[str]:
+        """
+        Write chunks.bin, chunk_offsets.npy, chunk_sources.npy and the
+        metadata columns (chunk_meta.npz, chunk_sections.json) into
+        `directory`. Returns the interned source names, which the caller
+        stores alongside (see `open`).
+        """
+        with open(os.path.join(directory, "chunks.bin"), "wb") as f:
+            f.write(memoryview(self._text_base))
+            f.write(self._text_tail)
+        np.save(
+            os.path.join(directory, "chunk_offsets.npy"),
+            np.asarray(self._offsets, dtype=np.int64),
+        )
+        np.save(
+            os.path.join(directory, "chunk_sources.npy"),
+            np.asarray(self._source_ids, dtype=np.int32),
+        )
+        np.savez(
+            os.path.join(directory, "chunk_meta.npz"),
+            pages=np.asarray(self._pages, dtype=np.int32),
+            section_ids=np.asarray(self._section_ids, dtype=np.int32),
+            source_times=np.asarray(self._source_times, dtype=np.float64),
+        )
+        with open(os.path.join(directory, "chunk_sections.json"), "w", encoding="utf-8") as f:
+            json.dump(self._sections, f)
+        return list(self._sources)
+
+    @classmethod
+    def open(cls, directory: str, sources: List[str], mmap: bool = True) -> "ChunkStore":
+        """
+        Open a store written by `save`. With `mmap`, text and columns are
+        memory-mapped instead of read into memory.
+        """
+        store = cls()
+        mode = "r" if mmap else None
+        store._offsets = np.load(os.path.join(directory, "chunk_offsets.npy"), mmap_mode=mode)
+        store._source_ids = np.load(os.path.join(directory, "chunk_sources.npy"), mmap_mode=mode)
+
+        text_path = os.path.join(directory, "chunks.bin")
+        if os.path.getsize(text_path) == 0:
+            pass
+        elif mmap:
+            store._text_base = np.memmap(text_path, dtype=np.uint8, mode="r")
+        else:
+            store._text_base = np.fromfile(text_path, dtype=np.uint8)
+
+        for name in sources:
+            store._intern(name)
+
+        meta_path = os.path.join(directory, "chunk_meta.npz")
+        if os.path.exists(meta_path):
+            with np.load(meta_path) as meta:
+                store._pages = meta["pages"]
+                store._section_ids = meta["section_ids"]
+                store._source_times = array("d", meta["source_times"].tobytes())
+            with open(os.path.join(directory, "chunk_sections.json"), "r", encoding="utf-8") as f:
+                for title in json.load(f):
+                    store._intern_section(title)
+        else:
+            # Saved before metadata columns existed: no pages, sections or times.
+            store._pages = np.zeros(len(store), dtype=np.int32)
+            store._section_ids = np.full(len(store), -1, dtype=np.int32)
+        return store
+
+
+def _column(column, dtype) -> np.ndarray:
+    # numpy view of an array.array column (no copy), or the mapped array itself.
+    return np.frombuffer(column, dtype=dtype) if isinstance(column, array) else column
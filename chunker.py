@@ -0,0 +1,358 @@
+import re
+from bisect import bisect_right
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+CHUNK_STRATEGIES = ("chars", "tokens", "sentences")
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, two of which are [CLS]/[SEP].
+MINILM_MAX_TOKENS = 254
+
+LINE_RE = re.compile(r"[^\r\n]+")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?؟])\s+")
+APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Common CV section titles, matched case-insensitively as whole lines.
+CV_SECTIONS = {
+    "summary", "profile", "professional summary", "objective", "about me",
+    "experience", "work experience", "professional experience", "employment history",
+    "education", "skills", "technical skills", "core skills", "certifications",
+    "certificates", "courses", "projects", "languages", "awards", "publications",
+    "volunteering", "interests", "references", "contact",
+}
+
+# A newline next to a line that may be a heading (is_heading decides): after
+# a line ending in a heading mark, or before one that starts with a mark, has
+# no lowercase ASCII letters, or could be a section title (ASCII letters and
+# spaces; U+212A KELVIN SIGN lowercases to "k").
+HEADING_CANDIDATE_RE = re.compile(
+    r"\n(?:(?<=[#:*=_-]\n)|(?=[#:*=_-]|[^a-z\n]{1,60}\n|[A-Za-z \u212a]{1,%d}\n))"
+    % max(map(len, CV_SECTIONS))
+)
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Tokenizer-free estimate: words and punctuation marks. Slightly
+    under-counts word pieces for rare words.
+    """
+    return len(APPROX_TOKEN_RE.findall(text))
+
+
+def iter_lines(text: Union[str, Iterable[str]]) -> Iterator[str]:
+    """
+    Stripped, non-empty lines of `text`, without splitting it into a list.
+    `text` may also be an iterable of pieces (e.g. PDF pages); each piece
+    ends a line, as if they were joined with newlines.
+    """
+    for piece in ((text,) if isinstance(text, str) else text):
+        for m in LINE_RE.finditer(piece):
+            line = m.group().strip()
+            if line:
+                yield line
+
+
+def _iter_pages(text: Union[str, Iterable[str]]) -> Iterator[Tuple[int, str]]:
+    # (page, piece): pieces of an iterable are pages numbered from 1; a plain
+    # string is one piece with no page (0).
+    if isinstance(text, str):
+        yield 0, text
+        return
+    yield from enumerate(text, start=1)
+
+
+def _iter_page_lines(text: Union[str, Iterable[str]]) -> Iterator[Tuple[str, int]]:
+    # (line, page) of each stripped, non-empty line.
+    for page, piece in _iter_pages(text):
+        for line in iter_lines(piece):
+            yield line, page
+
+
+def _join_lines(piece: str) -> str:
+    # "\n".join(iter_lines(piece)), split and stripped in C.
+    return "\n".join(filter(None, map(str.strip, piece.replace("\r", "\n").split("\n"))))
+
+
+def _headings(joined: str) -> Iterator[Tuple[int, str]]:
+    # (offset, title) of each heading line in `joined` (see _join_lines).
+    # One regex scan picks out the few lines that could be headings, so body
+    # text costs no Python call per line.
+    padded = "\n" + joined + "\n"
+    # Index of the newline before each candidate line, which is also where
+    # the line starts in `joined`. A match may be about either neighbour.
+    starts = set()
+    for m in HEADING_CANDIDATE_RE.finditer(padded):
+        starts.add(m.start())
+        starts.add(padded.rfind("\n", 0, m.start()))
+    starts.discard(-1)
+    for start in sorted(starts):
+        end = padded.find("\n", start + 1)
+        if end < 0:
+            continue
+        line = padded[start + 1:end]
+        if is_heading(line):
+            yield start, heading_title(line)
+
+
+def heading_title(line: str) -> str:
+    return line.strip("#:*-=_ ").strip()
+
+
+def is_heading(line: str) -> bool:
+    if len(line) > 60:
+        return False
+    bare = heading_title(line)
+    if not bare:
+        return False
+    return (
+        line.startswith("#")
+        or bare.lower() in CV_SECTIONS
+        or (bare.isupper() and len(bare.split()) <= 6)
+        or (line.endswith(":") and len(bare.split()) <= 5)
+    )
+
+
+class Chunker:
+    def __init__(
+        self,
+        strategy: str = "chars",
+        chunk_size: int = 500,
+        overlap: int = 100,
+        max_tokens: int = MINILM_MAX_TOKENS,
+        overlap_tokens: int = 32,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Splits document text into chunks for embedding:
+        - chars: fixed `chunk_size` character windows with `overlap`, over
+          the text with blank lines removed (the original behaviour).
+        - tokens: whole lines packed into windows of at most `max_tokens`
+          tokens, with about `overlap_tokens` of trailing lines repeated.
+        - sentences: like tokens, but packs sentences and starts a new chunk
+          at every heading (e.g. CV sections), repeating the heading on
+          continuation chunks.
+        `token_counter` counts tokens in a string; RAGEngine passes the
+        encoder's own tokenizer. Without one, `approx_token_count` is used.
+        """
+        if strategy not in CHUNK_STRATEGIES:
+            raise ValueError(
+                f"Unknown chunking strategy {strategy!r}; expected one of {CHUNK_STRATEGIES}."
+            )
+        if overlap >= chunk_size:
+            raise ValueError("overlap must be smaller than chunk_size.")
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.token_counter = token_counter
+
+    def iter_chunks(self, text: Union[str, Iterable[str]]) -> Iterator[str]:
+        if self.strategy == "chars":
+            # Without metadata, headings need not be looked for.
+            return (chunk for chunk, _, _ in self._char_chunks(text, sections=False))
+        return (chunk for chunk, _, _ in self.iter_chunks_with_meta(text))
+
+    def iter_chunks_with_meta(
+        self, text: Union[str, Iterable[str]]
+    ) -> Iterator[Tuple[str, int, Optional[str]]]:
+        """
+        Like `iter_chunks`, but yields (chunk, page, section):
+        - page: the page the chunk starts on, when `text` is an iterable of
+          pages (numbered from 1); 0 for a plain string.
+        - section: title of the last heading before the chunk (e.g.
+          "Experience"), or None.
+        """
+        if self.strategy == "chars":
+            return self._char_chunks(text)
+        count = self.token_counter or approx_token_count
+        if self.strategy == "tokens":
+            units = self._line_units(text)
+        else:
+            units = self._sentence_units(text)
+        return self._pack(units, count)
+
+    # ---------- Strategies ---------- #
+
+    def _char_chunks(
+        self, text: Union[str, Iterable[str]], sections: bool = True
+    ) -> Iterator[Tuple[str, int, Optional[str]]]:
+        # Same windows as slicing "\n".join(lines) at start = 0, step, 2*step...
+        # Each page is joined at once and windows are sliced at `pos`; only the
+        # unconsumed tail (under a chunk) is carried over to the next page.
+        size = self.chunk_size
+        step = size - self.overlap
+        buf = ""
+        pos = 0
+        # Offsets in buf where (page, section) changes: page starts and headings.
+        offsets: List[int] = []
+        metas: List[Tuple[int, Optional[str]]] = []
+        section: Optional[str] = None
+
+        def window() -> Optional[Tuple[str, int, Optional[str]]]:
+            chunk = buf[pos:pos + size].strip()
+            if not chunk:
+                return None
+            page, sec = metas[bisect_right(offsets, pos) - 1]
+            return chunk, page, sec
+
+        for page, piece in _iter_pages(text):
+            joined = _join_lines(piece)
+            if not joined:
+                continue
+            # Keep the mark in effect at pos, and those after it.
+            first = max(bisect_right(offsets, pos) - 1, 0)
+            offsets = [offset - pos for offset in offsets[first:]]
+            metas = metas[first:]
+            rest = buf[pos:]
+            base = len(rest) + 1 if buf else 0
+            offsets.append(base)
+            metas.append((page, section))
+            for offset, title in (_headings(joined) if sections else ()):
+                section = title
+                offsets.append(base + offset)
+                metas.append((page, section))
+            buf = rest + "\n" + joined if buf else joined
+            pos = 0
+            while len(buf) - pos >= size:
+                out = window()
+                if out is not None:
+                    yield out
+                pos += step
+        while pos < len(buf):
+            out = window()
+            if out is not None:
+                yield out
+            pos += step
+
+    # Units are (text, separator before it, is_heading, page, section).
+
+    def _line_units(self, text: Union[str, Iterable[str]]) -> Iterator[Tuple[str, str, bool, int, Optional[str]]]:
+        # Headings only name the section here; they do not start a chunk.
+        section = None
+        for line, page in _iter_page_lines(text):
+            if is_heading(line):
+                section = heading_title(line)
+            yield line, "\n", False, page, section
+
+    def _sentence_units(self, text: Union[str, Iterable[str]]) -> Iterator[Tuple[str, str, bool, int, Optional[str]]]:
+        section = None
+        for line, page in _iter_page_lines(text):
+            if is_heading(line):
+                section = heading_title(line)
+                yield line, "\n", True, page, section
+                continue
+            for i, sentence in enumerate(SENTENCE_END_RE.split(line)):
+                if sentence:
+                    yield sentence, "\n" if i == 0 else " ", False, page, section
+
+    def _pack(
+        self, units: Iterator[Tuple[str, str, bool, int, Optional[str]]], count: Callable[[str], int]
+    ) -> Iterator[Tuple[str, int, Optional[str]]]:
+        max_tokens = self.max_tokens
+        # (text, separator, tokens, page, section)
+        parts: List[Tuple[str, str, int, int, Optional[str]]] = []
+        size = 0
+        heading: Optional[Tuple[str, str, int, int, Optional[str]]] = None
+
+        def joined() -> str:
+            out = parts[0][0] if parts else ""
+            for prev, (t, sep, *_) in zip(parts, parts[1:]):
+                out += ("\n" if prev is heading else sep) + t
+            return out
+
+        def chunk() -> Tuple[str, int, Optional[str]]:
+            # Page and section of the first body unit.
+            first = next((p for p in parts if p is not heading), parts[0])
+            return joined(), first[3], first[4]
+
+        def has_body() -> bool:
+            return any(p is not heading for p in parts)
+
+        for text, sep, unit_is_heading, page, section in units:
+            n = count(text)
+
+            if unit_is_heading:
+                if has_body():
+                    yield chunk()
+                elif heading is not None and heading[2] + n <= max_tokens // 2:
+                    # Consecutive headings (e.g. a name line above "Summary")
+                    # merge rather than dropping the empty one.
+                    text, n = heading[0] + "\n" + text, heading[2] + n
+                heading = (text, sep, n, page, section)
+                parts, size = [heading], n
+                continue
+
+            if n > max_tokens:
+                # One unit is bigger than a chunk: flush, then split it by words.
+                if has_body():
+                    yield chunk()
+                prefix = heading[0] + "\n" if heading else ""
+                for piece in self._split_long(text, count, max_tokens - (heading[2] if heading else 0)):
+                    yield prefix + piece, page, section
+                parts = [heading] if heading else []
+                size = heading[2] if heading else 0
+                continue
+
+            if size + n > max_tokens and has_body():
+                yield chunk()
+                # Carry trailing units (up to overlap_tokens) into the next chunk.
+                carried: List[Tuple[str, str, int, int, Optional[str]]] = []
+                carried_size = heading[2] if heading else 0
+                for part in reversed(parts):
+                    if part is heading or carried_size + part[2] > self.overlap_tokens:
+                        break
+                    carried.insert(0, part)
+                    carried_size += part[2]
+                parts = ([heading] if heading else []) + carried
+                size = carried_size
+                if size + n > max_tokens:
+                    parts = [heading] if heading else []
+                    size = heading[2] if heading else 0
+
+            parts.append((text, sep, n, page, section))
+            size += n
+
+        if has_body() or (parts and not heading):
+            yield chunk()
+
+    def _split_long(self, text: str, count: Callable[[str], int], max_tokens: int) -> Iterator[str]:
+        max_tokens = max(max_tokens, 1)
+        words: List[str] = []
+        size = 0
+        for word in text.split():
+            n = count(word)
+            if words and size + n > max_tokens:
+                yield " ".join(words)
+                words, size = [], 0
+            words.append(word)
+            size += n
+        if words:
+            yield " ".join(words)
+
+
+def tokenizer_counter(tokenizer) -> Callable[[str], int]:
+    """
+    Token counter from a Hugging Face tokenizer (e.g. SentenceTransformer.tokenizer),
+    excluding special tokens.
+    """
+    def count(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return count
+
+
+def lazy_tokenizer_counter(get_tokenizer: Callable[[], object]) -> Callable[[str], int]:
+    """
+    Like `tokenizer_counter`, but calls `get_tokenizer` on the first count, so
+    a lazily loaded encoder is not loaded before any text is chunked.
+    Falls back to `approx_token_count` when there is no tokenizer.
+    """
+    counter: Optional[Callable[[str], int]] = None
+
+    def count(text: str) -> int:
+        nonlocal counter
+        if counter is None:
+            tokenizer = get_tokenizer()
+            counter = tokenizer_counter(tokenizer) if tokenizer is not None else approx_token_count
+        return counter(text)
+    return count
@@ -0,0 +1,133 @@
+import re
+import textwrap
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunker import is_heading, iter_lines
+
+
+BULLET_RE = re.compile(r"^\s*(?:[-*•▪●◦·]|\d{1,2}[.)])\s+")
+SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+REQUIREMENT_HINT_RE = re.compile(
+    r"\b(?:experience|years?|knowledge|proficien\w*|familiar\w*|skills?|degree|"
+    r"must|required|requirements?|ability|able to|strong|hands-on|certif\w*|fluent)\b",
+    re.IGNORECASE,
+)
+
+MATCH_LABELS = ("Met", "Partial", "Missing")
+
+
+def extract_requirements(jd_text: str, max_requirements: Optional[int] = None) -> List[str]:
+    """
+    Individual requirements from a Job Description:
+    - Bullet / numbered lines are requirements as written.
+    - Other lines are split into sentences; those that read like a
+      requirement (years, skills, degree, "must", ...) are kept.
+    Duplicates and free-text fragments under three words (e.g. a
+    "Requirements" label) are dropped. Bullets come first; with
+    `max_requirements` only that many are returned.
+    """
+    bullets: List[str] = []
+    sentences: List[str] = []
+    for line in iter_lines(jd_text):
+        if is_heading(line):
+            continue
+        if BULLET_RE.match(line):
+            bullets.append(BULLET_RE.sub("", line).strip())
+            continue
+        for sentence in SENTENCE_RE.split(line):
+            if REQUIREMENT_HINT_RE.search(sentence) and len(sentence.split()) >= 3:
+                sentences.append(sentence.strip())
+
+    seen = set()
+    requirements = []
+    for text in bullets + sentences:
+        key = text.lower().rstrip(".;")
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        requirements.append(text)
+        if max_requirements is not None and len(requirements) >= max_requirements:
+            break
+    return requirements
+
+
+def match_evidence(
+    requirement_embs: np.ndarray, cv_embs: np.ndarray, top_n: int = 3
+) -> List[List[Tuple[int, float]]]:
+    """
+    For each requirement, the `top_n` most similar CV chunks as
+    (chunk_index, cosine_similarity), best first. One matrix product over
+    all requirement x chunk pairs.
+    """
+    if len(requirement_embs) == 0 or len(cv_embs) == 0:
+        return [[] for _ in range(len(requirement_embs))]
+    r = requirement_embs / np.maximum(np.linalg.norm(requirement_embs, axis=1, keepdims=True), 1e-12)
+    c = cv_embs / np.maximum(np.linalg.norm(cv_embs, axis=1, keepdims=True), 1e-12)
+    sims = r @ c.T
+    n = min(top_n, sims.shape[1])
+    top = np.argpartition(-sims, n - 1, axis=1)[:, :n]
+    matches = []
+    for row, cols in zip(sims, top):
+        cols = cols[np.argsort(-row[cols])]
+        matches.append([(int(j), float(row[j])) for j in cols])
+    return matches
+
+
+def requirement_prompt(requirement: str, evidence: Sequence[str]) -> str:
+    evidence_text = "\n\n".join(f"[{i}] {e}" for i, e in enumerate(evidence, start=1)) or "(none)"
+    return textwrap.dedent(
+        f"""
+        You are an expert technical recruiter checking one job requirement against a CV.
+
+        Requirement:
+        {requirement}
+
+        Most relevant CV excerpts:
+        {evidence_text}
+
+        Reply in exactly two lines:
+        Verdict: one of {" / ".join(MATCH_LABELS)}
+        Reason: one sentence citing the excerpt numbers, or saying what is missing.
+        """
+    )
+
+
+def reduce_prompt(
+    assessments: Sequence[Tuple[str, str]], cv_outline: str, unchecked: int = 0
+) -> str:
+    findings = "\n\n".join(
+        f"Requirement {i}: {req}\n{result.strip()}"
+        for i, (req, result) in enumerate(assessments, start=1)
+    )
+    if unchecked:
+        findings += (
+            f"\n\n{unchecked} further requirement(s) of the Job Description were not "
+            "checked. Do not assume they are met, and say so in the evaluation."
+        )
+    return textwrap.dedent(
+        f"""
+        You are an expert career coach and technical recruiter.
+
+        Each requirement of a Job Description has already been checked against
+        the candidate's CV:
+
+        {findings}
+
+        CV outline (first lines):
+        {cv_outline}
+
+        Task:
+        1) Evaluate how well the CV matches the Job Description (use one label: Low / Medium / High).
+        2) List the top 3 strengths of the candidate for this role.
+        3) List the top 3 missing or weak skills in the CV compared to the Job Description.
+        4) Provide concrete, practical suggestions to improve the CV to better fit this role.
+
+        Guidelines:
+        - Base the evaluation on the requirement checks above.
+        - Answer in clear English.
+        - Use headings and numbered or bulleted lists where appropriate.
+        - Be specific and actionable, not generic.
+        """
+    )
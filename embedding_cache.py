@@ -0,0 +1,128 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int = 200_000):
+        """
+        Content-addressed embedding cache:
+        - Key: SHA-1 of the model id + whitespace-normalized text.
+        - Value: float32 embedding vector.
+        - Stored in SQLite at `path` (use ":memory:" for a process-local cache).
+        - Bounded to `max_entries`; the least recently used entries are evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Streamlit runs each script execution in its own thread.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Like PdfPageCache: every lookup commits a last_used update, which in
+        # WAL mode is an append instead of a journal rewrite and fsync.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT MAX(last_used), COUNT(*) FROM embeddings").fetchone()
+        self._clock = row[0] or 0
+        # Kept in memory so a put does not scan the table to count it.
+        self._count = row[1]
+
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        normalized = " ".join(text.split())
+        return hashlib.sha1(f"{model_name}\0{normalized}".encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up the given keys. Returns only the keys that were found.
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for k, blob in rows:
+                    found[k] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                self._clock += 1
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(self._clock, k) for k in found],
+                )
+                self._conn.commit()
+
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]) -> None:
+        with self._lock:
+            self._clock += 1
+            rows = [
+                (k, np.asarray(v, dtype=np.float32).tobytes(), self._clock) for k, v in items
+            ]
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            added = self._conn.total_changes - before
+            self._count += added
+            if added < len(rows):
+                # Keys are content hashes, so a stored vector is already right.
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(self._clock, k) for k, _, _ in rows],
+                )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._count - self.max_entries
+        if excess > 0:
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._count -= cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def stats(self) -> dict:
+        """
+        Lookup counters since this cache was opened.
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,301 @@
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "hash")
+
+# Longest input the MiniLM family was trained on, special tokens included.
+MAX_SEQ_LENGTH = 256
+
+
+def encoder_dimension(encoder) -> int:
+    """
+    Output dimension of a SentenceTransformer-style encoder: reported by the
+    model when it can, otherwise measured by encoding one string.
+    """
+    get_dim = getattr(encoder, "get_sentence_embedding_dimension", None)
+    dim = get_dim() if get_dim is not None else None
+    if not dim:
+        dim = np.asarray(encoder.encode(["dimension probe"], convert_to_numpy=True)).shape[1]
+    return int(dim)
+
+
+# ---------- Backends ---------- #
+# Loaders run on first use (see LazyEncoder), so each backend's heavy
+# dependencies are only imported when that backend is actually used.
+
+def load_sentence_transformer(model_name: str, threads: Optional[int] = None):
+    # Imported here: sentence_transformers pulls in torch, which takes seconds.
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)  # process-wide in torch
+    return SentenceTransformer(model_name)
+
+
+class OnnxModel:
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str,
+        threads: Optional[int] = None,
+        max_seq_length: int = MAX_SEQ_LENGTH,
+    ):
+        """
+        Sentence embeddings from a transformer exported to ONNX, run with
+        ONNX Runtime on the CPU: mean pooling over the attention mask, then
+        L2 normalization (the same head as all-MiniLM-L6-v2). Needs neither
+        torch nor sentence-transformers.
+        `threads` sets ONNX Runtime's intra-op threads (default: all cores).
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self._batch_tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._batch_tokenizer.enable_truncation(max_length=max_seq_length)
+        self._batch_tokenizer.enable_padding()
+        # Untruncated copy for the chunker's token counts.
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+
+        dim = self.session.get_outputs()[0].shape[-1]
+        self._dim = dim if isinstance(dim, int) else None
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self._dim
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        out: List[np.ndarray] = []
+        # Sorting by length keeps padding, and so wasted compute, per batch small.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            out.append(self._encode_batch(batch))
+        embs = np.concatenate(out) if out else np.zeros((0, self._dim or 0), dtype=np.float32)
+        result = np.empty_like(embs)
+        result[order] = embs
+        return result
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._batch_tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+
+        if hidden.ndim == 3:  # token embeddings: mean-pool over real tokens
+            weights = mask[:, :, None].astype(np.float32)
+            hidden = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(hidden, axis=1, keepdims=True)
+        return (hidden / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _model_file(model_name: str, filename: str) -> str:
+    # A local model directory, or a file fetched (and cached) from the Hugging Face Hub.
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, filename)
+    from huggingface_hub import hf_hub_download
+
+    return hf_hub_download(repo_id=model_name, filename=filename)
+
+
+def quantized_model_path(model_path: str, model_name: str, cache_dir: str) -> str:
+    """
+    int8 copy of an ONNX model (dynamic quantization of the weights), made
+    once and reused from `cache_dir`.
+    """
+    safe_name = re.sub(r"[^\w.-]", "_", model_name)
+    path = os.path.join(cache_dir, f"{safe_name}-int8.onnx")
+    if os.path.exists(path):
+        return path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + f".{os.getpid()}.tmp"
+    start = time.perf_counter()
+    quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, path)
+    logger.info("Quantized %s to int8 in %.1fs.", model_name, time.perf_counter() - start)
+    return path
+
+
+def load_onnx_model(
+    model_name: str,
+    threads: Optional[int] = None,
+    quantize: bool = True,
+    cache_dir: str = "onnx_models",
+    onnx_file: str = "onnx/model.onnx",
+) -> OnnxModel:
+    model_path = _model_file(model_name, onnx_file)
+    if quantize:
+        model_path = quantized_model_path(model_path, model_name, cache_dir)
+    return OnnxModel(model_path, _model_file(model_name, "tokenizer.json"), threads)
+
+
+class HashEncoder:
+    """
+    Deterministic stand-in for SentenceTransformer: a normalized, hashed
+    bag of words. Similar texts get similar vectors, which is enough to
+    exercise the index and retrieval code paths.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.embedding_id = f"hash-{dim}"
+        self._buckets: Dict[str, int] = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for tok in text.lower().split():
+                bucket = self._buckets.get(tok)
+                if bucket is None:
+                    bucket = self._buckets[tok] = zlib.crc32(tok.encode("utf-8")) % self.dim
+                out[row, bucket] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+# ---------- Lazy loading ---------- #
+
+class LazyEncoder:
+    def __init__(
+        self,
+        model_name: str,
+        loader: Optional[Callable[[str], object]] = None,
+        batch_size: Optional[int] = None,
+        embedding_id: Optional[str] = None,
+    ):
+        """
+        SentenceTransformer-style encoder that loads its model on first use
+        instead of at construction:
+        - `encode`, `tokenizer` and `get_sentence_embedding_dimension` load it.
+        - `warm_up()` loads it in a background thread, so a session that
+          starts with a question does not wait for the whole load.
+        - Concurrent first calls load the model once.
+        `loader` builds the model from its name (default: SentenceTransformer).
+        `batch_size` is the model's forward-pass batch. `embedding_id` names
+        the vectors it produces, for the embedding cache and saved indexes
+        (default: the model name).
+        """
+        self.model_name = model_name
+        self.loader = loader or load_sentence_transformer
+        self.batch_size = batch_size
+        self.embedding_id = embedding_id or model_name
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self.loader(self.model_name)
+                    self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Start loading the model in a daemon thread (once). A failed warm-up
+        is logged; the next real call tries again and raises.
+        """
+        with self._lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self._warm, name="encoder-warm-up", daemon=True
+                )
+                self._warm_thread.start()
+            return self._warm_thread
+
+    def _warm(self) -> None:
+        try:
+            self.model
+        except Exception as e:
+            logger.warning("Could not warm up encoder %s: %s", self.model_name, e)
+
+    # ---------- SentenceTransformer interface ---------- #
+
+    def encode(self, texts, **kwargs):
+        if self.batch_size:
+            kwargs.setdefault("batch_size", self.batch_size)
+        return self.model.encode(texts, **kwargs)
+
+    @property
+    def tokenizer(self):
+        return getattr(self.model, "tokenizer", None)
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.model.get_sentence_embedding_dimension()
+
+
+def make_encoder(
+    backend: str = "torch",
+    model_name: str = DEFAULT_MODEL_NAME,
+    batch_size: Optional[int] = None,
+    threads: Optional[int] = None,
+    quantize: bool = True,
+    cache_dir: str = "onnx_models",
+):
+    """
+    Encoder for an embedding backend:
+    - torch: SentenceTransformer (PyTorch).
+    - onnx: the model's ONNX export on ONNX Runtime, int8-quantized unless
+      `quantize=False` (`pip install onnxruntime tokenizers huggingface_hub`).
+      The quantized model is written to `cache_dir` once.
+    - hash: HashEncoder, deterministic and model-free, for tests.
+    `batch_size` and `threads` set the forward-pass batch and the inference
+    threads (default: the library's own).
+    torch and onnx load lazily. Each backend has its own `embedding_id`, so
+    cached vectors and saved indexes from another backend are never mixed in.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}.")
+    if backend == "hash":
+        return HashEncoder()
+    if backend == "torch":
+        # Same id as before backends existed, so existing caches and indexes stay valid.
+        return LazyEncoder(model_name, partial(load_sentence_transformer, threads=threads), batch_size)
+    return LazyEncoder(
+        model_name,
+        partial(load_onnx_model, threads=threads, quantize=quantize, cache_dir=cache_dir),
+        batch_size,
+        embedding_id=f"onnx{'-int8' if quantize else ''}:{model_name}",
+    )
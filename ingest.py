@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from chunker import Chunker
+from pdf_text import PdfPageCache, extract_pages, file_digest, iter_pdf_pages, page_count
+
+# PDFs with at least this many pages are extracted lazily, page range by
+# page range, instead of as one string in a worker process.
+LARGE_PDF_PAGES = 64
+
+
+# ---------- Extraction ---------- #
+# Module-level functions so they can run in worker processes.
+
+def read_txt(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def read_pdf_pages(path: str, backend: str = "auto") -> List[str]:
+    return extract_pages(path, 0, page_count(path, backend), backend)
+
+
+def read_pdf(path: str, backend: str = "auto") -> str:
+    return "\n".join(read_pdf_pages(path, backend))
+
+
+def extract_text(
+    path: str, pdf_backend: str = "auto", page_cache: Optional[PdfPageCache] = None
+) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".txt":
+        return read_txt(path)
+    elif ext == ".pdf":
+        return "\n".join(iter_pdf_pages(path, pdf_backend, page_cache))
+    else:
+        return ""
+
+
+def _extract_for_pool(path: str, pdf_backend: str) -> Union[List[str], str, None]:
+    # PDFs come back as their pages, so the parent can cache them and the
+    # chunker can tell which page each chunk is on. Large PDFs come back as
+    # None, for the parent to extract page range by page range instead.
+    if os.path.splitext(path)[1].lower() == ".pdf":
+        num_pages = page_count(path, pdf_backend)
+        if num_pages >= LARGE_PDF_PAGES:
+            return None
+        return extract_pages(path, 0, num_pages, pdf_backend)
+    return extract_text(path)
+
+
+def iter_extracted(
+    file_paths: List[str],
+    max_workers: Optional[int] = None,
+    pdf_backend: str = "auto",
+    page_cache: Optional[PdfPageCache] = None,
+    digests: Optional[Dict[str, str]] = None,
+) -> Iterator[Tuple[str, Union[str, Iterable[str]]]]:
+    """
+    Extract text from files in a process pool and yield (path, text) as each
+    file finishes. At most 2 x max_workers results are in flight, so a large
+    upload never has all of its text in memory at once. A PDF's text is its
+    list (or iterator) of pages; other files are one string.
+
+    PDFs already in `page_cache` (keyed by content hash; `digests` maps
+    path -> hash when the caller has it) and PDFs of LARGE_PDF_PAGES pages or
+    more are yielded last as lazy page iterators; large ones are extracted
+    by all workers in parallel, page range by page range. Page counts are
+    read by the workers, not up front in this process.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    digests = digests or {}
+
+    eager, lazy = [], []
+    for path in file_paths:
+        if os.path.splitext(path)[1].lower() != ".pdf":
+            eager.append(path)
+            continue
+        if page_cache is not None:
+            digests[path] = digests.get(path) or file_digest(path)
+            if page_cache.num_pages(digests[path]) is not None:
+                lazy.append(path)
+                continue
+        eager.append(path)
+
+    for path, text in _iter_pool(eager, max_workers, pdf_backend):
+        if text is None:
+            lazy.append(path)
+            continue
+        if isinstance(text, list) and page_cache is not None:
+            page_cache.put_pages(digests[path], 0, text)
+            page_cache.finish(digests[path], len(text))
+        yield path, text
+
+    for path in lazy:
+        yield path, iter_pdf_pages(
+            path, pdf_backend, page_cache, page_workers=max_workers, digest=digests.get(path)
+        )
+
+
+def _iter_pool(
+    file_paths: List[str], max_workers: int, pdf_backend: str
+) -> Iterator[Tuple[str, Union[List[str], str, None]]]:
+    if max_workers <= 1 or len(file_paths) <= 1:
+        # Not worth the pool start-up cost.
+        for path in file_paths:
+            yield path, _extract_for_pool(path, pdf_backend)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        queue = iter(file_paths)
+        for path in queue:
+            pending[pool.submit(_extract_for_pool, path, pdf_backend)] = path
+            if len(pending) >= 2 * max_workers:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path = pending.pop(fut)
+                next_path = next(queue, None)
+                if next_path is not None:
+                    pending[pool.submit(_extract_for_pool, next_path, pdf_backend)] = next_path
+                yield path, fut.result()
+
+
+# ---------- Chunking ---------- #
+
+def iter_chunks(text: str, chunk_size: int = 500, overlap: int = 100) -> Iterator[str]:
+    """
+    Normalize text and yield overlapping character chunks.
+    See chunker.Chunker for token- and sentence-aware strategies.
+    """
+    return Chunker("chars", chunk_size=chunk_size, overlap=overlap).iter_chunks(text)
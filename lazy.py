@@ -0,0 +1,35 @@
+import importlib
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        """
+        Stand-in for a heavy module (faiss, pypdf, ...) that imports it on
+        first attribute access, so importing the engine stays cheap and code
+        paths that never touch the module never pay for it.
+        """
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            # importlib serializes concurrent imports of the same module.
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
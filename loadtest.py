@@ -0,0 +1,151 @@
+"""
+Replay load tester for service.py.
+
+Reads a JSON-lines query log, one request per line. Each line uses "query"
+if present, otherwise "title" (as in requests.jsonl), plus an optional
+"tenant". The lines are replayed against the service and the tool reports
+latency percentiles, throughput and rejections.
+
+    python service.py --stub --stub-delay 0.05 &
+    python loadtest.py requests.jsonl --index sample.txt --concurrency 32
+    python loadtest.py queries.jsonl --endpoint retrieve --rate 200 --repeat 5
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def load_queries(path: str) -> List[Dict[str, str]]:
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = record.get("query") or record.get("title")
+            if text:
+                queries.append({"query": text, "tenant": record.get("tenant", "default")})
+    return queries
+
+
+def post(url: str, payload: dict, timeout: float) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def replay(
+    url: str,
+    endpoint: str,
+    queries: List[Dict[str, str]],
+    concurrency: int = 16,
+    rate: float = 0.0,
+    top_k: int = 5,
+    timeout: float = 120.0,
+) -> dict:
+    """
+    Send every query once. With `rate` > 0 requests start on an open-loop
+    schedule (rate per second, independent of responses); otherwise
+    `concurrency` clients send back to back.
+    """
+    target = f"{url.rstrip('/')}/{endpoint}"
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def send(i: int) -> None:
+        if rate > 0:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        q = queries[i]
+        t0 = time.perf_counter()
+        try:
+            status = post(target, {"query": q["query"], "tenant": q["tenant"], "top_k": top_k}, timeout)
+        except OSError:
+            status = 0  # connection error or client timeout
+        elapsed = time.perf_counter() - t0
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(len(queries))))
+    wall = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "endpoint": endpoint,
+        "requests": len(queries),
+        "ok": len(latencies),
+        "rejected": statuses.get("503", 0),
+        "statuses": statuses,
+        "wall_s": wall,
+        "throughput_per_s": len(latencies) / wall if wall else 0.0,
+        "p50_ms": float(np.percentile(lat_ms, 50)) if len(lat_ms) else None,
+        "p95_ms": float(np.percentile(lat_ms, 95)) if len(lat_ms) else None,
+        "p99_ms": float(np.percentile(lat_ms, 99)) if len(lat_ms) else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="JSON-lines file of queries (e.g. requests.jsonl).")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="answer", choices=("answer", "retrieve"))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (0 = closed loop).")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the log this many times.")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--index", nargs="*", default=[], help="Files (under the service's --data-dir) to index first.")
+    parser.add_argument("--output", help="Write the report as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    queries = load_queries(args.log) * args.repeat
+    if not queries:
+        print(f"No queries found in {args.log}.", file=sys.stderr)
+        return 1
+
+    if args.index:
+        tenants = sorted({q["tenant"] for q in queries})
+        for tenant in tenants:
+            status = post(f"{args.url.rstrip('/')}/index", {"paths": args.index, "tenant": tenant}, args.timeout)
+            if status != 200:
+                print(f"Indexing for tenant {tenant!r} failed with HTTP {status}.", file=sys.stderr)
+                return 1
+
+    report = replay(
+        args.url, args.endpoint, queries, args.concurrency, args.rate, args.top_k, args.timeout
+    )
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f"{value:.4g}"
+        print(f"  {key:<18} {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
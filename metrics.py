@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+# Prometheus-style upper bounds, in seconds for spans and in units for sizes.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+
+class Histogram:
+    def __init__(self, buckets, window: int = 2048):
+        """
+        Cumulative bucket counts for export plus a window of recent samples
+        for percentiles.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        return float(np.percentile(np.fromiter(self.recent, dtype=float), q))
+
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.record_span(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, prefix: str = "rag"):
+        """
+        In-process instrumentation for RAGEngine:
+        - `span(stage)` times a stage (extract, chunk, embed, add, search,
+          prompt, generate) into a latency histogram.
+        - `count(name)` increments a counter (cache hits, chunks added, ...).
+        - `observe(name, value)` records a size (chunk chars, prompt tokens, ...).
+        - Listeners added with `add_listener` receive every span as
+          (stage, seconds), e.g. to forward them to a tracing backend.
+        Export with `to_prometheus()` or `to_json()`.
+        """
+        self.prefix = prefix
+        self.spans: Dict[str, Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._listeners: List[Callable[[str, float], None]] = []
+        self._lock = threading.Lock()
+
+    def span(self, stage: str) -> _Span:
+        return _Span(self, stage)
+
+    def timed_iter(self, iterable: Iterable, stage: str) -> Iterator:
+        """
+        Re-yield `iterable`, timing each wait for the next item as a `stage` span.
+        """
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.record_span(stage, time.perf_counter() - start)
+            yield item
+
+    def record_span(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.spans.get(stage)
+            if hist is None:
+                hist = self.spans[stage] = Histogram(LATENCY_BUCKETS)
+            hist.observe(seconds)
+        for listener in self._listeners:
+            listener(stage, seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            hist = self.sizes.get(name)
+            if hist is None:
+                hist = self.sizes[name] = Histogram(SIZE_BUCKETS)
+            hist.observe(value)
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        self._listeners.append(listener)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self.sizes.clear()
+            self.counters.clear()
+
+    # ---------- Export ---------- #
+
+    def snapshot(self) -> dict:
+        """
+        Plain-dict view: per-stage count / total / p50 / p95 (seconds),
+        per-size count / mean / p50 / p95, and counters.
+        """
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": h.count,
+                        "total_s": h.total,
+                        "p50_s": h.percentile(50),
+                        "p95_s": h.percentile(95),
+                    }
+                    for name, h in self.spans.items()
+                },
+                "sizes": {
+                    name: {
+                        "count": h.count,
+                        "mean": h.total / h.count if h.count else None,
+                        "p50": h.percentile(50),
+                        "p95": h.percentile(95),
+                    }
+                    for name, h in self.sizes.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        p = self.prefix
+        lines: List[str] = []
+        with self._lock:
+            if self.spans:
+                lines.append(f"# HELP {p}_stage_seconds Time spent per RAG stage.")
+                lines.append(f"# TYPE {p}_stage_seconds histogram")
+                for name, h in sorted(self.spans.items()):
+                    lines.extend(_histogram_lines(f"{p}_stage_seconds", f'stage="{name}"', h))
+            if self.sizes:
+                lines.append(f"# HELP {p}_size Sizes of chunks, prompts and answers.")
+                lines.append(f"# TYPE {p}_size histogram")
+                for name, h in sorted(self.sizes.items()):
+                    lines.extend(_histogram_lines(f"{p}_size", f'name="{name}"', h))
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.append(f"{p}_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics(Metrics):
+    """
+    Disabled instrumentation: every call is a no-op, so an engine without
+    metrics pays one attribute lookup and an empty context manager per stage.
+    """
+
+    enabled = False
+
+    def span(self, stage: str) -> "_NullSpan":
+        return _NULL_SPAN
+
+    def timed_iter(self, iterable: Iterable, stage: str) -> Iterable:
+        return iterable
+
+    def record_span(self, stage: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, value: float = 1) -> None:
+        pass
+
+    def observe(self, name: str, value: float) -> None:
+        pass
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+NULL_METRICS = NullMetrics()
+
+
+def _histogram_lines(metric: str, labels: str, h: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, n in zip(h.buckets, h.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.count}')
+    lines.append(f"{metric}_sum{{{labels}}} {h.total:g}")
+    lines.append(f"{metric}_count{{{labels}}} {h.count}")
+    return lines
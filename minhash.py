@@ -0,0 +1,133 @@
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+SHINGLE_RE = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1  # keeps a * h + b below 2**62, so uint64 never overflows
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """
+    crc32 of every `size`-word window of the lowercased text (unique, uint64).
+    Short texts with fewer than `size` words become a single shingle.
+    """
+    words = SHINGLE_RE.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    if len(words) < size:
+        grams = [" ".join(words)]
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    hashes = {zlib.crc32(g.encode("utf-8")) for g in grams}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        MinHash signatures over word shingles: the fraction of equal
+        positions in two signatures estimates the Jaccard similarity of the
+        two documents' shingle sets.
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str, block: int = 8192) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size) % _PRIME
+        sig = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        # Blocks bound the (num_perm x shingles) temporary for long documents.
+        for start in range(0, len(hashes), block):
+            h = hashes[start:start + block]
+            values = (self._a[:, None] * h[None, :] + self._b[:, None]) % _PRIME
+            np.minimum(sig, values.min(axis=1), out=sig)
+        return sig
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class MinHashIndex:
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        """
+        LSH over MinHash signatures: each signature is cut into `bands` bands
+        of num_perm / bands rows; documents sharing any whole band are
+        candidates, which are then checked with the full signature.
+        With 16 bands of 8 rows, pairs above ~0.7 Jaccard are found with
+        high probability.
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def _band_keys(self, sig: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, sig: np.ndarray) -> None:
+        self.remove(key)
+        self._signatures[key] = sig
+        for band, band_key in self._band_keys(sig):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        sig = self._signatures.pop(key, None)
+        if sig is None:
+            return
+        for band, band_key in self._band_keys(sig):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, sig: np.ndarray, threshold: float) -> Optional[Tuple[str, float]]:
+        """
+        Most similar indexed key with estimated Jaccard >= threshold, as
+        (key, similarity), or None.
+        """
+        candidates: Set[str] = set()
+        for band, band_key in self._band_keys(sig):
+            candidates |= self._buckets[band].get(band_key, set())
+        best = None
+        for key in candidates:
+            sim = estimated_jaccard(sig, self._signatures[key])
+            if sim >= threshold and (best is None or sim > best[1]):
+                best = (key, sim)
+        return best
+
+    # ---------- Persistence ---------- #
+
+    def save(self, path: str) -> None:
+        keys = sorted(self._signatures)
+        sigs = (
+            np.stack([self._signatures[k] for k in keys])
+            if keys else np.zeros((0, self.num_perm), dtype=np.uint64)
+        )
+        with open(path, "wb") as f:
+            np.savez(f, keys=np.array(keys, dtype=str), signatures=sigs, bands=np.array([self.bands]))
+
+    @classmethod
+    def open(cls, path: str) -> "MinHashIndex":
+        data = np.load(path)
+        sigs = data["signatures"]
+        index = cls(num_perm=sigs.shape[1], bands=int(data["bands"][0]))
+        for key, sig in zip(data["keys"].tolist(), sigs):
+            index.add(key, sig.copy())
+        return index
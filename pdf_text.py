@@ -0,0 +1,278 @@
+import hashlib
+import importlib
+import importlib.util
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from lazy import lazy_module
+
+
+# Both PDF libraries are imported on first extraction, not with the engine.
+pypdf = lazy_module("pypdf")
+
+logger = logging.getLogger(__name__)
+
+PDF_BACKENDS = ("auto", "pymupdf", "pypdf")
+
+# Pages per worker task when a single PDF is extracted in parallel.
+PAGES_PER_TASK = 16
+
+
+def _pymupdf_name() -> Optional[str]:
+    # find_spec locates the package without importing it.
+    for name in ("pymupdf", "fitz"):  # "fitz" in older PyMuPDF releases
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return None
+
+
+def _pymupdf():
+    return importlib.import_module(_pymupdf_name())
+
+
+def resolve_backend(backend: str = "auto") -> str:
+    """
+    "auto" picks PyMuPDF when it is installed (several times faster than
+    pypdf on text-heavy PDFs) and pypdf otherwise.
+    """
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}; expected one of {PDF_BACKENDS}.")
+    if backend == "auto":
+        return "pymupdf" if _pymupdf_name() is not None else "pypdf"
+    if backend == "pymupdf" and _pymupdf_name() is None:
+        raise ValueError("The pymupdf backend needs `pip install pymupdf`.")
+    return backend
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ---------- Backends ---------- #
+# Module-level functions so they can run in worker processes.
+
+def page_count(path: str, backend: str = "auto") -> int:
+    if resolve_backend(backend) == "pymupdf":
+        try:
+            with _pymupdf().open(path) as doc:
+                return doc.page_count
+        except Exception:
+            pass  # fall back to pypdf below
+    return len(pypdf.PdfReader(path).pages)
+
+
+def extract_pages(path: str, start: int, end: int, backend: str = "auto") -> List[str]:
+    """
+    Text of pages [start, end). A page the chosen backend cannot read is
+    retried with pypdf; a page neither can read is logged and left empty.
+    """
+    backend = resolve_backend(backend)
+    texts: List[Optional[str]] = [None] * (end - start)
+
+    if backend == "pymupdf":
+        try:
+            with _pymupdf().open(path) as doc:
+                for i in range(start, end):
+                    try:
+                        texts[i - start] = doc[i].get_text()
+                    except Exception:
+                        pass
+        except Exception as e:
+            logger.warning("PyMuPDF could not open %s (%s); using pypdf.", path, e)
+
+    if any(t is None for t in texts):
+        reader = pypdf.PdfReader(path)
+        for i in range(start, end):
+            if texts[i - start] is not None:
+                continue
+            try:
+                texts[i - start] = reader.pages[i].extract_text() or ""
+            except Exception as e:
+                logger.warning("Could not extract page %d of %s: %s", i + 1, path, e)
+                texts[i - start] = ""
+    return texts
+
+
+# ---------- Page cache ---------- #
+
+class PdfPageCache:
+    def __init__(self, path: str, max_pages: int = 500_000):
+        """
+        SQLite cache of extracted PDF text, keyed by file content hash and
+        page number:
+        - A file is served from the cache only once all its pages are stored,
+          so an interrupted extraction is simply redone.
+        - Pages are read back with a cursor, one at a time.
+        - Least recently used files are evicted beyond `max_pages` pages.
+        """
+        self.path = path
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_files "
+            "(digest TEXT PRIMARY KEY, num_pages INTEGER, last_used INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_pages "
+            "(digest TEXT, page INTEGER, text TEXT, PRIMARY KEY (digest, page))"
+        )
+        self._conn.commit()
+
+    def num_pages(self, digest: str) -> Optional[int]:
+        """
+        Page count of a fully cached file, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT num_pages FROM pdf_files WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE pdf_files SET last_used = ? WHERE digest = ?",
+                (time.time_ns(), digest),
+            )
+            self._conn.commit()
+            return row[0]
+
+    def iter_pages(self, digest: str, batch: int = 16) -> Iterator[str]:
+        page = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT text FROM pdf_pages WHERE digest = ? AND page >= ? "
+                    "ORDER BY page LIMIT ?",
+                    (digest, page, batch),
+                ).fetchall()
+            if not rows:
+                return
+            for (text,) in rows:
+                yield text
+            page += len(rows)
+
+    def put_pages(self, digest: str, start: int, texts: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pdf_pages (digest, page, text) VALUES (?, ?, ?)",
+                [(digest, start + i, t) for i, t in enumerate(texts)],
+            )
+            self._conn.commit()
+
+    def finish(self, digest: str, num_pages: int) -> None:
+        """
+        Mark a file complete once all `num_pages` pages are stored.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_files (digest, num_pages, last_used) VALUES (?, ?, ?)",
+                (digest, num_pages, time.time_ns()),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(num_pages), 0) FROM pdf_files").fetchone()[0]
+        if total <= self.max_pages:
+            return
+        for digest, num_pages in self._conn.execute(
+            "SELECT digest, num_pages FROM pdf_files ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_pages:
+                break
+            self._conn.execute("DELETE FROM pdf_files WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM pdf_pages WHERE digest = ?", (digest,))
+            total -= num_pages
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, pages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(num_pages), 0) FROM pdf_files"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "files": files,
+            "pages": pages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- Lazy page iteration ---------- #
+
+def iter_pdf_pages(
+    path: str,
+    backend: str = "auto",
+    cache: Optional[PdfPageCache] = None,
+    page_workers: int = 1,
+    digest: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in order:
+    - From `cache` when the file's content hash is already there.
+    - Otherwise in ranges of PAGES_PER_TASK pages, spread over
+      `page_workers` processes for large files, with at most two ranges per
+      worker in flight so a huge manual is never held in memory at once.
+    Extracted pages are written to `cache` as they arrive.
+    """
+    backend = resolve_backend(backend)
+    if cache is not None:
+        digest = digest or file_digest(path)
+        if cache.num_pages(digest) is not None:
+            yield from cache.iter_pages(digest)
+            return
+
+    n = page_count(path, backend)
+    ranges = [(s, min(s + PAGES_PER_TASK, n)) for s in range(0, n, PAGES_PER_TASK)]
+
+    for start, texts in _iter_ranges(path, ranges, backend, page_workers):
+        if cache is not None:
+            cache.put_pages(digest, start, texts)
+        yield from texts
+
+    if cache is not None:
+        cache.finish(digest, n)
+
+
+def _iter_ranges(
+    path: str, ranges: List[Tuple[int, int]], backend: str, page_workers: int
+) -> Iterator[Tuple[int, List[str]]]:
+    if page_workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield start, extract_pages(path, start, end, backend)
+        return
+
+    with ProcessPoolExecutor(max_workers=page_workers) as pool:
+        in_flight = []
+        queue = iter(ranges)
+        for start, end in queue:
+            in_flight.append((start, pool.submit(extract_pages, path, start, end, backend)))
+            if len(in_flight) >= 2 * page_workers:
+                break
+        # Results are consumed in page order; later ranges keep running meanwhile.
+        while in_flight:
+            start, fut = in_flight.pop(0)
+            nxt = next(queue, None)
+            if nxt is not None:
+                in_flight.append((nxt[0], pool.submit(extract_pages, path, nxt[0], nxt[1], backend)))
+            yield start, fut.result()
@@ -0,0 +1,224 @@
+import json
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Optional, Tuple
+
+import numpy as np
+
+from lazy import lazy_module
+
+
+# Imported when the first index is built or loaded.
+faiss = lazy_module("faiss")
+
+QUANTIZED_TYPES = ("sq8", "binary")
+
+
+class FloatRows:
+    def __init__(self, dim: int, path: Optional[str] = None):
+        """
+        Float32 vectors stored by id in a flat file (row i = id i) and read
+        back through a memory map, so re-scoring touches only the candidate
+        rows and the vectors never have to be resident.
+        Without `path`, rows go to a temporary file removed with the object.
+        An opened file is read-only until the first write, which copies it.
+        """
+        self.dim = dim
+        self._row_bytes = dim * 4
+        self._map: Optional[np.ndarray] = None
+        if path is None:
+            self._new_temp_file()
+            self._rows = 0
+        else:
+            self.path = path
+            self._owned = False
+            self._rows = os.path.getsize(path) // self._row_bytes
+
+    def _new_temp_file(self, copy_from: Optional[str] = None) -> None:
+        fd, path = tempfile.mkstemp(prefix="rag_vectors_", suffix=".f32")
+        os.close(fd)
+        if copy_from is not None:
+            shutil.copyfile(copy_from, path)
+        self.path = path
+        self._owned = True
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+        self._map = None
+
+    def __len__(self) -> int:
+        # Tracked rather than read from the file: an opened version directory
+        # may be pruned while its map is still in use.
+        return self._rows
+
+    def put(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        if not self._owned:
+            self._new_temp_file(copy_from=self.path)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.path, "r+b") as f:
+            if len(ids) and np.array_equal(ids, np.arange(ids[0], ids[0] + len(ids))):
+                f.seek(int(ids[0]) * self._row_bytes)
+                f.write(vectors.tobytes())
+            else:
+                for i, row in zip(ids, vectors):
+                    f.seek(int(i) * self._row_bytes)
+                    f.write(row.tobytes())
+        if len(ids):
+            self._rows = max(self._rows, int(ids.max()) + 1)
+        self._map = None
+
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        if self._map is None:
+            rows = len(self)
+            self._map = (
+                np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+                if rows else np.zeros((0, self.dim), dtype=np.float32)
+            )
+        return np.asarray(self._map[ids])
+
+    def save(self, path: str) -> None:
+        shutil.copyfile(self.path, path)
+        if not self._owned:
+            # Follow the newest copy; older version directories get pruned.
+            self.path = path
+            self._map = None
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class QuantizedIndex:
+    def __init__(self, kind: str, dim: int, rescore_factor: int = 10, rows: Optional[FloatRows] = None):
+        """
+        Compressed vector index with a float re-scoring pass:
+        - sq8: 8-bit scalar quantization, 1 byte per dimension (4x smaller).
+        - binary: one bit per dimension (sign against the per-dimension
+          median of the training vectors), searched by Hamming distance
+          (32x smaller).
+        The compressed codes select `rescore_factor * k` candidates, which
+        are re-ranked by exact L2 distance against the float vectors kept
+        in a memory-mapped FloatRows file. rescore_factor=0 skips re-scoring.
+        Exposes the subset of the FAISS index API that RAGEngine uses.
+        """
+        if kind not in QUANTIZED_TYPES:
+            raise ValueError(f"Unknown quantized index {kind!r}; expected one of {QUANTIZED_TYPES}.")
+        if kind == "binary" and dim % 8:
+            raise ValueError(f"Binary codes need a dimension divisible by 8, got {dim}.")
+        self.kind = kind
+        self.d = dim
+        self.rescore_factor = rescore_factor
+        self.rows = rows if rows is not None else FloatRows(dim)
+        self.thresholds: Optional[np.ndarray] = None
+        if kind == "sq8":
+            self.codes = faiss.IndexIDMap2(
+                faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+            )
+        else:
+            self.codes = faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(dim))
+
+    @property
+    def ntotal(self) -> int:
+        return self.codes.ntotal
+
+    @property
+    def is_trained(self) -> bool:
+        if self.kind == "binary":
+            return self.thresholds is not None
+        return self.codes.is_trained
+
+    def train(self, vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.kind == "binary":
+            self.thresholds = np.median(vectors, axis=0).astype(np.float32)
+        else:
+            self.codes.train(vectors)
+
+    def _binarize(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > self.thresholds, axis=1)
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not self.is_trained:
+            raise RuntimeError(f"The {self.kind} index must be trained before adding vectors.")
+        self.rows.put(ids, vectors)
+        if self.kind == "binary":
+            self.codes.add_with_ids(self._binarize(vectors), ids)
+        else:
+            self.codes.add_with_ids(vectors, ids)
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        # Float rows of removed ids stay in the file unused; ids are never reused.
+        return self.codes.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        # Exact vectors, so rebuilding into another index type loses nothing.
+        return self.rows.get(np.asarray(ids, dtype=np.int64))
+
+    def search(self, queries: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        # `params` (e.g. an id selector) applies to the code scan.
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        fetch_k = k * self.rescore_factor if self.rescore_factor > 0 else k
+        fetch_k = max(k, min(fetch_k, self.ntotal))
+        if self.kind == "binary":
+            distances, ids = self.codes.search(self._binarize(queries), fetch_k, params=params)
+            distances = distances.astype(np.float32)
+        else:
+            distances, ids = self.codes.search(queries, fetch_k, params=params)
+        if self.rescore_factor <= 0:
+            return distances[:, :k], ids[:, :k]
+
+        out_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+        out_i = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, cand) in enumerate(zip(queries, ids)):
+            cand = cand[cand >= 0]
+            if len(cand) == 0:
+                continue
+            diff = self.rows.get(cand) - query
+            exact = np.einsum("ij,ij->i", diff, diff)
+            order = np.argsort(exact, kind="stable")[:k]
+            out_d[row, :len(order)] = exact[order]
+            out_i[row, :len(order)] = cand[order]
+        return out_d, out_i
+
+    def nbytes(self) -> int:
+        """
+        Resident size: codes plus id maps. The float rows are memory-mapped
+        and only paged in for re-scoring, so they are not counted.
+        """
+        n = self.ntotal
+        code_size = self.d // 8 if self.kind == "binary" else self.d
+        return n * (code_size + 8 + 16)
+
+    # ---------- Persistence ---------- #
+
+    def save(self, directory: str) -> None:
+        """
+        Write quantized.json, the codes and vectors.f32 into `directory`.
+        """
+        if self.kind == "binary":
+            faiss.write_index_binary(self.codes, os.path.join(directory, "codes.faiss"))
+            np.save(os.path.join(directory, "thresholds.npy"), self.thresholds)
+        else:
+            faiss.write_index(self.codes, os.path.join(directory, "codes.faiss"))
+        self.rows.save(os.path.join(directory, "vectors.f32"))
+        with open(os.path.join(directory, "quantized.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "dim": self.d, "rescore_factor": self.rescore_factor}, f)
+
+    @classmethod
+    def open(cls, directory: str) -> "QuantizedIndex":
+        with open(os.path.join(directory, "quantized.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        rows = FloatRows(meta["dim"], path=os.path.join(directory, "vectors.f32"))
+        index = cls(meta["kind"], meta["dim"], meta["rescore_factor"], rows=rows)
+        codes_path = os.path.join(directory, "codes.faiss")
+        if index.kind == "binary":
+            index.codes = faiss.read_index_binary(codes_path)
+            index.thresholds = np.load(os.path.join(directory, "thresholds.npy"))
+        else:
+            index.codes = faiss.read_index(codes_path)
+        return index
@@ -1,177 +1,990 @@
+import asyncio
+import json
 import os
+import queue
+import shutil
 import textwrap
-from typing import List, Tuple
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
-import google.generativeai as genai
 
+from answer_cache import AnswerCache
+from bm25 import BM25Index, reciprocal_rank_fusion
+from chunk_store import ChunkFilter, ChunkStore, RetrievedChunk
+from chunker import Chunker, iter_lines, lazy_tokenizer_counter
+from cv_match import extract_requirements, match_evidence, reduce_prompt, requirement_prompt
+from embedding_cache import EmbeddingCache
+from encoders import DEFAULT_MODEL_NAME, encoder_dimension, make_encoder
+from ingest import extract_text, iter_extracted
+from lazy import lazy_module
+from metrics import NULL_METRICS, Metrics
+from minhash import MinHasher, MinHashIndex
+from pdf_text import PdfPageCache, file_digest
+from reranker import CrossEncoderReranker
+from sharded_index import SHARD_ROUTES, ShardedIndex
+from vector_index import (
+    INDEX_TYPES,
+    MIN_TRAIN_POINTS,
+    TRAINED_TYPES,
+    compare_index_modes,
+    index_kind,
+    index_nbytes,
+    make_index,
+    read_index,
+    search_subset,
+    set_search_params,
+    train_and_add,
+    write_index,
+)
 
-class RetrievedChunk:
-    def __init__(self, content: str, source: str):
-        self.content = content
-        self.source = source
+
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+
+# Imported on first generation; the SDK alone takes about a second to import.
+genai = lazy_module("google.generativeai")
+
+# Bump whenever the on-disk layout written by RAGEngine.save changes.
+INDEX_FORMAT_VERSION = 2
+
+NO_PASSAGES_MESSAGE = "No relevant passages were found in your documents for this question."
+SNIPPETS_HEADER = "Here are the most relevant passages from your documents:"
+LLM_FALLBACK_HEADER = "Could not reach Gemini, so here are the most relevant passages instead:"
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+CV_JD_MODES = ("auto", "single", "map_reduce")
+UNKNOWN_ASSESSMENT = "Verdict: Unknown\nReason: the model could not assess this requirement."
+
+LLM_TIMEOUT_HEADER = "Gemini timed out, so here are the most relevant passages instead:"
+
+
+class LazyGemini:
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL_NAME):
+        """
+        Gemini client that imports and configures the SDK on the first
+        `generate_content` call (or in the background via `warm_up`).
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def warm_up(self) -> threading.Thread:
+        thread = threading.Thread(target=self._warm, name="gemini-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm(self) -> None:
+        try:
+            self.model
+        except Exception:
+            pass  # generate_content raises it again, where callers handle it
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        return self.model.generate_content(prompt, stream=stream)
 
 
 class RAGEngine:
-    def __init__(self, embedding_dim: int = 384):
+    def __init__(
+        self,
+        embedding_dim: Optional[int] = None,
+        model_name: str = DEFAULT_MODEL_NAME,
+        embedding_backend: str = "torch",
+        embedding_cache: Optional[EmbeddingCache] = None,
+        ingest_workers: Optional[int] = None,
+        embed_batch_size: int = 256,
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        pq_m: int = 16,
+        rescore_factor: int = 10,
+        train_threshold: int = 10_000,
+        num_shards: int = 1,
+        shard_by: str = "hash",
+        llm=None,
+        answer_cache: Optional[AnswerCache] = None,
+        mmap_chunks: bool = True,
+        retrieval_mode: str = "dense",
+        rrf_k: int = 60,
+        embed_model=None,
+        metrics: Optional[Metrics] = None,
+        chunker: Optional[Chunker] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        rerank_candidates: int = 20,
+        answer_top_k: int = 5,
+        pdf_backend: str = "auto",
+        page_cache: Optional[PdfPageCache] = None,
+        duplicate_threshold: Optional[float] = None,
+        cv_jd_mode: str = "auto",
+        cv_jd_max_chars: int = 12_000,
+        cv_jd_workers: int = 4,
+        cv_jd_max_requirements: Optional[int] = None,
+        warm_up: bool = False,
+        tenant: Optional[str] = None,
+    ):
         """
         RAG engine:
-        - Reads PDF and TXT files.
-        - Builds a FAISS index using sentence-transformers embeddings.
-        - Uses Gemini for answer generation when configured.
+        - Reads PDF and TXT files in parallel worker processes.
+        - Builds a FAISS index from `model_name` embeddings computed by
+          `embedding_backend` (torch / onnx / hash, see encoders.make_encoder).
+          Any object with a SentenceTransformer-style `encode` can be passed
+          as `embed_model` instead. The vector dimension is taken from the
+          encoder (or a loaded index) unless `embedding_dim` is given, and
+          every batch is checked against it.
+          `index_type` is one of flat / ivf_flat / hnsw / ivf_pq / sq8 / binary;
+          IVF and quantized modes start as flat and are trained once the corpus
+          reaches `train_threshold`. sq8 / binary re-score `rescore_factor * k`
+          candidates with float vectors memory-mapped from disk.
+          With `num_shards` > 1 the index is split into that many shards
+          (by chunk id, or with `shard_by="source"` by source file) that are
+          searched in parallel and merged into the same top-k; saved shards
+          are read on first use (see sharded_index.py).
+        - Reuses cached embeddings for text it has already seen, when given a cache.
+        - Saves / loads the index to a versioned directory on disk.
+        - Uses Gemini for answer generation when configured. Any object with a
+          Gemini-style `generate_content(prompt, stream=False)` can be passed
+          as `llm` instead (e.g. a local fake in tests).
+        - Retrieval is dense (FAISS), lexical (BM25 inverted index, no encoder)
+          or hybrid (both, merged by reciprocal-rank fusion), per `retrieval_mode`.
+        - Keeps each chunk's page, section and upload time in compact columns
+          (see ChunkStore). Searches given a ChunkFilter (`where`) rank only
+          the matching chunks, e.g. one CV, instead of filtering afterwards.
+          Retrieved chunks are labelled with `tenant`.
+        - Reuses generated answers for repeated or paraphrased questions that
+          retrieve the same passages, when given an answer cache.
+        - Splits text with `chunker` (default: 500-char windows, 100 overlap);
+          token-based strategies count tokens with the encoder's tokenizer.
+        - With a `reranker`, over-fetches `rerank_candidates` chunks and keeps
+          the cross-encoder's top-k (vector order if its time budget runs out).
+          `answer` sends `answer_top_k` passages to the LLM.
+        - Extracts PDFs with `pdf_backend` (PyMuPDF if installed, else pypdf);
+          a `page_cache` makes re-extracting an already seen PDF a hash lookup.
+        - Skips files whose content is already indexed under another name
+          and, with `duplicate_threshold`, files whose MinHash similarity to an
+          indexed file is at least that high (e.g. the same CV sent twice).
+        - CV vs JD analysis sends both texts in one prompt, or (`cv_jd_mode`
+          "map_reduce", or "auto" once they exceed `cv_jd_max_chars`) checks
+          each JD requirement against its best-matching CV chunks in
+          `cv_jd_workers` parallel LLM calls and summarizes the verdicts.
+          `cv_jd_max_requirements` caps the calls; requirements past it are
+          reported as unchecked.
+        - Records per-stage timings, sizes and cache hits into `metrics`
+          (see metrics.py); without it instrumentation is a no-op.
+        - Construction is cheap: the encoder loads on the first embedding
+          (see encoders.LazyEncoder), and FAISS, pypdf and the Gemini SDK are
+          imported on first use. `warm_up=True` starts loading the encoder
+          and Gemini client in background threads right away.
         """
+        self.tenant = tenant
+
         # Embedding model
-        self.embed_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        self.embedding_dim = embedding_dim
+        self.model_name = model_name
+        self.embed_model = (
+            embed_model if embed_model is not None else make_encoder(embedding_backend, model_name)
+        )
+        # Names the vectors (model and backend) for the embedding cache and saved indexes.
+        self.embedding_id = getattr(self.embed_model, "embedding_id", None) or model_name
+        self._embedding_dim = embedding_dim
+        self.embedding_cache = embedding_cache
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.answer_top_k = answer_top_k
+
+        self.chunker = chunker if chunker is not None else Chunker()
+        if self.chunker.token_counter is None:
+            # Resolved on first use: reading `tokenizer` loads a lazy encoder.
+            encoder = self.embed_model
+            self.chunker.token_counter = lazy_tokenizer_counter(
+                lambda: getattr(encoder, "tokenizer", None)
+            )
+
+        # Ingestion: extraction processes (None = one per core) and encoder batch size.
+        self.ingest_workers = ingest_workers
+        self.pdf_backend = pdf_backend
+        self.page_cache = page_cache
+        self.duplicate_threshold = duplicate_threshold
+
+        if cv_jd_mode not in CV_JD_MODES:
+            raise ValueError(f"Unknown CV vs JD mode {cv_jd_mode!r}; expected one of {CV_JD_MODES}.")
+        self.cv_jd_mode = cv_jd_mode
+        self.cv_jd_max_chars = cv_jd_max_chars
+        self.cv_jd_workers = cv_jd_workers
+        self.cv_jd_max_requirements = cv_jd_max_requirements
+        self.minhasher = MinHasher()
+        self.near_duplicates = MinHashIndex()
+        self.embed_batch_size = embed_batch_size
+
+        # Vector index configuration
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}.")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.rescore_factor = rescore_factor
+        self.train_threshold = train_threshold
+        if shard_by not in SHARD_ROUTES:
+            raise ValueError(f"Unknown shard routing {shard_by!r}; expected one of {SHARD_ROUTES}.")
+        self.num_shards = num_shards
+        self.shard_by = shard_by
 
         # Gemini configuration
         api_key = os.environ.get("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
+        if llm is not None:
+            self.model = llm
+        elif api_key:
+            self.model = LazyGemini(api_key)
         else:
             self.model = None
 
         self.index = None
-        self.chunks: List[RetrievedChunk] = []
+        # Chunk text and sources by chunk id; removed chunks keep their id.
+        self.chunks = ChunkStore()
+        # Source file name -> {"hash": content digest} (plus "duplicate_of" for
+        # skipped files). Chunk ids come from the store's source column.
+        self.sources: Dict[str, dict] = {}
+        # Bumped on every corpus change; part of the answer cache key.
+        self.index_version = 0
+        self.answer_cache = answer_cache
+        self.mmap_chunks = mmap_chunks
 
-    # ---------- File reading ---------- #
+        self.retrieval_mode = check_retrieval_mode(retrieval_mode)
+        self.rrf_k = rrf_k
+        # Sparse index over the same chunk ids, kept in step with the vector index.
+        self.lexical = BM25Index()
 
-    def _read_txt(self, path: str) -> str:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
+        if warm_up:
+            self.warm_up()
 
-    def _read_pdf(self, path: str) -> str:
-        reader = PdfReader(path)
-        pages_text = []
-        for page in reader.pages:
-            try:
-                t = page.extract_text() or ""
-            except Exception:
-                t = ""
-            pages_text.append(t)
-        return "\n".join(pages_text)
+    def warm_up(self) -> None:
+        """
+        Start loading the encoder, LLM client and re-ranker in background
+        threads, for those that support it (LazyEncoder, LazyGemini,
+        CrossEncoderReranker).
+        """
+        for component in (self.embed_model, self.model, self.reranker):
+            if hasattr(component, "warm_up"):
+                component.warm_up()
+
+    # ---------- File reading ---------- #
 
     def _load_file_text(self, path: str) -> str:
-        ext = os.path.splitext(path)[1].lower()
-        if ext == ".txt":
-            return self._read_txt(path)
-        elif ext == ".pdf":
-            return self._read_pdf(path)
-        else:
-            return ""
+        return extract_text(path, self.pdf_backend, self.page_cache)
 
     # ---------- Embeddings ---------- #
 
+    @property
+    def embedding_dim(self) -> int:
+        # Asking the encoder loads a lazy one, so this is resolved on first need.
+        if self._embedding_dim is None:
+            self._embedding_dim = encoder_dimension(self.embed_model)
+        return self._embedding_dim
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        with self.metrics.span("embed"):
+            embs = self.embed_model.encode(
+                texts, convert_to_numpy=True, show_progress_bar=False
+            )
+        embs = np.asarray(embs, dtype="float32")
+        if embs.ndim != 2 or embs.shape[1] != self.embedding_dim:
+            raise ValueError(
+                f"The encoder returned {embs.shape[-1]}-dimensional vectors, but this engine "
+                f"uses {self.embedding_dim}. Leave embedding_dim unset to use the encoder's."
+            )
+        self.metrics.count("texts_embedded", len(texts))
+        return embs
+
     def _embed_text(self, texts: List[str]) -> np.ndarray:
         """
         Convert a list of texts into an embeddings matrix (n x d).
+        Texts found in the embedding cache skip the encoder.
         """
-        embs = self.embed_model.encode(
-            texts, convert_to_numpy=True, show_progress_bar=False
-        )
-        embs = embs.astype("float32")
+        if self.embedding_cache is None:
+            return self._encode(texts)
+
+        keys = [EmbeddingCache.key(self.embedding_id, t) for t in texts]
+        cached = self.embedding_cache.get_many(keys)
+        hits = sum(1 for k in keys if k in cached)
+        self.metrics.count("embedding_cache_hits", hits)
+        self.metrics.count("embedding_cache_misses", len(keys) - hits)
+
+        # Encode each missing text once, even if it repeats within the batch.
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in cached and k not in missing:
+                missing[k] = t
+        if missing:
+            new_embs = self._encode(list(missing.values()))
+            fresh = dict(zip(missing, new_embs))
+            self.embedding_cache.put_many(fresh.items())
+            cached.update(fresh)
+
+        embs = np.empty((len(texts), self.embedding_dim), dtype="float32")
+        for i, k in enumerate(keys):
+            embs[i] = cached[k]
         return embs
 
     # ---------- Index building ---------- #
 
-    def build_index(self, file_paths: List[str]) -> Tuple[int, int]:
+    def _new_index(self, num_vectors: int = 0):
+        # IVF and quantized modes need enough vectors to train; until then search exactly.
+        index_type = self.index_type
+        if index_type in TRAINED_TYPES and num_vectors < max(
+            self.train_threshold, MIN_TRAIN_POINTS[index_type]
+        ):
+            index_type = "flat"
+        index = make_index(
+            index_type,
+            self.embedding_dim,
+            num_vectors,
+            nlist=self.nlist,
+            hnsw_m=self.hnsw_m,
+            pq_m=self.pq_m,
+            rescore_factor=self.rescore_factor,
+            num_shards=self.num_shards,
+        )
+        return self._configure_index(index)
+
+    def _configure_index(self, index):
+        set_search_params(index, self.nprobe, self.ef_search, self.rescore_factor)
+        if isinstance(index, ShardedIndex) and self.shard_by == "source":
+            # Chunks are in the store before their vectors reach the index.
+            index.route_keys = lambda ids: [self.chunks.source(int(i)) for i in ids]
+        return index
+
+    def _live_ids(self) -> np.ndarray:
+        return self.chunks.live_ids().astype(np.int64)
+
+    def _export_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Read files, split them into chunks, and build a FAISS index.
-        Returns: (number_of_files, number_of_chunks).
+        (ids, vectors) of every live chunk, reconstructed from the index.
+        Vectors are approximate for ivf_pq.
+        """
+        ids = self._live_ids()
+        if self.index is None or len(ids) == 0:
+            return ids, np.zeros((0, self.embedding_dim), dtype="float32")
+        return ids, self.index.reconstruct_batch(ids)
+
+    def rebuild_index(self) -> None:
+        """
+        Rebuild the vector index from its own vectors using the current index
+        settings (re-training IVF modes). No text is re-embedded.
+        """
+        ids, vectors = self._export_vectors()
+        index = self._new_index(len(ids))
+        self.index = train_and_add(index, vectors, ids)
+
+    def _maybe_train(self) -> None:
+        if (
+            self.index_type in TRAINED_TYPES
+            and self.index is not None
+            and index_kind(self.index) != self.index_type
+            and self.index.ntotal >= max(self.train_threshold, MIN_TRAIN_POINTS[self.index_type])
+        ):
+            self.rebuild_index()
+
+    def _remove_ids(self, ids: np.ndarray) -> None:
+        try:
+            self.index.remove_ids(ids)
+        except RuntimeError:
+            # HNSW graphs cannot drop nodes: rebuild from the remaining vectors.
+            # The registry no longer lists `ids`, so they are left out.
+            self.rebuild_index()
+
+    def add_files(
+        self,
+        file_paths: List[str],
+        progress: Optional[Callable[[int, int, int], None]] = None,
+        root: Optional[str] = None,
+    ) -> int:
         """
-        all_chunks: List[RetrievedChunk] = []
+        Index new files and re-index files whose content changed since they were
+        last added. Unchanged files are skipped without being read.
+        Sources are named by file name, or with `root` by their path relative
+        to it, so equally named files in different folders stay distinct.
 
+        Text extraction runs in a process pool while the main thread chunks and
+        embeds in batches of `embed_batch_size`, so large uploads use every core
+        with bounded memory. `progress(files_done, files_total, chunks_added)`
+        is called after each file.
+        Returns the number of chunks added.
+        """
+        digests = {}
         for path in file_paths:
             if not os.path.exists(path):
                 continue
+            name = source_name(path, root)
+            digests[path] = file_digest(path)
+            known = self.sources.get(name)
+            if known is not None and known["hash"] != digests[path]:
+                self.remove_source(name)
 
-            raw_text = self._load_file_text(path)
-            if not raw_text.strip():
+        # Removals above may have released duplicates of changed files.
+        todo = []
+        by_hash = {
+            entry["hash"]: name
+            for name, entry in self.sources.items()
+            if not entry.get("duplicate_of")
+        }
+        for path, digest in digests.items():
+            name = source_name(path, root)
+            if name in self.sources:
+                continue
+            original = by_hash.get(digest)
+            if original is not None:
+                self._mark_duplicate(name, digest, original, 1.0)
                 continue
+            by_hash[digest] = name
+            todo.append(path)
+
+        added = 0
+        batch_texts: List[str] = []
+        batch_sources: List[str] = []
+        batch_pages: List[int] = []
+        batch_sections: List[Optional[str]] = []
 
-            # Normalize text
-            text = raw_text.replace("\r", "\n")
-            text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
-
-            # Chunking with small overlap
-            chunk_size = 500  # characters
-            overlap = 100
-            start = 0
-            while start < len(text):
-                end = start + chunk_size
-                chunk = text[start:end].strip()
-                if chunk:
-                    all_chunks.append(
-                        RetrievedChunk(
-                            content=chunk, source=os.path.basename(path)
-                        )
-                    )
-                start = end - overlap
-
-        if not all_chunks:
-            self.index = None
-            self.chunks = []
-            return len(file_paths), 0
-
-        texts = [c.content for c in all_chunks]
-        embs = self._embed_text(texts)
-
-        index = faiss.IndexFlatL2(self.embedding_dim)
-        index.add(embs)
+        def flush():
+            embs = self._embed_text(batch_texts)
+            with self.metrics.span("add"):
+                ids = self.chunks.extend(batch_texts, batch_sources, batch_pages, batch_sections)
+                self.lexical.add_many(ids, batch_texts)
+                if self.index is None:
+                    self.index = self._new_index()
+                self.index.add_with_ids(embs, np.asarray(ids, dtype=np.int64))
+            self.metrics.count("chunks_added", len(ids))
+            for batch in (batch_texts, batch_sources, batch_pages, batch_sections):
+                batch.clear()
+            self._corpus_changed()
 
+        extracted = self.metrics.timed_iter(
+            iter_extracted(
+                todo, self.ingest_workers, self.pdf_backend, self.page_cache, dict(digests)
+            ),
+            "extract",
+        )
+        for files_done, (path, raw_text) in enumerate(extracted, start=1):
+            name = source_name(path, root)
+            if self._skip_near_duplicate(name, digests[path], raw_text):
+                if progress is not None:
+                    progress(files_done, len(todo), added)
+                continue
+            # raw_text may be a lazy page iterator (large or cached PDFs), so
+            # chunks are embedded as they are produced; for those files the
+            # "chunk" span includes reading the pages.
+            chunks = self.chunker.iter_chunks_with_meta(raw_text)
+            for chunk, page, section in self.metrics.timed_iter(chunks, "chunk"):
+                self.metrics.observe("chunk_chars", len(chunk))
+                if name not in self.sources:
+                    self.sources[name] = {"hash": digests[path]}
+                    self.chunks.set_uploaded_at(name, time.time())
+                batch_texts.append(chunk)
+                batch_sources.append(name)
+                batch_pages.append(page)
+                batch_sections.append(section)
+                added += 1
+                if len(batch_texts) >= self.embed_batch_size:
+                    flush()
+            if progress is not None:
+                progress(files_done, len(todo), added)
+
+        if batch_texts:
+            flush()
+
+        self._maybe_train()
+        return added
+
+    def _mark_duplicate(self, name: str, digest: str, original: str, similarity: float) -> None:
+        self.sources[name] = {
+            "hash": digest,
+            "duplicate_of": original,
+            "similarity": round(similarity, 3),
+        }
+        self.metrics.count("duplicates_skipped")
+
+    def _skip_near_duplicate(self, name: str, digest: str, raw_text) -> bool:
+        # Lazily extracted files (large PDFs) arrive as page iterators and are
+        # only checked for exact duplicates.
+        if isinstance(raw_text, list):
+            raw_text = "\n".join(raw_text)
+        if (
+            self.duplicate_threshold is None
+            or not isinstance(raw_text, str)
+            or not raw_text.strip()
+        ):
+            return False
+        with self.metrics.span("dedup"):
+            signature = self.minhasher.signature(raw_text)
+            match = self.near_duplicates.query(signature, self.duplicate_threshold)
+        if match is not None:
+            self._mark_duplicate(name, digest, *match)
+            return True
+        self.near_duplicates.add(name, signature)
+        return False
+
+    def duplicates(self) -> Dict[str, str]:
+        """
+        Files skipped as duplicates: {name: name of the indexed original}.
+        """
+        return {
+            name: entry["duplicate_of"]
+            for name, entry in self.sources.items()
+            if entry.get("duplicate_of")
+        }
+
+    def remove_source(self, name: str) -> int:
+        """
+        Drop every chunk of the given source file from the index.
+        Files skipped as its duplicates are forgotten too, so the next
+        `add_files` indexes them in its place.
+        Returns the number of chunks removed.
+        """
+        entry = self.sources.pop(name, None)
+        self.near_duplicates.remove(name)
+        for other in [n for n, e in self.sources.items() if e.get("duplicate_of") == name]:
+            del self.sources[other]
+        if entry is None or entry.get("duplicate_of"):
+            return 0
+        ids = self.chunks.live_ids(name).astype(np.int64)
+        if len(ids) == 0:
+            return 0
+
+        # Deleted from the store first: an HNSW rebuild re-adds only live chunks.
+        self.chunks.delete(ids)
+        self.lexical.remove_many(ids.tolist())
+        self._remove_ids(ids)
+        self._corpus_changed()
+        return len(ids)
+
+    def _corpus_changed(self) -> None:
+        # Cached answers were grounded in the old corpus.
+        self.index_version += 1
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+
+    def refresh(
+        self,
+        file_paths: List[str],
+        progress: Optional[Callable[[int, int, int], None]] = None,
+        root: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """
+        Make the index match `file_paths` exactly: drop sources that are no
+        longer listed, then add new or changed files. Sources are named as
+        in `add_files`, so pass the same `root` the index was built with.
+        Every other source is removed, including files added by someone
+        else; use `add_files` and `remove_source` on shared indexes.
+        Returns (chunks_added, chunks_removed).
+        """
+        wanted = {source_name(p, root) for p in file_paths if os.path.exists(p)}
+        removed = 0
+        for name in list(self.sources):
+            if name not in wanted:
+                removed += self.remove_source(name)
+        added = self.add_files(file_paths, progress=progress, root=root)
+        return added, removed
+
+    def build_index(
+        self,
+        file_paths: List[str],
+        progress: Optional[Callable[[int, int, int], None]] = None,
+        root: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """
+        Read files, split them into chunks, and build a FAISS index.
+        Only files that are new or changed since the last call are embedded.
+        Replaces the index contents (see `refresh`): sources not in
+        `file_paths` are dropped.
+        Returns: (number_of_files, number_of_chunks).
+        """
+        self.refresh(file_paths, progress=progress, root=root)
+        return len(file_paths), self.num_chunks()
+
+    def num_chunks(self) -> int:
+        """
+        Number of live (not removed) chunks in the index.
+        """
+        return 0 if self.index is None else self.index.ntotal
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by this engine's corpus: vector index, BM25
+        postings and chunk columns. Shared components (encoder, caches) and
+        memory-mapped chunk text are not counted.
+        """
+        index_bytes = 0 if self.index is None else index_nbytes(self.index)
+        return index_bytes + self.lexical.nbytes() + self.chunks.nbytes()
+
+    def indexed_sources(self) -> List[str]:
+        """
+        Names of the source files currently in the index, in insertion order.
+        """
+        return list(self.sources)
+
+    # ---------- Persistence ---------- #
+
+    def save(self, path: str, keep_versions: int = 2) -> str:
+        """
+        Write the FAISS index and the chunk store to a new version directory
+        under `path`, then point `path/CURRENT` at it. Readers never see a
+        half-written index, and older versions beyond `keep_versions` are pruned.
+        Returns the directory of the new version.
+        """
+        os.makedirs(path, exist_ok=True)
+        existing = _list_versions(path)
+        version = (existing[-1] + 1) if existing else 1
+        version_dir = os.path.join(path, f"v{version}")
+        os.makedirs(version_dir)
+
+        sources = self.chunks.save(version_dir)
+        self.lexical.save(os.path.join(version_dir, "bm25.npz"))
+        self.near_duplicates.save(os.path.join(version_dir, "minhash.npz"))
+
+        if self.index is not None:
+            write_index(self.index, version_dir)
+
+        manifest = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "model_name": self.model_name,
+            "embedding_id": self.embedding_id,
+            "embedding_dim": self.index.d if self.index is not None else self._embedding_dim,
+            "num_chunks": len(self.chunks),
+            "sources": sources,
+            "files": self.sources,
+        }
+        with open(os.path.join(version_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Atomically switch readers to the new version.
+        current_tmp = os.path.join(path, "CURRENT.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(f"v{version}")
+        os.replace(current_tmp, os.path.join(path, "CURRENT"))
+
+        for old in existing[: max(0, len(existing) + 1 - keep_versions)]:
+            # Best effort: an old version may still be memory-mapped (e.g. on Windows).
+            shutil.rmtree(os.path.join(path, f"v{old}"), ignore_errors=True)
+
+        return version_dir
+
+    def load(self, path: str) -> int:
+        """
+        Load the index saved by `save` from `path`. The FAISS index is read into
+        memory and the chunk store is memory-mapped (unless `mmap_chunks` is off).
+        Returns the number of chunks.
+        """
+        current_file = os.path.join(path, "CURRENT")
+        if not os.path.exists(current_file):
+            raise FileNotFoundError(f"No saved index found in {path!r}.")
+        with open(current_file, "r", encoding="utf-8") as f:
+            version_dir = os.path.join(path, f.read().strip())
+
+        with open(os.path.join(version_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"Saved index format {manifest.get('format_version')} is not supported "
+                f"(expected {INDEX_FORMAT_VERSION}). Please re-index your documents."
+            )
+        saved_id = manifest.get("embedding_id", manifest["model_name"])
+        if saved_id != self.embedding_id:
+            raise ValueError(
+                f"Saved index was built with {saved_id!r} embeddings, "
+                f"but this engine uses {self.embedding_id!r}."
+            )
+
+        index = read_index(version_dir)
+        if index is not None:
+            if self._embedding_dim is None:
+                # Adopted without loading the encoder; `_encode` checks it later.
+                self._embedding_dim = index.d
+            elif index.d != self._embedding_dim:
+                raise ValueError(
+                    f"Saved index has dimension {index.d}, expected {self._embedding_dim}."
+                )
+
+        if index is not None:
+            self._configure_index(index)
         self.index = index
-        self.chunks = all_chunks
+        self.chunks = ChunkStore.open(version_dir, manifest["sources"], mmap=self.mmap_chunks)
+        self.sources = manifest["files"]
+        for entry in self.sources.values():
+            # Older manifests listed every chunk id; the store has them.
+            entry.pop("chunk_ids", None)
+
+        minhash_path = os.path.join(version_dir, "minhash.npz")
+        self.near_duplicates = (
+            MinHashIndex.open(minhash_path) if os.path.exists(minhash_path) else MinHashIndex()
+        )
 
-        return len(file_paths), len(all_chunks)
+        bm25_path = os.path.join(version_dir, "bm25.npz")
+        if os.path.exists(bm25_path):
+            self.lexical = BM25Index.open(bm25_path)
+        else:
+            # Saved before the lexical index existed: rebuild it, no encoder needed.
+            self.lexical = BM25Index()
+            ids = self._live_ids().tolist()
+            self.lexical.add_many(ids, (self.chunks.text(i) for i in ids))
+        self._corpus_changed()
+        return self.num_chunks()
+
+    def index_mode_report(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        configs: Optional[List[dict]] = None,
+    ) -> List[dict]:
+        """
+        Recall-vs-latency of each index mode on this engine's corpus, measured
+        against exact flat search. See vector_index.compare_index_modes.
+        """
+        _, vectors = self._export_vectors()
+        return compare_index_modes(vectors, self._embed_text(queries), top_k, configs)
 
     # ---------- Retrieval ---------- #
 
-    def _retrieve(self, query: str, top_k: int = 5) -> List[RetrievedChunk]:
-        if self.index is None or not self.chunks:
-            return []
+    def _retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        where: Optional[ChunkFilter] = None,
+    ) -> List[RetrievedChunk]:
+        return self.retrieve_many([query], top_k, mode, where)[0]
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        where: Optional[ChunkFilter] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Retrieve the top-k chunks for several queries with one encoder batch
+        and one FAISS search. `mode` overrides the engine's retrieval_mode;
+        "lexical" skips the encoder entirely. With `where`, only matching
+        chunks are searched.
+        Returns one list of chunks per query.
+        """
+        return self._search_many(queries, top_k, mode, where)[1]
+
+    def keyword_search(
+        self, query: str, top_k: int = 5, where: Optional[ChunkFilter] = None
+    ) -> List[RetrievedChunk]:
+        """
+        BM25-only retrieval: exact tokens (certification codes, company names)
+        without touching the encoder.
+        """
+        return self._retrieve(query, top_k, mode="lexical", where=where)
+
+    def filter_ids(self, where: ChunkFilter) -> np.ndarray:
+        """
+        Sorted ids of the live chunks matching `where`, evaluated on the
+        chunk store's columns. A file skipped as a duplicate stands for its
+        original.
+        """
+        with self.metrics.span("filter"):
+            if where.sources is not None:
+                originals = [
+                    self.sources.get(name, {}).get("duplicate_of") or name
+                    for name in where.sources
+                ]
+                where = ChunkFilter(
+                    sources=originals,
+                    pages=where.pages,
+                    sections=where.sections,
+                    uploaded_after=where.uploaded_after,
+                    uploaded_before=where.uploaded_before,
+                )
+            ids = self.chunks.select(where)
+        self.metrics.observe("filter_candidates", len(ids))
+        return ids
+
+    def _search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        where: Optional[ChunkFilter] = None,
+    ) -> Tuple[Optional[np.ndarray], List[List[RetrievedChunk]]]:
+        # Also returns the query embeddings, which the answer cache compares.
+        mode = check_retrieval_mode(mode or self.retrieval_mode)
+        if self.index is None or self.index.ntotal == 0 or not queries:
+            return None, [[] for _ in queries]
+        # Candidates are fixed before ranking, so no over-fetching is needed.
+        allowed = self.filter_ids(where) if where is not None else None
+        if allowed is not None and len(allowed) == 0:
+            return None, [[] for _ in queries]
+
+        # The re-ranker picks top_k out of a larger candidate set.
+        candidate_k = max(top_k, self.rerank_candidates) if self.reranker else top_k
+
+        if mode == "lexical":
+            q_embs = None
+            with self.metrics.span("search"):
+                id_lists = [
+                    [i for i, _ in self.lexical.search(q, candidate_k, allowed)] for q in queries
+                ]
+        else:
+            # Hybrid mode over-fetches from both rankers before fusing.
+            fetch_k = candidate_k * 4 if mode == "hybrid" else candidate_k
+            q_embs = self._embed_text(queries)
+            with self.metrics.span("search"):
+                if allowed is None:
+                    distances, indices = self.index.search(q_embs, fetch_k)
+                else:
+                    distances, indices = search_subset(self.index, q_embs, fetch_k, allowed)
+                id_lists = []
+                for query, row in zip(queries, indices):
+                    ids = [int(i) for i in row if i >= 0]
+                    if mode == "hybrid":
+                        lexical_ids = [i for i, _ in self.lexical.search(query, fetch_k, allowed)]
+                        ids = reciprocal_rank_fusion([ids, lexical_ids], k=self.rrf_k)[:candidate_k]
+                    id_lists.append(ids)
+
+        results = [self._chunks_by_id(ids) for ids in id_lists]
+        if self.reranker is not None:
+            results = [self._rerank(q, r, top_k) for q, r in zip(queries, results)]
+
+        return q_embs, results
 
-        q_emb = self._embed_text([query])
-        distances, indices = self.index.search(q_emb, top_k)
+    def _rerank(
+        self, query: str, candidates: List[RetrievedChunk], top_k: int
+    ) -> List[RetrievedChunk]:
+        with self.metrics.span("rerank"):
+            kept, reranked = self.reranker.rerank(query, candidates, top_k)
+        if not reranked:
+            self.metrics.count("rerank_budget_exceeded")
+        return kept
 
+    def _chunks_by_id(self, ids: List[int]) -> List[RetrievedChunk]:
         retrieved: List[RetrievedChunk] = []
-        for idx in indices[0]:
+        for idx in ids:
             if 0 <= idx < len(self.chunks):
-                retrieved.append(self.chunks[idx])
-
+                chunk = self.chunks[idx]
+                if chunk is not None:
+                    chunk.tenant = self.tenant
+                    retrieved.append(chunk)
         return retrieved
 
     # ---------- Generic QA ---------- #
 
-    def answer(self, query: str) -> Tuple[str, List[RetrievedChunk]]:
+    def answer(
+        self, query: str, where: Optional[ChunkFilter] = None
+    ) -> Tuple[str, List[RetrievedChunk]]:
         """
-        Main QA entrypoint used by the Streamlit app.
+        Main QA entrypoint used by the Streamlit app. With `where`, the
+        answer is grounded only in matching chunks (e.g. one CV).
         Returns (answer_text, retrieved_chunks).
         """
-        retrieved = self._retrieve(query)
+        q_embs, (retrieved,) = self._search_many([query], self.answer_top_k, where=where)
+        return self._answer_from(query, retrieved, None if q_embs is None else q_embs[0])
+
+    def answer_many(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        max_workers: int = 4,
+        where: Optional[ChunkFilter] = None,
+    ) -> List[Tuple[str, List[RetrievedChunk]]]:
+        """
+        Answer several questions: retrieval is batched through `retrieve_many`,
+        then up to `max_workers` LLM calls run concurrently.
+        Each answer sees `top_k` passages, by default `answer_top_k` as in
+        `answer`. Returns one (answer_text, retrieved_chunks) pair per query,
+        in order.
+        """
+        top_k = top_k or self.answer_top_k
+        q_embs, all_retrieved = self._search_many(queries, top_k, where=where)
+        q_list = [None] * len(queries) if q_embs is None else list(q_embs)
+        if self.model is None or len(queries) <= 1:
+            return [
+                self._answer_from(q, r, e) for q, r, e in zip(queries, all_retrieved, q_list)
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self._answer_from, queries, all_retrieved, q_list))
 
+    def _answer_from(
+        self,
+        query: str,
+        retrieved: List[RetrievedChunk],
+        query_emb: Optional[np.ndarray] = None,
+    ) -> Tuple[str, List[RetrievedChunk]]:
         if not retrieved:
-            return (
-                "No relevant passages were found in your documents for this question.",
-                [],
-            )
+            return NO_PASSAGES_MESSAGE, []
 
         # No LLM: just return snippets
         if self.model is None:
-            text = "Here are the most relevant passages from your documents:\n\n"
-            for i, ch in enumerate(retrieved, start=1):
-                text += f"[{i}] {ch.content}\n\n"
-            return text, retrieved
+            return _passages_text(SNIPPETS_HEADER, retrieved), retrieved
+
+        cached = self._cached_answer(retrieved, query_emb)
+        if cached is not None:
+            return cached, retrieved
+
+        prompt = self._qa_prompt(query, retrieved)
+
+        try:
+            with self.metrics.span("generate"):
+                resp = self.model.generate_content(prompt)
+            if resp and resp.text:
+                self.metrics.observe("answer_tokens", len(resp.text.split()))
+                answer_text = resp.text.strip()
+                self._cache_answer(retrieved, query_emb, answer_text)
+            else:
+                answer_text = "Gemini did not return any content."
+        except Exception:
+            answer_text = _passages_text(LLM_FALLBACK_HEADER, retrieved)
+
+        return answer_text, retrieved
+
+    def _cached_answer(
+        self, retrieved: List[RetrievedChunk], query_emb: Optional[np.ndarray]
+    ) -> Optional[str]:
+        if self.answer_cache is None or query_emb is None:
+            return None
+        chunk_ids = [ch.chunk_id for ch in retrieved]
+        cached = self.answer_cache.lookup(self.index_version, chunk_ids, query_emb)
+        self.metrics.count("answer_cache_hits" if cached is not None else "answer_cache_misses")
+        return cached
+
+    def _cache_answer(
+        self, retrieved: List[RetrievedChunk], query_emb: Optional[np.ndarray], answer: str
+    ) -> None:
+        if self.answer_cache is None or query_emb is None:
+            return
+        chunk_ids = [ch.chunk_id for ch in retrieved]
+        self.answer_cache.store(self.index_version, chunk_ids, query_emb, answer)
+
+    def _qa_prompt(self, query: str, retrieved: List[RetrievedChunk]) -> str:
+        with self.metrics.span("prompt"):
+            prompt = self._build_qa_prompt(query, retrieved)
+        self.metrics.observe("prompt_tokens", len(prompt.split()))
+        return prompt
 
+    def _build_qa_prompt(self, query: str, retrieved: List[RetrievedChunk]) -> str:
         context_blocks = []
         for i, ch in enumerate(retrieved, start=1):
             context_blocks.append(f"[{i}] {ch.content}")
         context_text = "\n\n".join(context_blocks)
 
-        prompt = textwrap.dedent(
+        return textwrap.dedent(
             f"""
             You are an AI assistant that answers questions based only on the passages below.
 
@@ -195,42 +1008,188 @@ class RAGEngine:
             """
         )
 
+    # ---------- Streaming / async QA ---------- #
+
+    def answer_stream(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        where: Optional[ChunkFilter] = None,
+    ) -> Iterator[Tuple[str, object]]:
+        """
+        Streaming version of `answer`. Yields ("sources", retrieved_chunks) as
+        soon as retrieval is done, then ("token", text) pieces as Gemini
+        produces them. Generation stops after `timeout` seconds or when
+        `cancel` is set.
+        """
+        q_embs, (retrieved,) = self._search_many([query], self.answer_top_k, where=where)
+        yield "sources", retrieved
+
+        if not retrieved:
+            yield "token", NO_PASSAGES_MESSAGE
+            return
+        if self.model is None:
+            yield "token", _passages_text(SNIPPETS_HEADER, retrieved)
+            return
+
+        query_emb = None if q_embs is None else q_embs[0]
+        cached = self._cached_answer(retrieved, query_emb)
+        if cached is not None:
+            yield "token", cached
+            return
+
+        parts: List[str] = []
+        produced = False
         try:
-            resp = self.model.generate_content(prompt)
-            answer_text = resp.text.strip() if resp and resp.text else (
-                "Gemini did not return any content."
-            )
+            for text in self._stream_generation(self._qa_prompt(query, retrieved), timeout, cancel):
+                produced = True
+                parts.append(text)
+                yield "token", text
+        except TimeoutError:
+            if produced:
+                yield "token", "\n\n_(Answer stopped: generation timed out.)_"
+            else:
+                yield "token", _passages_text(LLM_TIMEOUT_HEADER, retrieved)
+            return
         except Exception:
-            answer_text = (
-                "Could not reach Gemini, so here are the most relevant passages instead:\n\n"
-            )
-            for i, ch in enumerate(retrieved, start=1):
-                answer_text += f"[{i}] {ch.content}\n\n"
+            if not produced:
+                yield "token", _passages_text(LLM_FALLBACK_HEADER, retrieved)
+            return
 
-        return answer_text, retrieved
+        if cancel is not None and cancel.is_set():
+            return
+        if produced:
+            self._cache_answer(retrieved, query_emb, "".join(parts).strip())
+        else:
+            yield "token", "Gemini did not return any content."
+
+    async def astream_answer(
+        self, query: str, timeout: Optional[float] = None, where: Optional[ChunkFilter] = None
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Async iterator over the same events as `answer_stream`. Cancelling the
+        consuming task also stops the underlying Gemini stream.
+        """
+        async for event in _aiter_in_thread(
+            lambda cancel: self.answer_stream(query, timeout, cancel, where)
+        ):
+            yield event
+
+    async def answer_async(
+        self, query: str, timeout: Optional[float] = None, where: Optional[ChunkFilter] = None
+    ) -> Tuple[str, List[RetrievedChunk]]:
+        """
+        Awaitable version of `answer`. Returns (answer_text, retrieved_chunks).
+        """
+        retrieved: List[RetrievedChunk] = []
+        parts: List[str] = []
+        async for kind, value in self.astream_answer(query, timeout, where):
+            if kind == "sources":
+                retrieved = value
+            else:
+                parts.append(value)
+        return "".join(parts).strip(), retrieved
+
+    def _stream_generation(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[str]:
+        """
+        Yield text pieces from `self.model.generate_content(prompt, stream=True)`.
+        The blocking Gemini stream is consumed in a background thread so that
+        the timeout and the cancel event are honoured even while waiting for
+        the next piece. Raises TimeoutError when `timeout` elapses.
+        """
+        events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for part in self.model.generate_content(prompt, stream=True):
+                    if stop.is_set():
+                        break
+                    text = part.text if part else ""
+                    if text:
+                        events.put(("token", text))
+                events.put(("done", None))
+            except Exception as e:
+                events.put(("error", e))
+
+        started = time.perf_counter()
+        first_token = True
+        threading.Thread(target=produce, daemon=True).start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    return
+                wait = 0.1
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Gemini generation timed out.")
+                    wait = min(wait, remaining)
+                try:
+                    kind, value = events.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if kind == "token":
+                    if first_token:
+                        self.metrics.record_span("first_token", time.perf_counter() - started)
+                        first_token = False
+                    yield value
+                elif kind == "done":
+                    return
+                else:
+                    raise value
+        finally:
+            stop.set()
+            self.metrics.record_span("generate", time.perf_counter() - started)
 
     # ---------- CV vs JD analysis ---------- #
 
-    def analyze_cv_vs_jd(self, cv_path: str, jd_path: str) -> str:
+    def _cv_jd_prompt(
+        self,
+        cv_path: str,
+        jd_path: str,
+        deadline: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Tuple[Optional[str], str]:
         """
-        Compare a single CV against a Job Description using Gemini.
-        Returns a human-readable analysis in English.
+        Returns (prompt, note to append to the analysis, usually "") or
+        (None, message explaining why there is no prompt).
+        `deadline`, `cancel` and `progress` apply to the map step (see
+        `_assess_requirements`).
         """
         cv_text = self._load_file_text(cv_path)
         jd_text = self._load_file_text(jd_path)
 
         if not cv_text.strip() or not jd_text.strip():
-            return (
+            return None, (
                 "Could not read the CV or the Job Description. "
                 "Please make sure you uploaded valid PDF or TXT files."
             )
 
         if self.model is None:
-            return (
+            return None, (
                 "LLM is not configured, so CV vs JD analysis cannot be performed. "
                 "Please set GEMINI_API_KEY first."
             )
 
+        if self.cv_jd_mode == "map_reduce" or (
+            self.cv_jd_mode == "auto" and len(cv_text) + len(jd_text) > self.cv_jd_max_chars
+        ):
+            map_reduce = self._cv_jd_map_reduce_prompt(
+                cv_text, jd_text, deadline=deadline, cancel=cancel, progress=progress
+            )
+            if map_reduce is not None:
+                return map_reduce
+            # No recognizable requirements: fall back to the single prompt.
+
         prompt = textwrap.dedent(
             f"""
             You are an expert career coach and technical recruiter.
@@ -255,11 +1214,233 @@ class RAGEngine:
             - Be specific and actionable, not generic.
             """
         )
+        self.metrics.observe("prompt_tokens", len(prompt.split()))
+        return prompt, ""
+
+    def _cv_jd_map_reduce_prompt(
+        self,
+        cv_text: str,
+        jd_text: str,
+        evidence_per_requirement: int = 3,
+        deadline: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Map step of the chunked CV vs JD analysis: match every JD requirement
+        (up to `cv_jd_max_requirements`) to its most similar CV chunks (one
+        requirement x chunk similarity matrix), then assess each requirement
+        in parallel LLM calls that see only that evidence.
+        Returns (reduce prompt, note on unchecked requirements or ""), or None
+        if the JD has no recognizable requirements.
+        """
+        all_requirements = extract_requirements(jd_text)
+        requirements = all_requirements[: self.cv_jd_max_requirements]
+        unchecked = len(all_requirements) - len(requirements)
+        cv_chunks = list(self.chunker.iter_chunks(cv_text))
+        if not requirements or not cv_chunks:
+            return None
+
+        with self.metrics.span("cv_jd_match"):
+            embs = self._embed_text(requirements + cv_chunks)
+            matches = match_evidence(
+                embs[: len(requirements)], embs[len(requirements):], evidence_per_requirement
+            )
+        prompts = [
+            requirement_prompt(req, [cv_chunks[j] for j, _ in match])
+            for req, match in zip(requirements, matches)
+        ]
+        for prompt in prompts:
+            self.metrics.observe("prompt_tokens", len(prompt.split()))
 
+        with self.metrics.span("cv_jd_map"):
+            results = self._assess_requirements(prompts, deadline, cancel, progress)
+
+        outline = "\n".join(line for _, line in zip(range(8), iter_lines(cv_text)))
+        prompt = reduce_prompt(list(zip(requirements, results)), outline, unchecked)
+        self.metrics.observe("prompt_tokens", len(prompt.split()))
+        note = ""
+        if unchecked:
+            note = (
+                f"\n\n_({unchecked} of {len(all_requirements)} job requirements were "
+                "not checked individually.)_"
+            )
+        return prompt, note
+
+    def _assess_requirements(
+        self,
+        prompts: List[str],
+        deadline: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[str]:
+        """
+        Run the per-requirement LLM calls in parallel.
+        - Raises TimeoutError once `deadline` (time.monotonic()) passes.
+        - Stops waiting when `cancel` is set; unfinished requirements are
+          reported as unknown.
+        - Calls `progress(done, total)` as assessments complete.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.cv_jd_workers)
+        futures = [pool.submit(self._assess_requirement, p) for p in prompts]
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    break
+                wait_s = 0.1
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Gemini timed out assessing the JD requirements.")
+                    wait_s = min(wait_s, remaining)
+                done, pending = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+                if done and progress is not None:
+                    progress(len(futures) - len(pending), len(futures))
+        finally:
+            # Calls already sent finish in the background; queued ones are dropped.
+            pool.shutdown(wait=False, cancel_futures=True)
+        return [
+            f.result() if f.done() and not f.cancelled() else UNKNOWN_ASSESSMENT
+            for f in futures
+        ]
+
+    def _assess_requirement(self, prompt: str) -> str:
         try:
             resp = self.model.generate_content(prompt)
-            return resp.text.strip() if resp and resp.text else (
+            if resp and resp.text:
+                return resp.text.strip()
+        except Exception:
+            pass
+        return UNKNOWN_ASSESSMENT
+
+    def analyze_cv_vs_jd(self, cv_path: str, jd_path: str) -> str:
+        """
+        Compare a single CV against a Job Description using Gemini.
+        Returns a human-readable analysis in English.
+        """
+        prompt, message = self._cv_jd_prompt(cv_path, jd_path)
+        if prompt is None:
+            return message
+
+        try:
+            resp = self.model.generate_content(prompt)
+            return resp.text.strip() + message if resp and resp.text else (
                 "Gemini did not return any content for CV vs JD analysis."
             )
         except Exception:
             return "Could not reach Gemini while analyzing CV vs JD."
+
+    def analyze_cv_vs_jd_stream(
+        self,
+        cv_path: str,
+        jd_path: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Iterator[str]:
+        """
+        Streaming version of `analyze_cv_vs_jd`: yields the analysis in pieces.
+        `timeout` and `cancel` cover the whole analysis, including the
+        per-requirement calls of the map-reduce mode, which report
+        `progress(done, total)` before the first piece is yielded.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            prompt, message = self._cv_jd_prompt(cv_path, jd_path, deadline, cancel, progress)
+        except TimeoutError:
+            yield "Gemini timed out while analyzing CV vs JD."
+            return
+        if cancel is not None and cancel.is_set():
+            return
+        if prompt is None:
+            yield message
+            return
+
+        produced = False
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for text in self._stream_generation(prompt, remaining, cancel):
+                produced = True
+                yield text
+            if produced and message:
+                yield message
+        except TimeoutError:
+            yield "\n\n_(Analysis stopped: generation timed out.)_" if produced else (
+                "Gemini timed out while analyzing CV vs JD."
+            )
+        except Exception:
+            if not produced:
+                yield "Could not reach Gemini while analyzing CV vs JD."
+
+    async def analyze_cv_vs_jd_async(
+        self, cv_path: str, jd_path: str, timeout: Optional[float] = None
+    ) -> str:
+        """
+        Awaitable version of `analyze_cv_vs_jd`.
+        """
+        parts: List[str] = []
+        async for text in _aiter_in_thread(
+            lambda cancel: self.analyze_cv_vs_jd_stream(cv_path, jd_path, timeout, cancel)
+        ):
+            parts.append(text)
+        return "".join(parts).strip()
+
+
+def check_retrieval_mode(mode: str) -> str:
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}.")
+    return mode
+
+
+def source_name(path: str, root: Optional[str] = None) -> str:
+    if root is None:
+        return os.path.basename(path)
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def _passages_text(header: str, retrieved: List[RetrievedChunk]) -> str:
+    text = header + "\n\n"
+    for i, ch in enumerate(retrieved, start=1):
+        text += f"[{i}] {ch.content}\n\n"
+    return text
+
+
+async def _aiter_in_thread(make_iter: Callable[[threading.Event], Iterator]) -> AsyncIterator:
+    """
+    Run a blocking iterator in a worker thread and re-yield its items on the
+    event loop. `make_iter` receives a cancel event that is set when the
+    consumer stops early or its task is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
+    done = object()
+
+    def pump():
+        try:
+            for item in make_iter(cancel):
+                loop.call_soon_threadsafe(items.put_nowait, item)
+                if cancel.is_set():
+                    break
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, done)
+
+    worker = loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item = await items.get()
+            if item is done:
+                break
+            yield item
+        await worker
+    finally:
+        cancel.set()
+
+
+def _list_versions(path: str) -> List[int]:
+    versions = []
+    for name in os.listdir(path):
+        if name.startswith("v") and name[1:].isdigit():
+            versions.append(int(name[1:]))
+    return sorted(versions)
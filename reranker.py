@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from chunk_store import RetrievedChunk
+
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        batch_size: int = 16,
+        budget_s: Optional[float] = 0.5,
+        model=None,
+    ):
+        """
+        Re-scores retrieved chunks against the query with a cross-encoder:
+        - Candidates are scored in batches of `batch_size` (query, passage) pairs.
+        - If scoring takes longer than `budget_s` seconds, the remaining
+          batches are skipped and the original retrieval order is kept.
+        - The model loads on first use (or in the background via `warm_up`),
+          before the budget clock starts; any object with a CrossEncoder-style
+          `predict(pairs)` can be passed as `model`.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_s = budget_s
+        self._model = model
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Start loading the model in a daemon thread (once).
+        """
+        with self._lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self._warm, name="reranker-warm-up", daemon=True
+                )
+                self._warm_thread.start()
+            return self._warm_thread
+
+    def _warm(self) -> None:
+        try:
+            self.model
+        except Exception as e:
+            logger.warning("Could not warm up re-ranker %s: %s", self.model_name, e)
+
+    def rerank(
+        self, query: str, chunks: Sequence[RetrievedChunk], top_k: int
+    ) -> Tuple[List[RetrievedChunk], bool]:
+        """
+        Returns (top_k chunks, reranked). `reranked` is False when the budget
+        ran out and the chunks are in their original order.
+        """
+        if len(chunks) <= 1:
+            return list(chunks[:top_k]), True
+
+        # Loading the model is not scoring: a cold first query would
+        # otherwise always run out of budget.
+        model = self.model
+        start = time.perf_counter()
+        scores: List[float] = []
+        for i in range(0, len(chunks), self.batch_size):
+            if self.budget_s is not None and time.perf_counter() - start > self.budget_s:
+                return list(chunks[:top_k]), False
+            batch = chunks[i:i + self.batch_size]
+            scores.extend(float(s) for s in model.predict([(query, c.content) for c in batch]))
+
+        order = sorted(range(len(chunks)), key=lambda j: -scores[j])
+        return [chunks[j] for j in order[:top_k]], True
@@ -0,0 +1,436 @@
+"""
+Headless HTTP service for the RAG engine.
+
+Endpoints (JSON in, JSON out; `tenant` and `collection` default to "default"):
+    POST /index     {"paths": [...], "tenant", "collection"}    add files under --data-dir
+    POST /remove    {"sources": [...], "tenant", "collection"}  drop indexed files by name
+    POST /retrieve  {"query", "top_k", "mode", "filter", "tenant", "collection"}
+    POST /answer    {"query", "top_k", "filter", "tenant", "collection"}
+    POST /cv-jd     {"cv_path", "jd_path", "tenant", "collection"}
+    GET  /health
+    GET  /metrics   Prometheus text
+
+/index only adds new or changed files; earlier files stay until /remove.
+Concurrent queries are micro-batched into one encoder call and one FAISS
+search; generation runs on a bounded worker pool. When either queue is
+full the service answers 503 with Retry-After instead of queueing forever.
+
+`filter` limits the search to matching chunks, e.g.
+{"sources": ["cv_jane.pdf"], "sections": ["Experience"], "pages": [1, 2],
+"uploaded_after": 1767225600}. Returned chunks carry source, page, section,
+uploaded_at and tenant.
+
+    python service.py --port 8000
+    python service.py --stub --stub-delay 0.05   # hash encoder + stub LLM, no downloads
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from chunk_store import ChunkFilter
+from encoders import EMBEDDING_BACKENDS, make_encoder
+from metrics import NULL_METRICS, Metrics
+from rag_engine import check_retrieval_mode
+from sharded_index import SHARD_ROUTES
+from tenants import DEFAULT_COLLECTION, EnginePool
+
+
+class Overloaded(Exception):
+    """
+    Raised when the retrieval or generation queue is full.
+    """
+
+
+class _Pending:
+    __slots__ = ("tenant", "collection", "query", "top_k", "mode", "where", "future")
+
+    def __init__(
+        self, tenant: str, collection: str, query: str, top_k: int, mode: Optional[str],
+        where: Optional[ChunkFilter],
+    ):
+        self.tenant = tenant
+        self.collection = collection
+        self.query = query
+        self.top_k = top_k
+        self.mode = mode
+        self.where = where
+        self.future: Future = Future()
+
+
+class QueryBatcher:
+    def __init__(
+        self,
+        pool: EnginePool,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 256,
+        gen_workers: int = 8,
+        max_generating: int = 64,
+        metrics: Optional[Metrics] = None,
+        search_workers: int = 4,
+    ):
+        """
+        Scheduler between HTTP threads and the engines:
+        - Retrieval requests queue up (at most `max_pending`); one thread
+          collects up to `max_batch` of them, waiting at most `max_wait_ms`
+          after the first, and groups them by (tenant, collection, top_k,
+          mode, filter).
+        - Each group runs as one `_search_many` call on `search_workers`
+          threads, so a collection that is being indexed or loaded from
+          disk only delays its own queries.
+        - Generation runs on `gen_workers` threads, with at most
+          `max_generating` answers queued or running.
+        - Full queues raise Overloaded instead of blocking.
+        """
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        self._queue: "queue.Queue[_Pending]" = queue.Queue(maxsize=max_pending)
+        self._gen_slots = threading.BoundedSemaphore(max_generating)
+        self._executor = ThreadPoolExecutor(max_workers=gen_workers, thread_name_prefix="generate")
+        self._searchers = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search")
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    # ---------- Public API ---------- #
+
+    def submit_retrieve(
+        self,
+        tenant: str,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        where: Optional[ChunkFilter] = None,
+        collection: str = DEFAULT_COLLECTION,
+    ) -> Future:
+        """
+        Queue a retrieval. The future resolves to (query_embedding or None, chunks).
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1.")
+        if mode is not None:
+            check_retrieval_mode(mode)
+        pending = _Pending(tenant, collection, query, top_k, mode, where)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            self.metrics.count("requests_rejected")
+            raise Overloaded("Retrieval queue is full.")
+        return pending.future
+
+    def retrieve(
+        self, tenant: str, query: str, top_k: int = 5, mode: Optional[str] = None,
+        timeout: Optional[float] = None, where: Optional[ChunkFilter] = None,
+        collection: str = DEFAULT_COLLECTION,
+    ):
+        future = self.submit_retrieve(tenant, query, top_k, mode, where, collection)
+        return future.result(timeout)[1]
+
+    def answer(
+        self, tenant: str, query: str, top_k: int = 5, timeout: Optional[float] = None,
+        where: Optional[ChunkFilter] = None, collection: str = DEFAULT_COLLECTION,
+    ):
+        """
+        Returns (answer_text, retrieved_chunks), like RAGEngine.answer.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        future = self.submit_retrieve(tenant, query, top_k, where=where, collection=collection)
+        query_emb, retrieved = future.result(timeout)
+        engine = self.pool.get(tenant, collection)
+        future = self._generate(engine._answer_from, query, retrieved, query_emb)
+        return future.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def analyze_cv_vs_jd(
+        self, tenant: str, cv_path: str, jd_path: str, timeout: Optional[float] = None,
+        collection: str = DEFAULT_COLLECTION,
+    ) -> str:
+        engine = self.pool.get(tenant, collection)
+        return self._generate(engine.analyze_cv_vs_jd, cv_path, jd_path).result(timeout)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._thread.join()
+        self._searchers.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+
+    # ---------- Internals ---------- #
+
+    def _generate(self, fn, *args) -> Future:
+        if not self._gen_slots.acquire(blocking=False):
+            self.metrics.count("requests_rejected")
+            raise Overloaded("Generation queue is full.")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._gen_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._gen_slots.release())
+        return future
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.metrics.observe("batch_size", len(batch))
+            groups: Dict[
+                Tuple[str, str, int, Optional[str], Optional[ChunkFilter]], List[_Pending]
+            ] = {}
+            for pending in batch:
+                key = (pending.tenant, pending.collection, pending.top_k, pending.mode, pending.where)
+                groups.setdefault(key, []).append(pending)
+            for (tenant, collection, top_k, mode, where), items in groups.items():
+                self._searchers.submit(self._search, tenant, collection, top_k, mode, where, items)
+
+    def _search(
+        self, tenant: str, collection: str, top_k: int, mode: Optional[str],
+        where: Optional[ChunkFilter], items: List[_Pending],
+    ) -> None:
+        try:
+            with self.pool.lease(tenant, collection) as engine:
+                q_embs, results = engine._search_many([p.query for p in items], top_k, mode, where)
+        except Exception as e:
+            for pending in items:
+                pending.future.set_exception(e)
+            return
+        for i, pending in enumerate(items):
+            pending.future.set_result((None if q_embs is None else q_embs[i], results[i]))
+
+
+# ---------- HTTP ---------- #
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under bursts; overload is
+    # reported as 503 by the batcher instead.
+    request_queue_size = 1024
+
+def _chunk_json(chunk) -> dict:
+    return {
+        "chunk_id": chunk.chunk_id,
+        "source": chunk.source,
+        "page": chunk.page,
+        "section": chunk.section,
+        "uploaded_at": chunk.uploaded_at,
+        "tenant": chunk.tenant,
+        "content": chunk.content,
+    }
+
+
+def _resolve_path(data_dir: str, path: str) -> str:
+    # Only files under data_dir may be read on behalf of a client.
+    root = os.path.realpath(data_dir)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"Path {path!r} is outside the data directory.")
+    if not os.path.isfile(full):
+        raise ValueError(f"File {path!r} was not found.")
+    return full
+
+
+def make_handler(
+    batcher: QueryBatcher, pool: EnginePool, data_dir: str, timeout: float, metrics: Metrics
+):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body, content_type: str = "application/json",
+                  headers: Optional[Dict[str, str]] = None) -> None:
+            data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "pending": batcher.pending(), **pool.stats()})
+            elif self.path == "/metrics":
+                self._send(200, metrics.to_prometheus().encode("utf-8"),
+                           "text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": f"Unknown path {self.path!r}."})
+
+        def do_POST(self):
+            routes = {
+                "/index": self._index,
+                "/remove": self._remove,
+                "/retrieve": self._retrieve,
+                "/answer": self._answer,
+                "/cv-jd": self._cv_jd,
+            }
+            route = routes.get(self.path)
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if route is None:
+                    self._send(404, {"error": f"Unknown path {self.path!r}."})
+                    return
+                tenant = payload.get("tenant", "default")
+                collection = payload.get("collection", DEFAULT_COLLECTION)
+                self._send(200, route(tenant, collection, payload))
+            except Overloaded as e:
+                self._send(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            except FutureTimeout:
+                self._send(504, {"error": f"No result within {timeout:g} seconds."})
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def _index(self, tenant: str, collection: str, payload: dict) -> dict:
+            paths = [_resolve_path(data_dir, p) for p in payload["paths"]]
+            # Add-only: files indexed by earlier calls stay until /remove.
+            with pool.lease(tenant, collection, write=True) as engine:
+                added = engine.add_files(paths)
+                num_chunks = engine.num_chunks()
+            return {"files": len(paths), "added_chunks": added, "chunks": num_chunks}
+
+        def _remove(self, tenant: str, collection: str, payload: dict) -> dict:
+            sources = payload["sources"]
+            if not isinstance(sources, list):
+                raise ValueError("sources must be a list of indexed file names.")
+            with pool.lease(tenant, collection, write=True) as engine:
+                removed = sum(engine.remove_source(name) for name in sources)
+                num_chunks = engine.num_chunks()
+            return {"removed_chunks": removed, "chunks": num_chunks}
+
+        def _retrieve(self, tenant: str, collection: str, payload: dict) -> dict:
+            chunks = batcher.retrieve(
+                tenant, payload["query"], int(payload.get("top_k", 5)),
+                payload.get("mode"), timeout=timeout,
+                where=ChunkFilter.from_dict(payload.get("filter")), collection=collection,
+            )
+            return {"chunks": [_chunk_json(c) for c in chunks]}
+
+        def _answer(self, tenant: str, collection: str, payload: dict) -> dict:
+            text, chunks = batcher.answer(
+                tenant, payload["query"], int(payload.get("top_k", 5)), timeout=timeout,
+                where=ChunkFilter.from_dict(payload.get("filter")), collection=collection,
+            )
+            return {"answer": text, "sources": [_chunk_json(c) for c in chunks]}
+
+        def _cv_jd(self, tenant: str, collection: str, payload: dict) -> dict:
+            analysis = batcher.analyze_cv_vs_jd(
+                tenant,
+                _resolve_path(data_dir, payload["cv_path"]),
+                _resolve_path(data_dir, payload["jd_path"]),
+                timeout=timeout,
+                collection=collection,
+            )
+            return {"analysis": analysis}
+
+    return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--index-dir", default=os.path.join("vector_store", "tenants"))
+    parser.add_argument("--data-dir", default=".", help="Root for /index and /cv-jd file paths.")
+    parser.add_argument("--memory-limit-mb", type=int, default=1024)
+    parser.add_argument("--max-collections", type=int, default=64,
+                        help="Collections kept in memory before idle ones are unloaded.")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--shards", type=int, default=1, help="Index shards searched in parallel.")
+    parser.add_argument("--shard-by", default="hash", choices=SHARD_ROUTES)
+    parser.add_argument("--retrieval-mode", default="hybrid")
+    parser.add_argument("--embedding-backend", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--embed-batch", type=int, default=None, help="Encoder forward-pass batch size.")
+    parser.add_argument("--embed-threads", type=int, default=None, help="Encoder inference threads.")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--search-workers", type=int, default=4,
+                        help="Threads running batched searches, one (tenant, collection) group each.")
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--gen-workers", type=int, default=8)
+    parser.add_argument("--max-generating", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=90.0, help="Seconds per request.")
+    parser.add_argument("--stub", action="store_true", help="Hash encoder and stub LLM (see encoders.py, benchmark.py).")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="Stub LLM seconds per response.")
+    parser.add_argument("--no-warm-up", action="store_true",
+                        help="Load the encoder on the first request instead of in the background at startup.")
+    args = parser.parse_args(argv)
+
+    metrics = Metrics()
+    components = {
+        "embed_model": make_encoder(
+            args.embedding_backend, batch_size=args.embed_batch, threads=args.embed_threads
+        )
+    }
+    if args.stub:
+        from benchmark import StubLLM
+
+        components = {"embed_model": make_encoder("hash"), "llm": StubLLM(args.stub_delay)}
+
+    pool = EnginePool(
+        args.index_dir,
+        memory_limit_bytes=args.memory_limit_mb * 1024 * 1024,
+        max_loaded=args.max_collections,
+        index_type=args.index_type,
+        num_shards=args.shards,
+        shard_by=args.shard_by,
+        retrieval_mode=args.retrieval_mode,
+        metrics=metrics,
+        warm_up=not args.no_warm_up,
+        **components,
+    )
+    batcher = QueryBatcher(
+        pool,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        gen_workers=args.gen_workers,
+        max_generating=args.max_generating,
+        metrics=metrics,
+        search_workers=args.search_workers,
+    )
+    server = _Server(
+        (args.host, args.port),
+        make_handler(batcher, pool, args.data_dir, args.timeout, metrics),
+    )
+    print(f"Serving on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
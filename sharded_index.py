@@ -0,0 +1,316 @@
+import json
+import os
+import shutil
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+SHARD_ROUTES = ("hash", "source")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _search_pool() -> ThreadPoolExecutor:
+    # One pool for every sharded index in the process, so many loaded
+    # collections do not each start a thread per core.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="shard")
+        return _pool
+
+
+def merge_top_k(
+    results: Sequence[Tuple[np.ndarray, np.ndarray]], k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge per-shard (distances, ids) search results into one top-k by
+    ascending distance. Each shard's exact top-k contains that shard's share
+    of the global top-k, so the merge is exact. Empty slots are (inf, -1).
+    """
+    distances = np.concatenate([d for d, _ in results], axis=1).astype(np.float32)
+    ids = np.concatenate([i for _, i in results], axis=1)
+    distances[ids < 0] = np.inf
+    if distances.shape[1] < k:
+        pad = k - distances.shape[1]
+        distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+class ShardedIndex:
+    def __init__(self, shards: List, kind: str, dim: int):
+        """
+        N independent indexes of one `kind`, searched in parallel and merged
+        into a single exact top-k:
+        - add_with_ids sends each vector to one shard: by chunk id (id mod N)
+          or, when `route_keys` is set, by crc32 of a key per id (e.g. the
+          chunk's source file, so all of a file's chunks share a shard).
+        - search runs the shards on a shared thread pool (FAISS releases the
+          GIL, so shards use separate cores) and merges their top-k lists.
+        - After `save`, shards can be unloaded one by one; an unloaded shard
+          is read back from disk on first use.
+        Each shard numbers its vectors 0, 1, 2, ... (its local ids) and the
+        sharded index maps them to and from chunk ids, so a shard's id space
+        stays dense (quantized shards keep float rows by id on disk).
+        Exposes the subset of the FAISS index API that RAGEngine uses.
+        """
+        self.kind = kind
+        self.d = dim
+        self.shards: List[Optional[object]] = list(shards)
+        self.route_keys: Optional[Callable[[np.ndarray], Sequence[str]]] = None
+        # Called on every shard as it is created or loaded (search parameters).
+        self.configure: Callable[[object], None] = lambda shard: None
+        self._counts = [0] * len(shards)
+        # Per chunk id: owning shard (-1 when not in the index) and local id.
+        self._owner = np.full(0, -1, dtype=np.int16)
+        self._local = np.zeros(0, dtype=np.int64)
+        # Per shard: chunk id of each local id, and the next local id.
+        self._globals = [np.zeros(0, dtype=np.int64) for _ in shards]
+        self._next_local = [0] * len(shards)
+        self._dirty = set(range(len(shards)))
+        self._dir: Optional[str] = None
+        self._read_shard: Optional[Callable[[str], object]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def is_trained(self) -> bool:
+        return all(self.shard(i).is_trained for i in range(self.num_shards))
+
+    def shard_sizes(self) -> List[int]:
+        return list(self._counts)
+
+    # ---------- Shard loading ---------- #
+
+    def shard(self, i: int):
+        shard = self.shards[i]
+        if shard is None:
+            with self._lock:
+                shard = self.shards[i]
+                if shard is None:
+                    shard = self._read_shard(_shard_dir(self._dir, i))
+                    self.configure(shard)
+                    self.shards[i] = shard
+        return shard
+
+    def is_loaded(self, i: int) -> bool:
+        return self.shards[i] is not None
+
+    def unload_shard(self, i: int) -> None:
+        """
+        Free a shard's memory; it is read back from the last `save` on
+        first use. Shards changed since that save cannot be unloaded.
+        """
+        if self._dir is None or i in self._dirty:
+            raise RuntimeError(f"Shard {i} has unsaved changes; save the index first.")
+        with self._lock:
+            self.shards[i] = None
+
+    # ---------- FAISS index API ---------- #
+
+    def _route(self, ids: np.ndarray) -> np.ndarray:
+        if self.route_keys is None:
+            return (ids % self.num_shards).astype(np.int16)
+        keys = self.route_keys(ids)
+        return np.fromiter(
+            (zlib.crc32(str(key).encode("utf-8")) % self.num_shards for key in keys),
+            dtype=np.int16,
+            count=len(ids),
+        )
+
+    def _map(self, fn: Callable, items: Sequence):
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(_search_pool().map(fn, items))
+
+    def train(self, vectors: np.ndarray) -> None:
+        # Every shard learns from the same sample, so their codes agree.
+        self._map(lambda i: self.shard(i).train(vectors), range(self.num_shards))
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        needed = int(ids.max()) + 1
+        if needed > len(self._owner):
+            self._owner = _grow(self._owner, needed, -1)
+            self._local = _grow(self._local, needed, 0)
+
+        owners = self._route(ids)
+        groups = []
+        for s in np.unique(owners).tolist():
+            mask = owners == s
+            start = self._next_local[s]
+            local = np.arange(start, start + int(mask.sum()), dtype=np.int64)
+            self._next_local[s] = start + len(local)
+            self._globals[s] = _grow(self._globals[s], self._next_local[s], -1)
+            self._globals[s][local] = ids[mask]
+            self._owner[ids[mask]] = s
+            self._local[ids[mask]] = local
+            groups.append((s, mask, local))
+
+        self._map(lambda g: self.shard(g[0]).add_with_ids(vectors[g[1]], g[2]), groups)
+        for s, _, local in groups:
+            self._counts[s] += len(local)
+            self._dirty.add(s)
+
+    def _owners(self, ids: np.ndarray) -> np.ndarray:
+        owners = np.full(len(ids), -1, dtype=np.int16)
+        known = (ids >= 0) & (ids < len(self._owner))
+        owners[known] = self._owner[ids[known]]
+        return owners
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = self._owners(ids)
+        removed = 0
+        for s in np.unique(owners[owners >= 0]).tolist():
+            shard_ids = ids[owners == s]
+            n = self.shard(s).remove_ids(self._local[shard_ids])
+            self._owner[shard_ids] = -1
+            self._counts[s] -= n
+            self._dirty.add(s)
+            removed += n
+        return removed
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = self._owners(ids)
+        if (owners < 0).any():
+            raise KeyError(f"Ids not in the index: {ids[owners < 0][:5].tolist()}")
+        out = np.empty((len(ids), self.d), dtype=np.float32)
+        for s in np.unique(owners).tolist():
+            mask = owners == s
+            out[mask] = self.shard(s).reconstruct_batch(self._local[ids[mask]])
+        return out
+
+    def _to_global(self, s: int, local: np.ndarray) -> np.ndarray:
+        return np.where(local >= 0, self._globals[s][np.maximum(local, 0)], -1)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        active = [i for i in range(self.num_shards) if self._counts[i] > 0]
+        if not active:
+            return _no_results(len(queries), k)
+
+        def search_shard(i: int) -> Tuple[np.ndarray, np.ndarray]:
+            distances, local = self.shard(i).search(queries, min(k, self._counts[i]))
+            return distances, self._to_global(i, local)
+
+        return merge_top_k(self._map(search_shard, active), k)
+
+    def search_subset(
+        self,
+        queries: np.ndarray,
+        k: int,
+        ids: np.ndarray,
+        search_shard: Callable[[object, np.ndarray, int, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k among chunk `ids` only. Each shard that owns some of them runs
+        `search_shard(shard, queries, k, local_ids)`; the others are skipped
+        (and stay unloaded).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = self._owners(ids)
+        groups = [(s, self._local[ids[owners == s]]) for s in np.unique(owners[owners >= 0]).tolist()]
+        if not groups:
+            return _no_results(len(queries), k)
+
+        def run(group: Tuple[int, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+            s, local = group
+            distances, found = search_shard(self.shard(s), queries, k, local)
+            return distances, self._to_global(s, found)
+
+        return merge_top_k(self._map(run, groups), k)
+
+    def nbytes(self, shard_nbytes: Callable[[object], int]) -> int:
+        # Unloaded shards hold no memory; the id maps always do.
+        maps = self._owner.nbytes + self._local.nbytes + sum(g.nbytes for g in self._globals)
+        return maps + sum(shard_nbytes(shard) for shard in self.shards if shard is not None)
+
+    # ---------- Persistence ---------- #
+
+    def save(self, directory: str, write_shard: Callable[[object, str], None]) -> None:
+        """
+        Write sharded.json, the id maps and one `shard_NNN/` directory per
+        shard into `directory`. Unloaded shards are copied
+        from the previous save without being loaded.
+        """
+        for i in range(self.num_shards):
+            target = _shard_dir(directory, i)
+            if self.shards[i] is None:
+                shutil.copytree(_shard_dir(self._dir, i), target)
+            else:
+                os.makedirs(target, exist_ok=True)
+                write_shard(self.shards[i], target)
+        np.savez(os.path.join(directory, "shard_ids.npz"), owner=self._owner, local=self._local)
+        meta = {"kind": self.kind, "dim": self.d, "counts": self._counts, "next_local": self._next_local}
+        with open(os.path.join(directory, "sharded.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # Unloaded shards now load from here; older versions get pruned.
+        self._dir = directory
+        self._dirty.clear()
+
+    @classmethod
+    def open(
+        cls, directory: str, read_shard: Callable[[str], object], lazy: bool = True
+    ) -> "ShardedIndex":
+        """
+        Index saved by `save`. With `lazy`, shards are read on first use.
+        """
+        with open(os.path.join(directory, "sharded.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls([None] * len(meta["counts"]), meta["kind"], meta["dim"])
+        index._counts = list(meta["counts"])
+        index._next_local = list(meta["next_local"])
+        with np.load(os.path.join(directory, "shard_ids.npz")) as ids:
+            index._owner, index._local = ids["owner"], ids["local"]
+        # Removed ids keep a stale slot (-1); they are never returned by a shard.
+        live = np.flatnonzero(index._owner >= 0)
+        for s in range(index.num_shards):
+            index._globals[s] = np.full(index._next_local[s], -1, dtype=np.int64)
+            mine = live[index._owner[live] == s]
+            index._globals[s][index._local[mine]] = mine
+        index._dir = directory
+        index._read_shard = read_shard
+        index._dirty.clear()
+        if not lazy:
+            for i in range(index.num_shards):
+                index.shard(i)
+        return index
+
+
+def _no_results(num_queries: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    return (
+        np.full((num_queries, k), np.inf, dtype=np.float32),
+        np.full((num_queries, k), -1, dtype=np.int64),
+    )
+
+
+def _grow(array: np.ndarray, size: int, fill) -> np.ndarray:
+    # Amortized growth for the id maps: at least double when resizing.
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _shard_dir(directory: str, i: int) -> str:
+    return os.path.join(directory, f"shard_{i:03d}")
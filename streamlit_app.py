@@ -1,9 +1,64 @@
 import os
-from typing import List
+from typing import List, Optional
 
 import streamlit as st
 
-from rag_engine import RAGEngine
+from answer_cache import AnswerCache
+from chunk_store import ChunkFilter
+from chunker import Chunker
+from embedding_cache import EmbeddingCache
+from encoders import make_encoder
+from metrics import Metrics
+from pdf_text import PdfPageCache
+from rag_engine import RAGEngine, source_name
+from reranker import CrossEncoderReranker
+from tenants import EnginePool
+from upload_store import UploadStore
+
+# Where workspace indexes are persisted: <INDEX_DIR>/tenants/<workspace>/default/.
+INDEX_DIR = os.environ.get("RAG_INDEX_DIR", "vector_store")
+# Workspace opened when the URL does not name one (?workspace=...).
+DEFAULT_WORKSPACE = os.environ.get("RAG_WORKSPACE", "default")
+# Uploaded files, stored once per distinct content: <UPLOAD_DIR>/<sha1>/<name>,
+# with a hard link per extra name the same bytes were uploaded as.
+UPLOAD_DIR = os.environ.get("RAG_UPLOAD_DIR", "uploads")
+# Files at least this similar (MinHash Jaccard) to an indexed file are not re-embedded.
+DUPLICATE_THRESHOLD = float(os.environ.get("RAG_DUPLICATE_THRESHOLD", "0.9"))
+# Workspace indexes kept in memory before idle ones are unloaded to disk.
+MEMORY_LIMIT_MB = int(os.environ.get("RAG_MEMORY_LIMIT_MB", "1024"))
+# At most this many workspaces stay loaded, however small their indexes.
+MAX_WORKSPACES = int(os.environ.get("RAG_MAX_WORKSPACES", "64"))
+# Embeddings of previously seen chunks and questions.
+EMBED_CACHE_PATH = os.environ.get("RAG_EMBED_CACHE", "embedding_cache.sqlite3")
+# Extracted PDF pages, so re-uploading a file costs one hash instead of a re-parse.
+PAGE_CACHE_PATH = os.environ.get("RAG_PAGE_CACHE", "pdf_page_cache.sqlite3")
+# torch / onnx (int8-quantized ONNX Runtime, CPU) / hash embeddings (see encoders.py),
+# with optional forward-pass batch size and inference thread count.
+EMBED_BACKEND = os.environ.get("RAG_EMBED_BACKEND", "torch")
+EMBED_BATCH = int(os.environ.get("RAG_EMBED_BATCH", "0")) or None
+EMBED_THREADS = int(os.environ.get("RAG_EMBED_THREADS", "0")) or None
+ONNX_CACHE_DIR = os.environ.get("RAG_ONNX_CACHE", "onnx_models")
+# auto / pymupdf / pypdf (see pdf_text.py).
+PDF_BACKEND = os.environ.get("RAG_PDF_BACKEND", "auto")
+# flat / ivf_flat / hnsw / ivf_pq / sq8 / binary (see vector_index.py).
+INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "flat")
+# Index shards searched in parallel, split by chunk id (hash) or source file.
+NUM_SHARDS = int(os.environ.get("RAG_SHARDS", "1"))
+SHARD_BY = os.environ.get("RAG_SHARD_BY", "hash")
+# dense / hybrid / lexical retrieval (see RAGEngine).
+RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "hybrid")
+# chars / tokens / sentences chunking (see chunker.py).
+CHUNKING = os.environ.get("RAG_CHUNKING", "sentences")
+# Cross-encoder re-ranking: "1" to enable, with a per-query time budget in seconds.
+RERANK = os.environ.get("RAG_RERANK", "0") == "1"
+RERANK_BUDGET = float(os.environ.get("RAG_RERANK_BUDGET", "0.5"))
+# CV vs JD analysis: single prompt / map_reduce per requirement / auto by length.
+CV_JD_MODE = os.environ.get("RAG_CV_JD_MODE", "auto")
+# "1" loads the encoder in the background as soon as the server starts, instead
+# of on the first indexing or question.
+WARM_UP = os.environ.get("RAG_WARM_UP", "1") == "1"
+# Seconds before a streaming Gemini answer is cut off.
+LLM_TIMEOUT = float(os.environ.get("RAG_LLM_TIMEOUT", "90"))
 
 
 # ---------- Page config ----------
@@ -266,18 +321,106 @@ div.stAlert {
 st.markdown(APP_CSS, unsafe_allow_html=True)
 
 
+# ---------- Shared engine ----------
+
+@st.cache_resource
+def get_engine_pool() -> EnginePool:
+    """
+    One pool per server process: the encoder is loaded once and every
+    browser session gets its workspace's index from here.
+    """
+    return EnginePool(
+        os.path.join(INDEX_DIR, "tenants"),
+        memory_limit_bytes=MEMORY_LIMIT_MB * 1024 * 1024,
+        max_loaded=MAX_WORKSPACES,
+        embed_model=make_encoder(
+            EMBED_BACKEND,
+            batch_size=EMBED_BATCH,
+            threads=EMBED_THREADS,
+            cache_dir=ONNX_CACHE_DIR,
+        ),
+        embedding_cache=EmbeddingCache(EMBED_CACHE_PATH),
+        page_cache=PdfPageCache(PAGE_CACHE_PATH),
+        pdf_backend=PDF_BACKEND,
+        duplicate_threshold=DUPLICATE_THRESHOLD,
+        index_type=INDEX_TYPE,
+        num_shards=NUM_SHARDS,
+        shard_by=SHARD_BY,
+        answer_cache_factory=AnswerCache,
+        retrieval_mode=RETRIEVAL_MODE,
+        metrics=Metrics(),
+        chunker=Chunker(CHUNKING),
+        reranker=CrossEncoderReranker(budget_s=RERANK_BUDGET) if RERANK else None,
+        # Re-ranked passages are precise enough to send fewer of them.
+        answer_top_k=3 if RERANK else 5,
+        cv_jd_mode=CV_JD_MODE,
+        warm_up=WARM_UP,
+    )
+
+
+pool = get_engine_pool()
+upload_store = UploadStore(UPLOAD_DIR)
+
+
+def stored_upload_path(uploaded_file) -> str:
+    """
+    Path of an upload in the content-addressed store. Streamlit reruns the
+    script on every interaction; the file is hashed and written only the
+    first time this session sees it; stored content is linked, not rewritten.
+    """
+    paths = st.session_state.setdefault("upload_paths", {})
+    key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if key not in paths:
+        paths[key], _ = upload_store.put(uploaded_file.name, uploaded_file.getbuffer())
+    return paths[key]
+
+
+def indexed_source_path(engine: RAGEngine, name: str) -> Optional[str]:
+    """
+    File behind an indexed source name: the path this session indexed it
+    from, else the stored upload with the same content hash (indexed in an
+    earlier session or by someone sharing the workspace). None if neither
+    exists.
+    """
+    path = st.session_state.setdefault("source_paths", {}).get(name)
+    if path is not None and os.path.exists(path):
+        return path
+    entry = engine.sources.get(name)
+    return upload_store.find(entry["hash"], name) if entry else None
+
+
 # ---------- Session state ----------
 
-if "rag" not in st.session_state:
-    st.session_state.rag: RAGEngine = RAGEngine()
-    st.session_state.index_built = False
+if "workspace" not in st.session_state:
+    # Kept in the URL, so a refresh or a server restart reopens the same
+    # saved index. Workspaces are shared by name, not private per user.
+    st.session_state.workspace = st.query_params.get("workspace", DEFAULT_WORKSPACE)
     st.session_state.chat_history: List[dict] = []
-    st.session_state.last_files = []
-    st.session_state.chunks_count = 0
     st.session_state.questions_count = 0
     st.session_state.jd_path = None  # Job Description path
 
-rag: RAGEngine = st.session_state.rag
+with st.sidebar:
+    workspace = st.text_input(
+        "Workspace",
+        value=st.session_state.workspace,
+        help="Everyone using the same workspace name sees the same documents. "
+        "Use a name only your team knows to keep CVs apart.",
+    ).strip()
+    try:
+        # Reopens the workspace's saved index instead of re-embedding everything.
+        rag: RAGEngine = pool.get(workspace)
+        st.session_state.workspace = workspace
+        st.query_params["workspace"] = workspace
+    except ValueError as e:
+        st.error(str(e))
+        if st.session_state.workspace == workspace:
+            # An invalid name from the URL.
+            st.session_state.workspace = DEFAULT_WORKSPACE
+        rag = pool.get(st.session_state.workspace)
+
+st.session_state.chunks_count = rag.num_chunks()
+st.session_state.last_files = rag.indexed_sources()
+st.session_state.index_built = st.session_state.chunks_count > 0
 
 
 # ---------- Sidebar: upload & controls ----------
@@ -307,10 +450,7 @@ with st.sidebar:
     file_paths = []
     if uploaded_files:
         for uf in uploaded_files:
-            save_path = os.path.join("uploaded_" + uf.name)
-            with open(save_path, "wb") as f:
-                f.write(uf.getbuffer())
-            file_paths.append(save_path)
+            file_paths.append(stored_upload_path(uf))
 
     st.markdown("---")
     st.markdown("#### 📄 Job Description (optional)")
@@ -318,10 +458,7 @@ with st.sidebar:
         "JD PDF / TXT", type=["pdf", "txt"], key="jd_uploader"
     )
     if jd_file is not None:
-        jd_save_path = os.path.join("uploaded_jd_" + jd_file.name)
-        with open(jd_save_path, "wb") as f:
-            f.write(jd_file.getbuffer())
-        st.session_state.jd_path = jd_save_path
+        st.session_state.jd_path = stored_upload_path(jd_file)
         st.caption(f"JD loaded: {jd_file.name}")
 
     st.markdown("---")
@@ -334,18 +471,56 @@ with st.sidebar:
                 file_paths = ["sample.txt"]
 
             with st.spinner("Building embeddings index..."):
+                progress_bar = st.progress(0.0)
+
+                def show_progress(files_done: int, files_total: int, chunks: int):
+                    progress_bar.progress(
+                        files_done / files_total,
+                        text=f"{files_done}/{files_total} files · {chunks} new chunks",
+                    )
+
                 try:
-                    num_files, num_chunks = rag.build_index(file_paths)
-                    st.session_state.index_built = True
-                    st.session_state.last_files = file_paths
+                    # Exclusive while indexing; the pool saves the workspace afterwards.
+                    # Add-only: documents indexed earlier, or by others sharing the
+                    # workspace, stay until they are removed below.
+                    with pool.lease(st.session_state.workspace, write=True) as rag:
+                        rag.add_files(file_paths, progress=show_progress)
+                        st.session_state.setdefault("source_paths", {}).update(
+                            (source_name(p), p) for p in file_paths
+                        )
+                        num_chunks = rag.num_chunks()
+                        st.session_state.last_files = rag.indexed_sources()
+                    st.session_state.index_built = num_chunks > 0
                     st.session_state.chunks_count = num_chunks
                     st.success(
-                        f"Indexed {num_files} file(s) into {num_chunks} text chunks."
+                        f"Indexed {len(file_paths)} file(s) · "
+                        f"{num_chunks} text chunks in the workspace."
                     )
+                    duplicates = rag.duplicates()
+                    if duplicates:
+                        st.info(
+                            "Skipped duplicates: "
+                            + ", ".join(f"{d} ≈ {o}" for d, o in duplicates.items())
+                        )
                 except Exception as e:
-                    st.session_state.index_built = False
                     st.error(f"Error while indexing: {e}")
 
+    if st.session_state.last_files:
+        to_remove = st.multiselect(
+            "Indexed documents",
+            st.session_state.last_files,
+            placeholder="Select documents to remove",
+        )
+        if st.button(
+            "🗑️ Remove from index",
+            use_container_width=True,
+            disabled=not to_remove,
+        ):
+            with pool.lease(st.session_state.workspace, write=True) as rag:
+                for name in to_remove:
+                    rag.remove_source(name)
+            st.experimental_rerun()
+
     if st.button("🧹 Clear chat", use_container_width=True):
         st.session_state.chat_history = []
         st.session_state.questions_count = 0
@@ -494,6 +669,14 @@ with tab_chat:
                 ):
                     st.markdown(msg["content"])
 
+            # Questions like "Summarize this CV" should only see that CV's chunks.
+            scope = st.multiselect(
+                "Search in",
+                rag.indexed_sources(),
+                placeholder="All documents",
+            )
+            where = ChunkFilter(sources=scope) if scope else None
+
             user_input = quick_question or st.chat_input(
                 "Ask a question about your CVs or documents..."
             )
@@ -508,19 +691,28 @@ with tab_chat:
                     st.markdown(user_input)
 
                 with st.chat_message("assistant", avatar="🤖"):
-                    with st.spinner(
-                        "Retrieving relevant chunks and generating answer..."
-                    ):
-                        answer, retrieved = rag.answer(user_input)
+                    answer_box = st.empty()
+                    answer = ""
+                    retrieved = []
+                    with pool.lease(st.session_state.workspace) as rag:
+                        with st.spinner("Retrieving relevant chunks..."):
+                            events = rag.answer_stream(
+                                user_input, timeout=LLM_TIMEOUT, where=where
+                            )
+                            _, retrieved = next(events)
 
-                    st.markdown(answer)
+                        for _, token in events:
+                            answer += token
+                            answer_box.markdown(answer + "▌")
+                    answer_box.markdown(answer)
 
                     if retrieved:
                         st.markdown("")
                         st.markdown("**Sources**")
                         for i, ch in enumerate(retrieved, start=1):
+                            page = f" · p. {ch.page}" if ch.page else ""
                             st.markdown(
-                                f"<span class='source-badge'>[{i}] {ch.source}</span>",
+                                f"<span class='source-badge'>[{i}] {ch.source}{page}</span>",
                                 unsafe_allow_html=True,
                             )
 
@@ -541,10 +733,26 @@ with tab_chat:
             use_container_width=True,
             disabled=not (cv_available and jd_available),
         ):
-            cv_path = st.session_state.last_files[0]
-            with st.spinner("Analyzing CV against Job Description..."):
-                analysis_text = rag.analyze_cv_vs_jd(cv_path, st.session_state.jd_path)
-            st.markdown(analysis_text)
+            # last_files holds source names; the analysis reads the file itself.
+            cv_path = indexed_source_path(rag, st.session_state.last_files[0])
+            if cv_path is None:
+                st.error("The indexed CV file is no longer available. Upload and index it again.")
+            else:
+                analysis_box = st.empty()
+                analysis_text = ""
+
+                def show_assessed(done: int, total: int):
+                    analysis_box.caption(f"Assessed {done}/{total} job requirements...")
+
+                for token in rag.analyze_cv_vs_jd_stream(
+                    cv_path,
+                    st.session_state.jd_path,
+                    timeout=LLM_TIMEOUT,
+                    progress=show_assessed,
+                ):
+                    analysis_text += token
+                    analysis_box.markdown(analysis_text + "▌")
+                analysis_box.markdown(analysis_text)
 
         if not (cv_available and jd_available):
             st.caption(
@@ -593,12 +801,59 @@ with tab_insights:
     st.markdown("**Engine summary**")
     st.markdown(
         """
-- Retrieval: FAISS vector index on sentence-transformers embeddings.
+- Retrieval: FAISS vector index on sentence-transformers embeddings, fused with a BM25 keyword index.
 - Generation: Gemini (if configured) with RAG grounding.
 - Use cases: CV analysis, CV vs JD matching, document Q&A.
 """
     )
 
+    st.markdown("**Stage latency (all sessions)**")
+    stage_stats = rag.metrics.snapshot()["stages"]
+    if stage_stats:
+        st.table(
+            [
+                {
+                    "Stage": name,
+                    "Calls": stats["count"],
+                    "p50 (ms)": round(stats["p50_s"] * 1000, 1),
+                    "p95 (ms)": round(stats["p95_s"] * 1000, 1),
+                }
+                for name, stats in stage_stats.items()
+            ]
+        )
+        with st.expander("Prometheus metrics"):
+            st.code(rag.metrics.to_prometheus(), language="text")
+    else:
+        st.caption("No timings yet. Index documents or ask a question first.")
+
+    if rag.embedding_cache is not None:
+        cache_stats = rag.embedding_cache.stats()
+        st.caption(
+            f"Embedding cache: {cache_stats['entries']} entries · "
+            f"hit rate {cache_stats['hit_rate']:.0%} "
+            f"({cache_stats['hits']} hits / {cache_stats['misses']} misses)"
+        )
+    if rag.answer_cache is not None:
+        cache_stats = rag.answer_cache.stats()
+        st.caption(
+            f"Answer cache: {cache_stats['entries']} answers · "
+            f"hit rate {cache_stats['hit_rate']:.0%}"
+        )
+    page_cache = rag.page_cache
+    if page_cache is not None:
+        cache_stats = page_cache.stats()
+        st.caption(
+            f"PDF page cache: {cache_stats['files']} files / {cache_stats['pages']} pages · "
+            f"hit rate {cache_stats['hit_rate']:.0%}"
+        )
+    pool_stats = pool.stats()
+    st.caption(
+        f"Workspaces in memory: {len(pool_stats['collections'])} · "
+        f"{pool_stats['memory_bytes'] / 2**20:.1f} / "
+        f"{pool_stats['memory_limit_bytes'] / 2**20:.0f} MB · "
+        f"{pool_stats['evictions']} unloaded to disk"
+    )
+
 
 # ---------- Help / How it works tab ----------
 
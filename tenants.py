@@ -0,0 +1,316 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from answer_cache import AnswerCache
+from encoders import make_encoder
+from rag_engine import DEFAULT_MODEL_NAME, RAGEngine
+
+
+NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+DEFAULT_COLLECTION = "default"
+
+
+class _RWLock:
+    """
+    Many readers or one writer. A writer waits for the current readers to
+    finish; new readers wait behind a waiting writer, so a steady stream of
+    queries cannot starve indexing.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking:
+                if self._writer or self._readers:
+                    return False
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+            self._writer = True
+            return True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class _Slot:
+    __slots__ = ("engine", "lock", "saved_version", "evicted")
+
+    def __init__(self, engine: RAGEngine):
+        self.engine = engine
+        self.lock = _RWLock()
+        self.saved_version = engine.index_version
+        self.evicted = False
+
+
+class EnginePool:
+    def __init__(
+        self,
+        root: str,
+        memory_limit_bytes: int = 1 << 30,
+        max_loaded: int = 64,
+        model_name: str = DEFAULT_MODEL_NAME,
+        embed_model=None,
+        llm=None,
+        answer_cache_factory: Optional[Callable[[], AnswerCache]] = AnswerCache,
+        warm_up: bool = False,
+        **engine_kwargs,
+    ):
+        """
+        Process-wide set of RAG engines, one per (tenant, collection):
+        - The encoder, LLM client, embedding cache, metrics and re-ranker are
+          created once and shared; each collection keeps its own index,
+          chunks, BM25 postings and answer cache.
+        - Collections are saved under `root/<tenant>/<collection>/` and
+          reopened from there on first use.
+        - When the loaded collections exceed `memory_limit_bytes` (see
+          RAGEngine.memory_bytes), or there are more than `max_loaded` of
+          them, the least recently used idle ones are saved and unloaded.
+          The count bounds the many small collections the memory limit
+          barely sees.
+        - `warm_up=True` starts loading the shared encoder in the background
+          now (and the LLM client with the first engine), before any
+          collection is opened.
+        `engine_kwargs` are passed to every RAGEngine (index_type,
+        retrieval_mode, chunker, embedding_cache, metrics, ...).
+        """
+        self.root = root
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_loaded = max_loaded
+        self.model_name = model_name
+        self.embed_model = embed_model
+        self.llm = llm
+        self.answer_cache_factory = answer_cache_factory
+        self.engine_kwargs = engine_kwargs
+        self.warm_up = warm_up
+        self.evictions = 0
+        if warm_up:
+            if self.embed_model is None:
+                self.embed_model = make_encoder(
+                    engine_kwargs.get("embedding_backend", "torch"), model_name
+                )
+            if hasattr(self.embed_model, "warm_up"):
+                self.embed_model.warm_up()
+
+        self._slots: "OrderedDict[Tuple[str, str], _Slot]" = OrderedDict()
+        # Collections being read from disk, set once they are in _slots.
+        self._loading: Dict[Tuple[str, str], threading.Event] = {}
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+
+    # ---------- Access ---------- #
+
+    def get(self, tenant: str, collection: str = DEFAULT_COLLECTION) -> RAGEngine:
+        """
+        The engine for a collection, loading it from disk (or creating it
+        empty) if needed. Prefer `lease` while using it, so it is not
+        unloaded mid-request.
+        """
+        return self._slot(tenant, collection).engine
+
+    @contextmanager
+    def lease(
+        self, tenant: str, collection: str = DEFAULT_COLLECTION, write: bool = False
+    ) -> Iterator[RAGEngine]:
+        """
+        Use a collection's engine: shared for queries, exclusive with
+        `write=True` (indexing, removal). Leased engines are never evicted.
+        With `write=True` the collection is saved to disk afterwards.
+        """
+        while True:
+            slot = self._slot(tenant, collection)
+            if write:
+                slot.lock.acquire_write()
+            else:
+                slot.lock.acquire_read()
+            if not slot.evicted:
+                break
+            # Evicted between lookup and lock: load it again.
+            if write:
+                slot.lock.release_write()
+            else:
+                slot.lock.release_read()
+
+        try:
+            yield slot.engine
+            if write:
+                self._save_slot(tenant, collection, slot)
+        finally:
+            if write:
+                slot.lock.release_write()
+            else:
+                slot.lock.release_read()
+        if write:
+            self._enforce_limit(keep=(tenant, collection))
+
+    def _slot(self, tenant: str, collection: str) -> _Slot:
+        key = (_check_name(tenant), _check_name(collection))
+        while True:
+            with self._lock:
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self._slots.move_to_end(key)
+                    return slot
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another thread is loading it; other collections stay available.
+            loading.wait()
+
+        try:
+            slot = _Slot(self._open_engine(*key))
+            with self._lock:
+                self._slots[key] = slot
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+        self._enforce_limit(keep=key)
+        return slot
+
+    def _open_engine(self, tenant: str, collection: str) -> RAGEngine:
+        # The shared encoder and LLM client are created at most once; the
+        # (possibly large) index is read without holding any pool lock.
+        with self._open_lock:
+            engine = RAGEngine(
+                model_name=self.model_name,
+                embed_model=self.embed_model,
+                llm=self.llm,
+                answer_cache=self.answer_cache_factory() if self.answer_cache_factory else None,
+                warm_up=self.warm_up,
+                tenant=tenant,
+                **self.engine_kwargs,
+            )
+            self.embed_model = engine.embed_model
+            self.llm = engine.model
+        try:
+            engine.load(self.collection_dir(tenant, collection))
+        except FileNotFoundError:
+            pass
+        return engine
+
+    # ---------- Persistence and eviction ---------- #
+
+    def collection_dir(self, tenant: str, collection: str = DEFAULT_COLLECTION) -> str:
+        return os.path.join(self.root, _check_name(tenant), _check_name(collection))
+
+    def _save_slot(self, tenant: str, collection: str, slot: _Slot) -> None:
+        # Caller holds the slot's write lock.
+        if slot.engine.index_version != slot.saved_version:
+            slot.engine.save(self.collection_dir(tenant, collection))
+            slot.saved_version = slot.engine.index_version
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            slots = list(self._slots.values())
+        return sum(slot.engine.memory_bytes() for slot in slots)
+
+    def _enforce_limit(self, keep: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Unload least recently used collections until under the memory limit
+        and `max_loaded`. Collections that are leased (or `keep`) are skipped.
+        """
+        with self._lock:
+            candidates = [k for k in self._slots if k != keep]
+        for key in candidates:
+            if not self._over_limit():
+                return
+            self.unload(*key, blocking=False)
+
+    def _over_limit(self) -> bool:
+        with self._lock:
+            if len(self._slots) > self.max_loaded:
+                return True
+        return self.memory_bytes() > self.memory_limit_bytes
+
+    def unload(self, tenant: str, collection: str = DEFAULT_COLLECTION, blocking: bool = True) -> bool:
+        """
+        Save a collection if it changed and drop it from memory.
+        Returns False if it is not loaded, or busy and `blocking` is off.
+        """
+        key = (tenant, collection)
+        with self._lock:
+            slot = self._slots.get(key)
+        if slot is None or not slot.lock.acquire_write(blocking=blocking):
+            return False
+        try:
+            if slot.evicted:
+                return False
+            self._save_slot(tenant, collection, slot)
+            slot.evicted = True
+            with self._lock:
+                if self._slots.get(key) is slot:
+                    del self._slots[key]
+            self.evictions += 1
+            return True
+        finally:
+            slot.lock.release_write()
+
+    def close(self) -> None:
+        """
+        Save and unload every collection.
+        """
+        with self._lock:
+            keys = list(self._slots)
+        for key in keys:
+            self.unload(*key)
+
+    # ---------- Introspection ---------- #
+
+    def loaded(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return list(self._slots)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            slots = list(self._slots.items())
+        return {
+            "collections": {
+                f"{tenant}/{collection}": {
+                    "chunks": slot.engine.num_chunks(),
+                    "memory_bytes": slot.engine.memory_bytes(),
+                }
+                for (tenant, collection), slot in slots
+            },
+            "memory_bytes": sum(slot.engine.memory_bytes() for _, slot in slots),
+            "memory_limit_bytes": self.memory_limit_bytes,
+            "max_loaded": self.max_loaded,
+            "evictions": self.evictions,
+        }
+
+
+def _check_name(name: str) -> str:
+    # Tenant and collection names become directory names.
+    if not NAME_RE.match(name or ""):
+        raise ValueError(
+            f"Invalid name {name!r}: use up to 64 letters, digits, '.', '_' or '-'."
+        )
+    return name
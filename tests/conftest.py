@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoders import HashEncoder  # noqa: E402
+from rag_engine import RAGEngine  # noqa: E402
+from tenants import EnginePool  # noqa: E402
+
+
+class FakeLLM:
+    """
+    Gemini-shaped generator: answers `reply` after `delay` seconds (per
+    streamed word when streaming) and records every prompt it was sent.
+    """
+
+    def __init__(self, reply: str = "Verdict: Met\nReason: excerpt [1] shows it.", delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        with self._lock:
+            self.prompts.append(prompt)
+        if not stream:
+            time.sleep(self.delay)
+            return SimpleNamespace(text=self.reply)
+        return self._stream()
+
+    def _stream(self):
+        for word in self.reply.split(" "):
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=word + " ")
+
+
+@pytest.fixture
+def make_engine():
+    def make(llm=None, **kwargs):
+        return RAGEngine(embed_model=HashEncoder(), llm=llm or FakeLLM(), **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = EnginePool(str(tmp_path / "tenants"), embed_model=HashEncoder(), llm=None)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def write_docs(tmp_path):
+    def write(**docs):
+        paths = []
+        for name, text in docs.items():
+            path = tmp_path / f"{name}.txt"
+            path.write_text(text, encoding="utf-8")
+            paths.append(str(path))
+        return paths
+
+    return write
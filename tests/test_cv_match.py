@@ -0,0 +1,28 @@
+from conftest import FakeLLM
+
+CV = "Jane Doe\nExperience\nBuilt Python services on AWS with Docker.\nSkills\nPython, SQL\n"
+JD = "Requirements\n" + "".join(f"- Experience with tool number {i}\n" for i in range(1, 16))
+
+
+def test_every_requirement_is_checked_by_default(make_engine, write_docs):
+    llm = FakeLLM()
+    engine = make_engine(llm, cv_jd_mode="map_reduce")
+    cv, jd = write_docs(cv=CV, jd=JD)
+
+    engine.analyze_cv_vs_jd(cv, jd)
+
+    checked = [p for p in llm.prompts if "checking one job requirement" in p]
+    assert len(checked) == 15
+    assert "not checked" not in llm.prompts[-1]
+
+
+def test_capped_requirements_are_reported_as_unchecked(make_engine, write_docs):
+    llm = FakeLLM()
+    engine = make_engine(llm, cv_jd_mode="map_reduce", cv_jd_max_requirements=12)
+    cv, jd = write_docs(cv=CV, jd=JD)
+
+    analysis = "".join(engine.analyze_cv_vs_jd_stream(cv, jd))
+
+    assert len([p for p in llm.prompts if "checking one job requirement" in p]) == 12
+    assert "3 further requirement(s) of the Job Description were not checked" in llm.prompts[-1]
+    assert "3 of 15 job requirements were not checked" in analysis
@@ -0,0 +1,22 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def test_lru_eviction_keeps_count_in_step_with_the_table(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    keys = [EmbeddingCache.key("m", f"text {i}") for i in range(5)]
+    vec = np.ones(4, dtype=np.float32)
+
+    cache.put_many([(k, vec) for k in keys[:3]])
+    cache.get_many([keys[0], keys[2]])  # keys[1] is now the least recently used
+    cache.put_many([(keys[0], vec), (keys[3], vec)])
+
+    assert len(cache) == 3
+    assert set(cache.get_many(keys)) == {keys[0], keys[2], keys[3]}
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    assert len(reopened) == 3
+    assert reopened._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened.close()
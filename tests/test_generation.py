@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from answer_cache import AnswerCache
+from conftest import FakeLLM
+from rag_engine import LLM_TIMEOUT_HEADER
+
+DOCS = {
+    "cv_jane": "Jane Doe is a backend engineer. She writes Python and deploys to AWS.",
+    "cv_omar": "Omar Ali is a data analyst. He builds dashboards in SQL and Tableau.",
+}
+QUESTION = "Which candidate writes Python?"
+
+
+@pytest.fixture
+def indexed(make_engine, write_docs):
+    def make(llm, **kwargs):
+        engine = make_engine(llm, **kwargs)
+        engine.add_files(write_docs(**DOCS))
+        return engine
+
+    return make
+
+
+def tokens(events):
+    return "".join(value for kind, value in events if kind == "token")
+
+
+def test_stream_stops_at_the_timeout(indexed):
+    engine = indexed(FakeLLM(reply="one two three four five six", delay=0.2))
+
+    started = time.perf_counter()
+    text = tokens(engine.answer_stream(QUESTION, timeout=0.5))
+
+    assert time.perf_counter() - started < 1.0
+    assert text.startswith("one two")
+    assert text.endswith("_(Answer stopped: generation timed out.)_")
+
+
+def test_stream_falls_back_to_passages_when_nothing_arrives_in_time(indexed):
+    engine = indexed(FakeLLM(delay=2.0))
+
+    started = time.perf_counter()
+    text = tokens(engine.answer_stream(QUESTION, timeout=0.2))
+
+    assert time.perf_counter() - started < 1.0
+    assert text.startswith(LLM_TIMEOUT_HEADER)
+    assert "Jane Doe" in text
+
+
+def test_cancelled_stream_stops_and_is_not_cached(indexed):
+    engine = indexed(FakeLLM(reply="one two three four five six", delay=0.1), answer_cache=AnswerCache())
+    cancel = threading.Event()
+
+    received = []
+    for kind, value in engine.answer_stream(QUESTION, cancel=cancel):
+        if kind == "token":
+            received.append(value)
+            cancel.set()
+
+    assert received == ["one "]
+    assert engine.answer_cache.stats()["entries"] == 0
+
+
+def test_repeated_question_is_answered_from_the_cache(indexed):
+    llm = FakeLLM(reply="Jane Doe writes Python.")
+    engine = indexed(llm, answer_cache=AnswerCache())
+
+    first, _ = engine.answer(QUESTION)
+    second = tokens(engine.answer_stream(QUESTION))
+
+    assert first == second.strip() == "Jane Doe writes Python."
+    assert len(llm.prompts) == 1
+    assert engine.answer_cache.stats()["hits"] == 1
+
+
+def test_map_reduce_cv_jd_analysis_is_bounded_by_the_timeout(make_engine, write_docs):
+    llm = FakeLLM(delay=2.0)
+    engine = make_engine(llm, cv_jd_mode="map_reduce")
+    cv, jd = write_docs(
+        cv="Jane Doe\nExperience\nBackend engineer writing Python on AWS.\n",
+        jd="Requirements\n- 5 years of Python\n- AWS experience\n- SQL databases\n",
+    )
+    progress = []
+
+    started = time.perf_counter()
+    text = "".join(
+        engine.analyze_cv_vs_jd_stream(
+            cv, jd, timeout=0.3, progress=lambda done, total: progress.append(done)
+        )
+    )
+
+    assert time.perf_counter() - started < 1.0
+    assert text == "Gemini timed out while analyzing CV vs JD."
+    assert progress == []
@@ -0,0 +1,8 @@
+def test_answer_many_uses_answer_top_k_like_answer(make_engine, write_docs):
+    engine = make_engine(answer_top_k=2)
+    engine.add_files(write_docs(**{f"cv{i}": f"Candidate {i} knows Python and SQL." for i in range(6)}))
+
+    _, single = engine.answer("Who knows Python?")
+    (_, batched), = engine.answer_many(["Who knows Python?"])
+
+    assert len(single) == len(batched) == 2
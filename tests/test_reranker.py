@@ -0,0 +1,41 @@
+import sys
+import time
+import types
+
+from chunk_store import RetrievedChunk
+from reranker import CrossEncoderReranker
+
+
+class SlowLoadingCrossEncoder:
+    def __init__(self, model_name):
+        time.sleep(0.3)
+
+    def predict(self, pairs):
+        # Longer passages score higher.
+        return [len(passage) for _, passage in pairs]
+
+
+def test_model_load_does_not_count_against_the_budget(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules,
+        "sentence_transformers",
+        types.SimpleNamespace(CrossEncoder=SlowLoadingCrossEncoder),
+    )
+    reranker = CrossEncoderReranker(batch_size=16, budget_s=0.1)
+    chunks = [RetrievedChunk("x" * (i % 7 + 1), f"doc{i}.txt", i) for i in range(40)]
+
+    kept, reranked = reranker.rerank("query", chunks, top_k=3)
+
+    assert reranked
+    assert [len(c.content) for c in kept] == [7, 7, 7]
+
+
+def test_warm_up_loads_the_model_in_the_background(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules,
+        "sentence_transformers",
+        types.SimpleNamespace(CrossEncoder=SlowLoadingCrossEncoder),
+    )
+    reranker = CrossEncoderReranker()
+    reranker.warm_up().join(5)
+    assert isinstance(reranker._model, SlowLoadingCrossEncoder)
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from service import QueryBatcher
+
+
+def test_write_lease_on_one_tenant_does_not_block_another(pool, write_docs):
+    with pool.lease("a", write=True) as engine:
+        engine.add_files(write_docs(a_cv="Alice writes Python services."))
+    with pool.lease("b", write=True) as engine:
+        engine.add_files(write_docs(b_cv="Bob deploys Kubernetes clusters."))
+
+    batcher = QueryBatcher(pool, max_wait_ms=50)
+    indexing = threading.Event()
+    release = threading.Event()
+
+    def index_a():
+        with pool.lease("a", write=True):
+            indexing.set()
+            release.wait(10)
+
+    writer = threading.Thread(target=index_a)
+    writer.start()
+    try:
+        indexing.wait(5)
+        # Queued in the same batch as b's query, and stuck behind a's writer.
+        blocked = batcher.submit_retrieve("a", "Python")
+        started = time.perf_counter()
+        chunks = batcher.retrieve("b", "Kubernetes", timeout=5)
+        assert time.perf_counter() - started < 2
+        assert [c.source for c in chunks] == ["b_cv.txt"]
+        assert not blocked.done()
+    finally:
+        release.set()
+        writer.join()
+    assert [c.source for c in blocked.result(5)[1]] == ["a_cv.txt"]
+    batcher.close()
+
+
+def test_unknown_retrieval_mode_is_rejected(pool):
+    batcher = QueryBatcher(pool)
+    try:
+        with pytest.raises(ValueError, match="Unknown retrieval mode 'keyword'"):
+            batcher.retrieve("a", "Python", mode="keyword", timeout=5)
+        with pytest.raises(ValueError, match="Unknown retrieval mode"):
+            pool.get("a")._search_many(["Python"], 5, "keyword")
+    finally:
+        batcher.close()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from encoders import HashEncoder
+from tenants import EnginePool, _RWLock
+
+
+def test_writer_is_not_starved_by_overlapping_readers():
+    lock = _RWLock()
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            lock.acquire_read()
+            time.sleep(0.01)
+            lock.release_read()
+
+    # Staggered so some reader always holds the lock.
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for t in readers:
+        t.start()
+        time.sleep(0.003)
+
+    acquired = threading.Event()
+
+    def writer():
+        lock.acquire_write()
+        acquired.set()
+        lock.release_write()
+
+    threading.Thread(target=writer).start()
+    try:
+        assert acquired.wait(2)
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+
+
+def test_small_collections_are_unloaded_past_max_loaded(tmp_path):
+    pool = EnginePool(str(tmp_path), embed_model=HashEncoder(), llm=None, max_loaded=3)
+    for i in range(10):
+        pool.get(f"session-{i}")
+    assert pool.loaded() == [(f"session-{i}", "default") for i in (7, 8, 9)]
+    assert pool.stats()["evictions"] == 7
@@ -0,0 +1,19 @@
+import os
+
+from upload_store import UploadStore
+
+
+def test_same_bytes_keep_each_uploaders_name(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first, first_new = store.put("jane_doe_cv.pdf", b"%PDF same bytes")
+    second, second_new = store.put("candidate.pdf", b"%PDF same bytes")
+
+    assert (first_new, second_new) == (True, False)
+    assert os.path.basename(first) == "jane_doe_cv.pdf"
+    assert os.path.basename(second) == "candidate.pdf"
+    assert os.path.dirname(first) == os.path.dirname(second)
+    with open(second, "rb") as f:
+        assert f.read() == b"%PDF same bytes"
+
+    assert store.put("candidate.pdf", b"%PDF same bytes") == (second, False)
+    assert store.find(UploadStore.digest(b"%PDF same bytes"), "candidate.pdf") == second
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import re
+import shutil
+from typing import Optional, Tuple
+
+
+UNSAFE_NAME_RE = re.compile(r"[^\w.\- ]")
+
+
+class UploadStore:
+    def __init__(self, root: str = "uploads"):
+        """
+        Content-addressed storage for uploaded files: each distinct content
+        is written once, under `root/<sha1>/`, with one entry per name it was
+        uploaded as.
+        - Uploading stored bytes under a new name adds a hard link (or a copy
+          where links are not supported) instead of rewriting them.
+        - A file always keeps its uploader's name, which is what the index
+          shows as the chunk source; it never takes another uploader's.
+        """
+        self.root = root
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        # Same hash as pdf_text.file_digest, so the engine's change detection
+        # and the PDF page cache agree with the store.
+        return hashlib.sha1(data).hexdigest()
+
+    @staticmethod
+    def safe_name(name: str) -> str:
+        return UNSAFE_NAME_RE.sub("_", os.path.basename(name)).lstrip(".") or "upload"
+
+    def find(self, digest: str, name: Optional[str] = None) -> Optional[str]:
+        """
+        Path of a stored file with this content hash, preferring the entry
+        uploaded as `name`, or None.
+        """
+        directory = os.path.join(self.root, digest)
+        if not os.path.isdir(directory):
+            return None
+        if name is not None:
+            path = os.path.join(directory, self.safe_name(name))
+            if os.path.isfile(path):
+                return path
+        for entry in sorted(os.listdir(directory)):
+            if not entry.endswith(".tmp"):
+                return os.path.join(directory, entry)
+        return None
+
+    def put(self, name: str, data: bytes) -> Tuple[str, bool]:
+        """
+        Store `data` uploaded as `name`. Returns (path, is_new), where the
+        path ends in `name` and is_new is False if the content was stored.
+        """
+        digest = self.digest(data)
+        directory = os.path.join(self.root, digest)
+        path = os.path.join(directory, self.safe_name(name))
+        if os.path.isfile(path):
+            return path, False
+
+        existing = self.find(digest)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        if existing is not None:
+            try:
+                os.link(existing, tmp_path)
+            except OSError:
+                shutil.copyfile(existing, tmp_path)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+        return path, existing is None
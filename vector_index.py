@@ -0,0 +1,330 @@
+import math
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from lazy import lazy_module
+from quantized_index import QUANTIZED_TYPES, QuantizedIndex
+from sharded_index import ShardedIndex
+
+
+# Imported when the first index is built or loaded.
+faiss = lazy_module("faiss")
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq8", "binary")
+IVF_TYPES = ("ivf_flat", "ivf_pq")
+# Modes that learn from the data; the engine starts them flat until train_threshold.
+TRAINED_TYPES = IVF_TYPES + QUANTIZED_TYPES
+
+# Fewest vectors a mode can be trained on (PQ needs 256 points per codebook).
+MIN_TRAIN_POINTS = {"flat": 0, "hnsw": 0, "ivf_flat": 39, "ivf_pq": 256, "sq8": 1, "binary": 1}
+
+# Filtered searches over at most this many vectors score them directly
+# instead of scanning the index with an id selector.
+EXACT_SUBSET_MAX = 4096
+
+
+def auto_nlist(num_vectors: int) -> int:
+    """
+    Number of IVF cells for a corpus size: ~4*sqrt(n), with at least 39
+    training points per cell (FAISS warns below that).
+    """
+    nlist = int(4 * math.sqrt(max(num_vectors, 1)))
+    return max(1, min(nlist, num_vectors // 39))
+
+
+def make_index(
+    index_type: str,
+    dim: int,
+    num_vectors: int = 0,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: int = 16,
+    rescore_factor: int = 10,
+    num_shards: int = 1,
+):
+    """
+    Create an empty FAISS index that accepts explicit int64 ids.
+    - flat: exact brute-force L2 search.
+    - ivf_flat: inverted lists over full vectors (needs training).
+    - hnsw: graph search, no training, but no in-place removal.
+    - ivf_pq: inverted lists over product-quantized codes (needs training).
+    - sq8 / binary: int8 or 1-bit codes in memory, float re-scoring of
+      `rescore_factor * k` candidates from disk (see quantized_index.py).
+    `num_vectors` is the expected corpus size, used to pick nlist when unset.
+    With `num_shards` > 1, returns a ShardedIndex of that many indexes of
+    `index_type`, searched in parallel (see sharded_index.py).
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}.")
+
+    if num_shards > 1:
+        shards = [
+            make_index(index_type, dim, num_vectors // num_shards, nlist, hnsw_m, pq_m, rescore_factor)
+            for _ in range(num_shards)
+        ]
+        return ShardedIndex(shards, index_type, dim)
+
+    if index_type in QUANTIZED_TYPES:
+        return QuantizedIndex(index_type, dim, rescore_factor)
+
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if index_type == "hnsw":
+        return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, hnsw_m))
+
+    nlist = nlist or auto_nlist(num_vectors)
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}.")
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8)
+    # IVF indexes take ids natively; the hashtable map adds reconstruct() by id.
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def index_kind(index) -> str:
+    """
+    Which of INDEX_TYPES a (possibly ID-wrapped or sharded) FAISS index is.
+    """
+    if isinstance(index, (QuantizedIndex, ShardedIndex)):
+        return index.kind
+    base = _unwrap(index)
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def set_search_params(
+    index, nprobe: int = 16, ef_search: int = 64, rescore_factor: int = 10
+) -> None:
+    """
+    Apply query-time knobs: nprobe for IVF, efSearch for HNSW, the re-scored
+    candidate multiple for sq8 / binary. Higher values trade latency for
+    recall; they are ignored by other index types.
+    """
+    if isinstance(index, ShardedIndex):
+        # Also applied to shards loaded later.
+        index.configure = lambda shard: set_search_params(shard, nprobe, ef_search, rescore_factor)
+        for shard in index.shards:
+            if shard is not None:
+                index.configure(shard)
+        return
+    if isinstance(index, QuantizedIndex):
+        index.rescore_factor = rescore_factor
+        return
+    base = _unwrap(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+
+
+def index_nbytes(index) -> int:
+    """
+    Approximate resident size of an index built by `make_index`: vectors or
+    codes, graph links, IVF centroids and the id maps. Unloaded shards of a
+    sharded index count as zero.
+    """
+    if isinstance(index, ShardedIndex):
+        return index.nbytes(index_nbytes)
+    if isinstance(index, QuantizedIndex):
+        return index.nbytes()
+    base = _unwrap(index)
+    n, d = index.ntotal, index.d
+    if isinstance(base, faiss.IndexIVF):
+        code_size = base.code_size if isinstance(base, faiss.IndexIVFPQ) else 4 * d
+        # Inverted lists store an id next to each code; the hashtable maps ids back.
+        return n * (code_size + 8 + 16) + base.nlist * d * 4
+    nbytes = n * d * 4
+    if isinstance(base, faiss.IndexHNSW):
+        # Level-0 neighbour lists dominate: 2*M int32 links per vector.
+        nbytes += n * base.hnsw.nb_neighbors(0) * 4
+    # IndexIDMap2 keeps the id list plus a reverse hash map.
+    return nbytes + n * (8 + 16)
+
+
+def write_index(index, directory: str) -> None:
+    """
+    Save an index made by `make_index` into `directory` (index.faiss, the
+    quantized index files, or one subdirectory per shard).
+    """
+    if isinstance(index, ShardedIndex):
+        index.save(directory, write_index)
+    elif isinstance(index, QuantizedIndex):
+        index.save(directory)
+    else:
+        faiss.write_index(index, os.path.join(directory, "index.faiss"))
+
+
+def read_index(directory: str):
+    """
+    Index saved by `write_index` in `directory`, or None if there is none.
+    Shards of a sharded index are read on first use.
+    """
+    if os.path.exists(os.path.join(directory, "sharded.json")):
+        return ShardedIndex.open(directory, read_index)
+    if os.path.exists(os.path.join(directory, "quantized.json")):
+        return QuantizedIndex.open(directory)
+    path = os.path.join(directory, "index.faiss")
+    return faiss.read_index(path) if os.path.exists(path) else None
+
+
+def train_and_add(index, vectors: np.ndarray, ids: np.ndarray, max_train_points: int = 100_000):
+    if not index.is_trained:
+        if len(vectors) > max_train_points:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), max_train_points, replace=False)]
+        else:
+            sample = vectors
+        index.train(sample)
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def search_subset(index, queries: np.ndarray, k: int, ids: np.ndarray):
+    """
+    Search restricted to `ids` before any vector is scored, instead of
+    over-fetching and filtering the results:
+    - Up to EXACT_SUBSET_MAX ids (one CV, a few documents): their vectors
+      are reconstructed and scored exactly, a throwaway sub-index.
+    - A sharded index searches only the shards that own some of the ids.
+    - Otherwise the index's own search runs with a FAISS IDSelector, so
+      other vectors are skipped during the scan.
+    Returns (distances, ids) like `index.search`, padded with (inf, -1).
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) <= EXACT_SUBSET_MAX:
+        return _exact_search(queries, index.reconstruct_batch(ids), ids, k)
+    if isinstance(index, ShardedIndex):
+        return index.search_subset(queries, k, ids, search_subset)
+    selector = faiss.IDSelectorBatch(ids)
+    return index.search(queries, k, params=_selector_params(index, selector, len(ids)))
+
+
+def _exact_search(queries: np.ndarray, vectors: np.ndarray, ids: np.ndarray, k: int):
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    found = np.full((len(queries), k), -1, dtype=np.int64)
+    if len(ids):
+        scores = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * queries @ vectors.T
+            + np.einsum("ij,ij->i", vectors, vectors)[None, :]
+        )
+        n = min(k, len(ids))
+        order = np.argsort(scores, axis=1, kind="stable")[:, :n]
+        distances[:, :n] = np.take_along_axis(scores, order, axis=1)
+        found[:, :n] = ids[order]
+    return distances, found
+
+
+def _selector_params(index, selector, subset_size: int):
+    if isinstance(index, QuantizedIndex):
+        return faiss.SearchParameters(sel=selector)
+    # The cells or graph neighbourhoods a normal search visits hold
+    # proportionally fewer matches of a small subset: visit more of them.
+    boost = max(1, index.ntotal // max(subset_size, 1))
+    base = _unwrap(index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(base.nlist, base.nprobe * boost))
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=min(base.hnsw.efSearch * boost, 4096))
+    return faiss.SearchParameters(sel=selector)
+
+
+def _unwrap(index):
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+# ---------- Recall vs latency report ---------- #
+
+DEFAULT_REPORT_CONFIGS = [
+    {"index_type": "ivf_flat", "nprobe": 1},
+    {"index_type": "ivf_flat", "nprobe": 8},
+    {"index_type": "ivf_flat", "nprobe": 32},
+    {"index_type": "hnsw", "ef_search": 16},
+    {"index_type": "hnsw", "ef_search": 64},
+    {"index_type": "hnsw", "ef_search": 256},
+    {"index_type": "ivf_pq", "nprobe": 8},
+    {"index_type": "ivf_pq", "nprobe": 32},
+    {"index_type": "sq8", "rescore_factor": 0},
+    {"index_type": "sq8", "rescore_factor": 10},
+    {"index_type": "binary", "rescore_factor": 0},
+    {"index_type": "binary", "rescore_factor": 10},
+    {"index_type": "binary", "rescore_factor": 32},
+]
+
+
+def compare_index_modes(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 5,
+    configs: Optional[List[dict]] = None,
+) -> List[dict]:
+    """
+    Build each index config over `vectors` and measure it against the exact
+    flat baseline on `queries`.
+    Returns one row per config: index_type, params, build_s, ms_per_query,
+    memory_bytes (see index_nbytes) and recall (fraction of the flat top-k
+    that the config also returned).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids = np.arange(len(vectors), dtype=np.int64)
+    dim = vectors.shape[1]
+
+    def run(config: dict) -> dict:
+        params = {k: v for k, v in config.items() if k != "index_type"}
+        build_keys = ("nlist", "hnsw_m", "pq_m", "rescore_factor")
+        t0 = time.perf_counter()
+        index = make_index(
+            config["index_type"], dim, len(vectors),
+            **{k: v for k, v in params.items() if k in build_keys},
+        )
+        train_and_add(index, vectors, ids)
+        build_s = time.perf_counter() - t0
+        set_search_params(
+            index,
+            nprobe=params.get("nprobe", 16),
+            ef_search=params.get("ef_search", 64),
+            rescore_factor=params.get("rescore_factor", 10),
+        )
+        t0 = time.perf_counter()
+        _, found = index.search(queries, top_k)
+        search_s = time.perf_counter() - t0
+        return {
+            "index_type": config["index_type"],
+            "params": params,
+            "build_s": build_s,
+            "ms_per_query": 1000 * search_s / max(len(queries), 1),
+            "memory_bytes": index_nbytes(index),
+            "found": found,
+        }
+
+    baseline = run({"index_type": "flat"})
+    rows = [baseline]
+    for config in configs or DEFAULT_REPORT_CONFIGS:
+        rows.append(run(config))
+
+    expected = baseline["found"]
+    for row in rows:
+        hits = sum(
+            len(set(exp[exp >= 0]) & set(got[got >= 0]))
+            for exp, got in zip(expected, row.pop("found"))
+        )
+        total = sum(int((exp >= 0).sum()) for exp in expected)
+        row["recall"] = hits / total if total else 1.0
+    return rows